@@ -0,0 +1,24 @@
+# app/admin.py — gate for debug/ops endpoints
+#
+# Allowed when DEBUG=1, or when the request carries X-Admin-Token matching
+# ADMIN_TOKEN. Everything else gets a 404 so the endpoints stay invisible.
+
+import hmac
+import os
+
+from fastapi import HTTPException, Request
+
+DEBUG = os.getenv("DEBUG") == "1"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def is_admin_request(request: Request) -> bool:
+    if DEBUG:
+        return True
+    token = request.headers.get("x-admin-token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(request: Request) -> None:
+    if not is_admin_request(request):
+        raise HTTPException(status_code=404)
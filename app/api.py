@@ -0,0 +1,196 @@
+# app/api.py — read-only JSON API for the mobile client (/api/v1)
+#
+# The same data as the HTML pages (feed, post detail, chat inbox and
+# history, wallet, order book), authenticated by the same session cookie.
+#
+#   fields=id,caption    only these columns are selected and encoded
+#                        (unknown names are a 400; id is always included)
+#   before=<id>&limit=N  keyset pages, newest first; the response's "next"
+#                        is the before= of the following page, or null
+#
+# Bodies are encoded with orjson when it is installed (falls back to the
+# stdlib json module) and gzip/brotli-compressed by CompressionMiddleware.
+
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
+from sqlmodel import Session, func, or_, select
+
+from .chatarchive import archive
+from .db import get_session
+from .httpcache import not_modified, page_etag, with_etag
+from .models import ChatRoom, Comment, Message, Order, Post, Tx
+from .rewards import streak_of
+from .usercache import request_user
+
+try:  # optional: 5-10x faster encoding than the json module
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+ORDERBOOK_DEPTH = 50
+
+
+def _default(o: Any):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+
+
+def api_error_handler(request: Request, exc: APIError) -> Response:
+    return FastJSONResponse({"error": exc.message}, status_code=exc.status_code)
+
+
+# resource -> {field name: column}; the first field is the id (always selected)
+FIELDS = {
+    "post": {c: getattr(Post, c) for c in ("id", "author_id", "caption", "image_url", "created_at")},
+    "comment": {c: getattr(Comment, c) for c in ("id", "post_id", "author_id", "content", "created_at")},
+    "message": {c: getattr(Message, c) for c in ("id", "sender_id", "content", "image_url", "created_at")},
+    "room": {c: getattr(ChatRoom, c) for c in ("id", "user1_id", "user2_id", "created_at")},
+    "tx": {c: getattr(Tx, c) for c in ("id", "amount", "kind", "note", "created_at")},
+    "order": {c: getattr(Order, c) for c in ("id", "user_id", "price", "amount", "created_at")},
+}
+
+
+def projection(resource: str, fields: str | None) -> dict[str, Any]:
+    """The requested subset of FIELDS[resource], in declaration order."""
+    table = FIELDS[resource]
+    if not fields:
+        return table
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    if unknown := wanted - table.keys():
+        raise APIError(400, f"unknown field(s) for {resource}: {', '.join(sorted(unknown))}")
+    return {name: col for name, col in table.items() if name == "id" or name in wanted}
+
+
+def _rows(session: Session, cols: dict[str, Any], *where, order_by, limit: int) -> list[dict]:
+    names = list(cols)
+    stmt = select(*cols.values()).where(*where).order_by(order_by).limit(limit)
+    return [dict(zip(names, row)) for row in session.exec(stmt)]
+
+
+def _page(items: list[dict], limit: int) -> dict:
+    """items were fetched with limit + 1 to learn whether there is a next page."""
+    more = len(items) > limit
+    items = items[:limit]
+    return {"items": items, "next": items[-1]["id"] if more else None}
+
+
+def _limit(limit: int) -> int:
+    return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+
+def _me(request: Request, session: Session):
+    me = request_user(request, session)
+    if not me:
+        raise APIError(401, "login required")
+    return me
+
+
+router = APIRouter(prefix="/api/v1", default_response_class=FastJSONResponse)
+
+
+@router.get("/posts")
+def api_posts(request: Request, before: int | None = None, limit: int = API_PAGE_SIZE, fields: str | None = None,
+              session: Session = Depends(get_session)):
+    cols, limit = projection("post", fields), _limit(limit)
+    # posts are append-only: the newest id versions every page
+    etag = page_etag(request, "api-posts", session.exec(select(func.max(Post.id))).one(), before, limit, tuple(cols))
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    where = [Post.id < before] if before is not None else []
+    items = _rows(session, cols, *where, order_by=Post.id.desc(), limit=limit + 1)
+    return with_etag(FastJSONResponse(_page(items, limit)), etag)
+
+
+@router.get("/posts/{post_id}")
+def api_post(post_id: int, fields: str | None = None, session: Session = Depends(get_session)):
+    cols = projection("post", fields)
+    rows = _rows(session, cols, Post.id == post_id, order_by=Post.id, limit=1)
+    if not rows:
+        raise APIError(404, "post not found")
+    return rows[0]
+
+
+@router.get("/posts/{post_id}/comments")
+def api_post_comments(post_id: int, after: int | None = None, limit: int = API_PAGE_SIZE,
+                      fields: str | None = None, session: Session = Depends(get_session)):
+    # comments read oldest first, so they page forward with after=
+    cols, limit = projection("comment", fields), _limit(limit)
+    where = [Comment.post_id == post_id] + ([Comment.id > after] if after is not None else [])
+    return _page(_rows(session, cols, *where, order_by=Comment.id, limit=limit + 1), limit)
+
+
+@router.get("/chats")
+def api_chats(request: Request, before: int | None = None, limit: int = API_PAGE_SIZE, fields: str | None = None,
+              session: Session = Depends(get_session)):
+    me = _me(request, session)
+    cols, limit = projection("room", fields), _limit(limit)
+    where = [or_(ChatRoom.user1_id == me.id, ChatRoom.user2_id == me.id)]
+    if before is not None:
+        where.append(ChatRoom.id < before)
+    return _page(_rows(session, cols, *where, order_by=ChatRoom.id.desc(), limit=limit + 1), limit)
+
+
+@router.get("/chats/{room_id}/messages")
+def api_chat_messages(room_id: int, request: Request, before: int | None = None, limit: int = API_PAGE_SIZE,
+                      fields: str | None = None, session: Session = Depends(get_session)):
+    me = _me(request, session)
+    room = session.get(ChatRoom, room_id)
+    if not room or me.id not in (room.user1_id, room.user2_id):
+        raise APIError(404, "chat not found")
+    names = list(projection("message", fields))
+    # the room page's path: hot rows, then archived segments (whole rows either way)
+    msgs, older = archive.history(session, room_id, before, _limit(limit))
+    return {"items": [{n: getattr(m, n) for n in names} for m in reversed(msgs)], "next": older}
+
+
+@router.get("/wallet")
+def api_wallet(request: Request, before: int | None = None, limit: int = API_PAGE_SIZE, fields: str | None = None,
+               session: Session = Depends(get_session)):
+    me = _me(request, session)
+    cols, limit = projection("tx", fields), _limit(limit)
+    where = [Tx.user_id == me.id] + ([Tx.id < before] if before is not None else [])
+    page = _page(_rows(session, cols, *where, order_by=Tx.id.desc(), limit=limit + 1), limit)
+    return {"coins": me.coins, "streak": streak_of(session, me.id), **page}
+
+
+@router.get("/orderbook")
+def api_orderbook(request: Request, depth: int = ORDERBOOK_DEPTH, fields: str | None = None,
+                  session: Session = Depends(get_session)):
+    cols, depth = projection("order", fields), _limit(depth)
+    # orders are append-only: the newest id versions the book
+    etag = page_etag(request, "api-book", session.exec(select(func.max(Order.id))).one(), depth, tuple(cols))
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    book = {
+        "buys": _rows(session, cols, Order.side == "buy", order_by=Order.price.desc(), limit=depth),
+        "sells": _rows(session, cols, Order.side == "sell", order_by=Order.price.asc(), limit=depth),
+    }
+    return with_etag(FastJSONResponse(book), etag)
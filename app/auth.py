@@ -1,26 +1,39 @@
 # app/auth.py
 from __future__ import annotations
 
+import functools
 import os
 import re
 import logging
+import uuid
 from datetime import datetime, date, timezone
 
 from fastapi import APIRouter, Depends, Request, Form, status, UploadFile, File
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from passlib.context import CryptContext
 from sqlmodel import select, Session
 from sqlalchemy.exc import IntegrityError
 
 from .db import get_session
 from .models import User
+from .usercache import UserSnapshot, request_user, invalidate_user
+from .sessions import session_store
+from .templating import templates
+from .matching import Profile, matcher
+from .leaderboard import leaderboards
+from .typeahead import people
+from . import metrics
 
 log = logging.getLogger(__name__)
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
-pwd = CryptContext(schemes=["argon2"], deprecated="auto")
+
+@functools.cache
+def pwd():
+    """The password hasher; passlib and argon2 load on the first login/signup, not at import."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["argon2"], deprecated="auto")
+
 
 USERNAME_RE = re.compile(r"^[A-Za-z0-9_]{5,20}$")
 PASSWORD_RE = re.compile(r"^(?=.*[A-Z])(?=.*\d).{6,}$")
@@ -42,11 +55,9 @@ def _valid_email(email: str) -> bool:
         return EMAIL_RE.fullmatch(email) is not None
 
 
-def current_user(request: Request, session: Session) -> User | None:
-    uid = request.session.get("uid")
-    if not uid:
-        return None
-    return session.get(User, uid)
+def current_user(request: Request, session: Session | None = None) -> UserSnapshot | None:
+    """Read-only view of the logged-in user, served from the shared user cache."""
+    return request_user(request, session)
 
 
 # ---------- Signup ----------
@@ -111,7 +122,7 @@ def signup(
             )
 
     try:
-        pw_hash = pwd.hash(password)
+        pw_hash = pwd().hash(password)
     except Exception:
         log.exception("Password hashing failed")
         return templates.TemplateResponse(
@@ -150,6 +161,11 @@ def signup(
             status_code=500,
         )
 
+    # drop a cached "no such user" entry left by a stale cookie for this uid
+    invalidate_user(user.id, request)
+    matcher.upsert(user.id, Profile.from_user(user))
+    leaderboards.set_profile(user.id, user.sport, user.region)
+    people.upsert(user.id, user.username, user.nickname)
     request.session["uid"] = int(user.id)
     return RedirectResponse(url="/profile/edit", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -178,7 +194,7 @@ def login(
     elif email:
         user = session.exec(select(User).where(User.email == email)).first()
 
-    if not user or not pwd.verify(password, user.password_hash):
+    if not user or not pwd().verify(password, user.password_hash):
         return templates.TemplateResponse(
             request,
             "login.html",
@@ -202,6 +218,16 @@ def logout_get(request: Request):
     return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
 
+@router.post("/logout/all")
+def logout_all(request: Request):
+    # signed cookies can't be revoked; only server-side backends support this
+    uid = request.session.get("uid")
+    if uid and session_store is not None:
+        session_store.revoke_user(int(uid))
+    request.session.clear()
+    return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+
+
 # ---------- Profile guard ----------
 @router.get("/profile")
 def profile_redirect(request: Request, session: Session = Depends(get_session)):
@@ -235,7 +261,10 @@ def profile_update(
     avatar: UploadFile | None = File(None),
     session: Session = Depends(get_session),
 ):
-    user = current_user(request, session)
+    me = current_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    user = session.get(User, me.id)
     if not user:
         return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
 
@@ -275,12 +304,18 @@ def profile_update(
             status_code=400,
         )
 
+    old_avatar = None
     if avatar and avatar.filename:
         os.makedirs("static/avatars", exist_ok=True)
         ext = os.path.splitext(avatar.filename)[1].lower() or ".jpg"
-        path = f"static/avatars/{user.id}{ext}"
+        # new name per upload: /static/avatars/ is served as immutable
+        path = f"static/avatars/{user.id}-{uuid.uuid4().hex[:12]}{ext}"
+        data = avatar.file.read()
+        metrics.upload_bytes.inc("avatar", amount=len(data))
         with open(path, "wb") as f:
-            f.write(avatar.file.read())
+            f.write(data)
+        if user.avatar_url and user.avatar_url.startswith("/static/avatars/"):
+            old_avatar = user.avatar_url.lstrip("/")
         user.avatar_url = "/" + path
 
     user.nickname = nick
@@ -293,5 +328,14 @@ def profile_update(
 
     session.add(user)
     session.commit()
+    if old_avatar:  # only once nothing points at it any more
+        try:
+            os.remove(old_avatar)
+        except OSError:
+            pass
+    invalidate_user(user.id, request)
+    matcher.upsert(user.id, Profile.from_user(user))
+    leaderboards.set_profile(user.id, user.sport, user.region)
+    people.upsert(user.id, user.username, user.nickname)
 
     return RedirectResponse("/profile/edit?saved=1", status_code=303)
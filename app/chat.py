@@ -1,36 +1,50 @@
 # app/chat.py
 from fastapi import APIRouter, Depends, Request, Form, UploadFile, File, WebSocket, WebSocketDisconnect
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session, select
-import os, json, time
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+import os, json, time, uuid
 
-from .db import get_session
-from .models import ChatRoom, Message, User
+from .db import get_session, get_async_session
+from .models import ChatRoom, Message
 from .auth import current_user
+from .usercache import get_user, arequest_user
+from .templating import templates
+from .chatarchive import archive
+from .hub import Frame, decode, hub, negotiate, send
+from . import metrics
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+CHAT_MAX_CHARS = 2000
 
 
 class RoomManager:
     def __init__(self):
-        self.rooms: dict[int, set[WebSocket]] = {}
+        self.rooms: dict[int, dict[WebSocket, str]] = {}  # room -> {socket: wire format}
 
     async def connect(self, room_id: int, ws: WebSocket):
-        await ws.accept()
-        self.rooms.setdefault(room_id, set()).add(ws)
+        fmt, subprotocol = negotiate(ws)
+        await ws.accept(subprotocol=subprotocol)
+        self.rooms.setdefault(room_id, {})[ws] = fmt
+        metrics.ws_connections.inc()
 
     def disconnect(self, room_id: int, ws: WebSocket):
-        self.rooms.get(room_id, set()).discard(ws)
+        conns = self.rooms.get(room_id, {})
+        if ws in conns:
+            del conns[ws]
+            metrics.ws_connections.dec()
         if not self.rooms.get(room_id):
             self.rooms.pop(room_id, None)
 
     async def broadcast(self, room_id: int, payload: dict):
         dead = []
-        for ws in self.rooms.get(room_id, set()):
+        frame = Frame(payload)
+        for ws, fmt in list(self.rooms.get(room_id, {}).items()):
             try:
-                await ws.send_text(json.dumps(payload))
+                await send(ws, frame.encoded(fmt))
             except Exception:
                 dead.append(ws)
         for ws in dead:
@@ -38,6 +52,31 @@ class RoomManager:
 
 
 manager = RoomManager()
+metrics.GaugeFunc("sweatmarket_ws_rooms", "Chat rooms with at least one open socket", lambda: len(manager.rooms))
+
+_members: dict[int, tuple[int, int]] = {}  # room -> (user1, user2); rooms never change
+
+
+async def room_members(session: AsyncSession, room_id: int) -> tuple[int, int] | None:
+    members = _members.get(room_id)
+    if members is None:
+        room = await session.get(ChatRoom, room_id)
+        if room is None:
+            return None
+        members = _members[room_id] = (room.user1_id, room.user2_id)
+    return members
+
+
+async def publish_message(session: AsyncSession, room_id: int, payload: dict) -> None:
+    """Deliver a stored message to the room's sockets and to both members' /ws devices."""
+    await manager.broadcast(room_id, payload)
+    if members := await room_members(session, room_id):
+        hub.room_message(room_id, members, payload)
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
 
 
 def get_or_create_room(session: Session, a: int, b: int) -> ChatRoom:
@@ -66,7 +105,7 @@ def chat_list(request: Request, session: Session = Depends(get_session)):
     def other_id(r: ChatRoom) -> int:
         return r.user2_id if r.user1_id == me.id else r.user1_id
 
-    others = {r.id: session.get(User, other_id(r)) for r in rooms}
+    others = {r.id: get_user(other_id(r), session) for r in rooms}
     return templates.TemplateResponse(
         request,
         "chat_list.html",
@@ -82,7 +121,7 @@ def chat_start(request: Request, user_id: int = Form(...), session: Session = De
     if me.id == user_id:
         return RedirectResponse("/chat", status_code=303)
 
-    other = session.get(User, user_id)
+    other = get_user(user_id, session)
     if not other:
         return RedirectResponse("/chat", status_code=303)
 
@@ -91,7 +130,7 @@ def chat_start(request: Request, user_id: int = Form(...), session: Session = De
 
 
 @router.get("/chat/{room_id}")
-def chat_room(room_id: int, request: Request, session: Session = Depends(get_session)):
+def chat_room(room_id: int, request: Request, before: int | None = None, session: Session = Depends(get_session)):
     me = current_user(request, session)
     if not me:
         return RedirectResponse("/login", status_code=303)
@@ -100,36 +139,42 @@ def chat_room(room_id: int, request: Request, session: Session = Depends(get_ses
     if not room or (me.id not in (room.user1_id, room.user2_id)):
         return RedirectResponse("/chat", status_code=303)
 
-    msgs = session.exec(
-        select(Message).where(Message.room_id == room_id).order_by(Message.created_at)
-    ).all()
+    # newest page by default; ?before=<id> walks back, past archived messages too
+    msgs, older = archive.history(session, room_id, before, CHAT_PAGE_SIZE)
 
     other_user_id = room.user2_id if room.user1_id == me.id else room.user1_id
-    other = session.get(User, other_user_id)
+    other = get_user(other_user_id, session)
 
     return templates.TemplateResponse(
         request,
         "chat_room.html",
-        {"user": me, "room": room, "other": other, "messages": msgs},
+        {"user": me, "room": room, "other": other, "messages": msgs, "older": older},
     )
 
 
 @router.websocket("/ws/chat/{room_id}")
-async def ws_chat(room_id: int, websocket: WebSocket, session: Session = Depends(get_session)):
+async def ws_chat(room_id: int, websocket: WebSocket, session: AsyncSession = Depends(get_async_session)):
+    """Legacy per-room socket; members only, and messages are sent as the logged-in user."""
+    uid = websocket.session.get("uid")
+    members = await room_members(session, room_id) if uid else None
+    if not members or int(uid) not in members:
+        await websocket.close(code=1008)  # policy violation: log in / not your chat
+        return
+    sender_id = int(uid)  # any "sender_id" in the frame is ignored
     await manager.connect(room_id, websocket)
     try:
         while True:
             text = await websocket.receive_text()
             data = json.loads(text)
-            content = (data.get("content") or "").strip()
-            sender_id = int(data["sender_id"])
+            content = (data.get("content") or "").strip()[:CHAT_MAX_CHARS]
 
             msg = Message(room_id=room_id, sender_id=sender_id, content=content)
             session.add(msg)
-            session.commit()
-            session.refresh(msg)
+            await session.commit()
+            metrics.chat_messages.inc("text")
 
-            await manager.broadcast(
+            await publish_message(
+                session,
                 room_id,
                 {
                     "type": "text",
@@ -140,36 +185,104 @@ async def ws_chat(room_id: int, websocket: WebSocket, session: Session = Depends
                 },
             )
     except WebSocketDisconnect:
+        pass
+    finally:  # bad frames and failed commits end the socket too
         manager.disconnect(room_id, websocket)
 
 
+@router.websocket("/ws")
+async def ws_user(websocket: WebSocket, session: AsyncSession = Depends(get_async_session)):
+    """One socket per device: {"op": "sub"|"unsub"|"send"|"ping", ...} in; messages and notifications out."""
+    uid = websocket.session.get("uid")
+    if not uid:
+        await websocket.close(code=1008)  # policy violation: log in first
+        return
+    uid = int(uid)
+    fmt, subprotocol = negotiate(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    conn = hub.attach(websocket, uid, fmt)
+    reply = conn.send
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                data = decode(message["bytes"] if message.get("bytes") is not None else message["text"])
+                op = data.get("op")
+                room_id = int(data.get("room") or 0)
+            except (ValueError, TypeError, AttributeError):
+                reply({"type": "error", "error": "bad frame"})
+                continue
+
+            if op == "ping":
+                reply({"type": "pong"})
+            elif op == "sub":
+                members = await room_members(session, room_id)
+                if not members or uid not in members:
+                    reply({"type": "error", "error": "no such chat", "room": room_id})
+                    continue
+                conn.rooms.add(room_id)
+                reply({"type": "subscribed", "room": room_id})
+            elif op == "unsub":
+                conn.rooms.discard(room_id)
+            elif op == "send":
+                content = str(data.get("content") or "").strip()[:CHAT_MAX_CHARS]
+                if room_id not in conn.rooms or not content:
+                    reply({"type": "error", "error": "subscribe first" if content else "empty message", "room": room_id})
+                    continue
+                msg = Message(room_id=room_id, sender_id=uid, content=content)
+                session.add(msg)
+                await session.commit()
+                metrics.chat_messages.inc("text")
+                await publish_message(session, room_id, {
+                    "type": "text",
+                    "id": msg.id,
+                    "sender_id": uid,
+                    "content": content,
+                    "created_at": msg.created_at.isoformat(),
+                })
+            else:
+                reply({"type": "error", "error": f"unknown op {op!r}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.detach(conn)
+
+
 @router.post("/chat/{room_id}/image")
 async def upload_image(
     room_id: int,
     request: Request,
     image: UploadFile = File(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    me = current_user(request, session)
+    me = await arequest_user(request, session)
     if not me:
         return RedirectResponse("/login", status_code=303)
+    members = await room_members(session, room_id)
+    if not members or me.id not in members:
+        return RedirectResponse("/chat", status_code=303)
 
     os.makedirs("static/chat_images", exist_ok=True)
     ext = os.path.splitext(image.filename or "")[1].lower() or ".jpg"
-    path = f"static/chat_images/{room_id}_{me.id}_{int(time.time())}{ext}"
+    # unique per upload: /static/chat_images/ is served as immutable
+    path = f"static/chat_images/{room_id}_{me.id}_{int(time.time())}_{uuid.uuid4().hex[:8]}{ext}"
 
     data = await image.read()
-    with open(path, "wb") as f:
-        f.write(data)
+    metrics.upload_bytes.inc("chat", amount=len(data))
+    await run_in_threadpool(_write_file, path, data)
 
     url = "/" + path
 
     msg = Message(room_id=room_id, sender_id=me.id, image_url=url, content="")
     session.add(msg)
-    session.commit()
-    session.refresh(msg)
+    await session.commit()
+    metrics.chat_messages.inc("image")
 
-    await manager.broadcast(
+    await publish_message(
+        session,
         room_id,
         {
             "type": "image",
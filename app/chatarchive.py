@@ -0,0 +1,209 @@
+# app/chatarchive.py — cold storage for old chat messages
+#
+# Messages older than CHAT_ARCHIVE_DAYS move out of the hot `messages` table
+# into an append-only archive database (CHAT_ARCHIVE_URL, by default a
+# "-archive" file next to the main one). Each room's messages are stored as
+# zlib-compressed segments of up to SEGMENT_MAX rows, indexed by
+# (room_id, last_id), so an archived page costs one index probe and one or
+# two small decompressions. Segments are never rewritten.
+#
+# A run copies a batch of rooms into new segments and commits the archive
+# before deleting those rows from `messages`. A crash in between leaves rows
+# in both places; the next run finds them already archived (id <= the room's
+# last archived id) and only deletes them, and readers never read the archive
+# above the oldest hot row, so nothing is shown twice.
+#
+#   python -m app.chatarchive                   # archive messages older than CHAT_ARCHIVE_DAYS
+#   python -m app.chatarchive --older-than 30   # ...or than 30 days
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlmodel import select
+
+from . import db
+from .models import Message
+
+CHAT_ARCHIVE_URL = os.getenv("CHAT_ARCHIVE_URL") or db.DATABASE_URL.removesuffix(".db") + "-archive.db"
+CHAT_ARCHIVE_DAYS = int(os.getenv("CHAT_ARCHIVE_DAYS", "180"))
+CHAT_ARCHIVE_BATCH = int(os.getenv("CHAT_ARCHIVE_BATCH", "20000"))  # hot rows per move
+SEGMENT_MAX = 256  # messages per segment
+SEGMENT_CACHE = 256  # decoded segments kept in memory
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS segments ("
+    " id INTEGER PRIMARY KEY, room_id INTEGER NOT NULL, first_id INTEGER NOT NULL,"
+    " last_id INTEGER NOT NULL, count INTEGER NOT NULL, data BLOB NOT NULL, created_at TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_segments_room_id_last_id ON segments (room_id, last_id)",
+)
+_COLS = "id, room_id, sender_id, content, image_url, created_at"
+
+
+def _stamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")  # stored timestamp format
+
+
+def encode(rows: list[tuple]) -> bytes:
+    """[(id, sender_id, content, image_url, created_at)] -> compressed segment."""
+    return zlib.compress(json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode(), 6)
+
+
+def decode(data: bytes) -> list[list]:
+    return json.loads(zlib.decompress(data))
+
+
+def _message(room_id: int, row) -> Message:
+    mid, sender_id, content, image_url, created_at = row
+    return Message(id=mid, room_id=room_id, sender_id=sender_id, content=content or "",
+                   image_url=image_url, created_at=datetime.fromisoformat(created_at))
+
+
+class ChatArchive:
+    def __init__(self, url: str = CHAT_ARCHIVE_URL):
+        self.engine = db.make_engine(url)
+        self._ready = False
+        self._init_lock = threading.Lock()
+        self._segment = functools.lru_cache(maxsize=SEGMENT_CACHE)(self._load_segment)
+
+    def _init(self) -> None:
+        if self._ready:
+            return
+        with self._init_lock, self.engine.begin() as conn:
+            for stmt in _SCHEMA:
+                conn.execute(text(stmt))
+            self._ready = True
+
+    def _load_segment(self, seg_id: int) -> list[list]:
+        with self.engine.connect() as conn:
+            return decode(conn.execute(text("SELECT data FROM segments WHERE id = :id"), {"id": seg_id}).scalar_one())
+
+    # ---------- reads ----------
+    def page(self, room_id: int, before: int, limit: int) -> list[Message]:
+        """Up to `limit` archived messages of a room with id < before, newest first."""
+        self._init()
+        out: list[Message] = []
+        with self.engine.connect() as conn:
+            segs = conn.execute(
+                text("SELECT id FROM segments WHERE room_id = :r AND first_id < :b ORDER BY last_id DESC"),
+                {"r": room_id, "b": before},
+            )
+            for (seg_id,) in segs:
+                for row in reversed(self._segment(seg_id)):
+                    if row[0] < before:
+                        out.append(_message(room_id, row))
+                        if len(out) == limit:
+                            return out
+        return out
+
+    def stats(self) -> dict[str, int]:
+        self._init()
+        with self.engine.connect() as conn:
+            n, msgs, size = conn.execute(
+                text("SELECT count(*), coalesce(sum(count), 0), coalesce(sum(length(data)), 0) FROM segments")
+            ).one()
+        return {"segments": n, "messages": msgs, "bytes": size}
+
+    # ---------- history ----------
+    def history(self, session, room_id: int, before: int | None, limit: int) -> tuple[list[Message], int | None]:
+        """One page of a room, oldest first, continuing into the archive when the hot rows run out.
+
+        Returns (messages, before-cursor of the next older page or None).
+        """
+        cond = [Message.room_id == room_id]
+        if before is not None:
+            cond.append(Message.id < before)
+        msgs = list(session.exec(select(Message).where(*cond).order_by(Message.id.desc()).limit(limit + 1)))
+        if len(msgs) <= limit:
+            floor = msgs[-1].id if msgs else (before if before is not None else sys.maxsize)
+            msgs += self.page(room_id, floor, limit + 1 - len(msgs))
+        more = len(msgs) > limit
+        msgs = msgs[:limit]
+        msgs.reverse()
+        return msgs, (msgs[0].id if more else None)
+
+    # ---------- archiving ----------
+    def run(self, hot_engine, older_than: timedelta, now: datetime | None = None,
+            batch: int = CHAT_ARCHIVE_BATCH) -> tuple[int, int]:
+        """Move messages older than `older_than` to the archive; (moved, segments written)."""
+        self._init()
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        with hot_engine.connect() as conn:
+            # ids grow with time, so "old" is a prefix of ids and every room's
+            # archive stays below its hot rows
+            cutoff_id = conn.execute(
+                text("SELECT coalesce(max(id), 0) FROM messages WHERE created_at < :t"),
+                {"t": _stamp(now - older_than)},
+            ).scalar_one()
+
+        moved = written = 0
+        after = (0, 0)  # (room_id, id) keyset, so hot rows are scanned once per run
+        while True:
+            with hot_engine.connect() as conn:
+                rows = conn.execute(
+                    text(f"SELECT {_COLS} FROM messages WHERE (room_id, id) > (:r, :i) AND id <= :c "
+                         "ORDER BY room_id, id LIMIT :n"),
+                    {"r": after[0], "i": after[1], "c": cutoff_id, "n": batch},
+                ).all()
+            if not rows:
+                return moved, written
+            after = (rows[-1][1], rows[-1][0])
+            written += self._append(rows)
+            with hot_engine.begin() as conn:
+                conn.execute(text("DELETE FROM messages WHERE id = :id"), [{"id": r[0]} for r in rows])
+            moved += len(rows)
+
+    def _append(self, rows) -> int:
+        self._init()
+        by_room: dict[int, list[tuple]] = {}
+        for mid, room_id, sender_id, content, image_url, created_at in rows:
+            by_room.setdefault(room_id, []).append((mid, sender_id, content, image_url, str(created_at)))
+
+        written = 0
+        stamp = _stamp(datetime.now(timezone.utc))
+        with self.engine.begin() as conn:
+            for room_id, msgs in by_room.items():
+                done = conn.execute(
+                    text("SELECT coalesce(max(last_id), 0) FROM segments WHERE room_id = :r"), {"r": room_id}
+                ).scalar_one()
+                msgs = [m for m in msgs if m[0] > done]  # left over from an interrupted run
+                for i in range(0, len(msgs), SEGMENT_MAX):
+                    seg = msgs[i : i + SEGMENT_MAX]
+                    conn.execute(
+                        text("INSERT INTO segments (room_id, first_id, last_id, count, data, created_at) "
+                             "VALUES (:r, :f, :l, :n, :d, :t)"),
+                        {"r": room_id, "f": seg[0][0], "l": seg[-1][0], "n": len(seg), "d": encode(seg), "t": stamp},
+                    )
+                    written += 1
+        return written
+
+
+archive = ChatArchive()
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Move old chat messages into compressed archive segments.")
+    ap.add_argument("--older-than", type=int, default=CHAT_ARCHIVE_DAYS, metavar="DAYS")
+    ap.add_argument("--batch", type=int, default=CHAT_ARCHIVE_BATCH)
+    args = ap.parse_args(argv)
+
+    db.init_db()
+    t0 = time.perf_counter()
+    moved, written = archive.run(db.engine, timedelta(days=args.older_than), batch=args.batch)
+    st = archive.stats()
+    print(f"[chatarchive] moved {moved:,} messages into {written:,} segments "
+          f"(archive: {st['messages']:,} messages, {st['bytes'] / 1e6:.1f} MB)")
+    print(f"[chatarchive] Done in {time.perf_counter() - t0:.1f}s.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# app/checkins.py — workout sessions and location check-ins
+#
+# A host creates a WorkoutSession (place, radius, time window) and shows its
+# rotating QR code (app/qr.py); attendees scan it and check in with their
+# browser's geolocation. The open and upcoming sessions are held in an
+# in-memory GridIndex (app/geo.py), so validating a check-in — or listing
+# the sessions around a point — touches the handful of cells around the
+# caller instead of every session in the DB.
+#
+# The index is per process: it is loaded at startup, sessions created here
+# are added directly, and sessions created by other workers are picked up
+# by `catch_up` (ids above the high-water mark of what was read from the DB,
+# which local adds never move) when a lookup misses or at most every
+# CHECKIN_CATCHUP_SECONDS for area queries. Sessions leave the
+# index when their window closes.
+
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote_plus
+
+from fastapi import APIRouter, Depends, Form, Request
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, func, select
+
+from . import qr
+from .db import engine, get_session
+from .geo import CELL_DEG, GridIndex, haversine_m, valid_coords
+from .httpcache import not_modified, with_etag
+from .models import CheckIn, WorkoutSession
+from .rewards import rewards
+from .templating import templates
+from .usercache import get_user, request_user
+
+log = logging.getLogger(__name__)
+
+CHECKIN_EARLY_MINUTES = int(os.getenv("CHECKIN_EARLY_MINUTES", "15"))
+CHECKIN_MAX_SLACK_M = float(os.getenv("CHECKIN_MAX_SLACK_M", "50"))  # cap on the GPS accuracy we honour
+CHECKIN_CATCHUP_SECONDS = float(os.getenv("CHECKIN_CATCHUP_SECONDS", "2"))
+MIN_RADIUS_M, MAX_RADIUS_M = 25, 500
+MIN_DURATION_MIN, MAX_DURATION_MIN = 15, 8 * 60
+
+
+def _epoch(dt: datetime) -> float:
+    # SQLite hands datetimes back naive; everything is stored in UTC
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+@dataclass(frozen=True)
+class ActiveSession:
+    id: int
+    lat: float
+    lon: float
+    radius_m: float
+    opens: float  # epoch seconds, CHECKIN_EARLY_MINUTES before the start
+    closes: float
+
+    @classmethod
+    def from_row(cls, sid, lat, lon, radius_m, starts_at, ends_at) -> "ActiveSession":
+        if isinstance(starts_at, str):
+            starts_at, ends_at = datetime.fromisoformat(starts_at), datetime.fromisoformat(ends_at)
+        return cls(sid, lat, lon, radius_m, _epoch(starts_at) - CHECKIN_EARLY_MINUTES * 60, _epoch(ends_at))
+
+
+class CheckinIndex:
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self._lock = threading.Lock()
+        self._grid: GridIndex[int] = GridIndex(cell_deg)
+        self._sessions: dict[int, ActiveSession] = {}
+        self._closing: list[tuple[float, int]] = []  # heap of (closes, id)
+        self.last_id = 0  # highest id read from the DB; only load/catch_up move it
+        self.caught_up_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def add(self, s: ActiveSession, now: float | None = None) -> None:
+        with self._lock:
+            if s.id in self._sessions or s.closes <= (time.time() if now is None else now):
+                return
+            self._sessions[s.id] = s
+            self._grid.add(s.id, s.lat, s.lon)
+            heapq.heappush(self._closing, (s.closes, s.id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._grid = GridIndex(self._grid.cell_deg)
+            self._sessions.clear()
+            self._closing.clear()
+            self.last_id = 0
+            self.caught_up_at = 0.0
+
+    def _sweep(self, now: float) -> None:
+        while self._closing and self._closing[0][0] <= now:
+            _, sid = heapq.heappop(self._closing)
+            s = self._sessions.get(sid)
+            if s is not None and s.closes <= now:
+                del self._sessions[sid]
+                self._grid.remove(sid)
+
+    # ---------- loading ----------
+    _COLUMNS = "id, lat, lon, radius_m, starts_at, ends_at"
+
+    def _load(self, engine, where: str, params: dict) -> list:
+        with engine.connect() as conn:
+            rows = conn.execute(text(f"SELECT {self._COLUMNS} FROM workout_sessions WHERE {where}"), params).all()
+        now = time.time()
+        for row in rows:
+            self.add(ActiveSession.from_row(*row), now)
+        return rows
+
+    def load_from_db(self, engine) -> int:
+        self.clear()
+        t0 = time.perf_counter()
+        cutoff = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")  # stored format
+        with engine.connect() as conn:
+            self.last_id = conn.execute(text("SELECT coalesce(max(id), 0) FROM workout_sessions")).scalar_one()
+        n = len(self._load(engine, "ends_at > :cutoff", {"cutoff": cutoff}))
+        self.caught_up_at = time.monotonic()
+        log.info("check-in index: %d open sessions in %.2f s", n, time.perf_counter() - t0)
+        return n
+
+    def catch_up(self, engine) -> int:
+        """Index sessions other workers created since our high-water mark."""
+        self.caught_up_at = time.monotonic()
+        rows = self._load(engine, "id > :last", {"last": self.last_id})
+        with self._lock:
+            self.last_id = max([self.last_id, *(row[0] for row in rows)])
+        return len(rows)
+
+    # ---------- reads ----------
+    def get(self, sid: int) -> ActiveSession | None:
+        return self._sessions.get(sid)
+
+    def nearby(self, lat: float, lon: float, now: float | None = None,
+               slack_m: float = 0.0) -> list[tuple[ActiveSession, float]]:
+        """Open sessions whose radius (plus slack_m) covers (lat, lon), nearest first."""
+        now = time.time() if now is None else now
+        out = []
+        with self._lock:
+            self._sweep(now)
+            for sid, d in self._grid.within(lat, lon, MAX_RADIUS_M + slack_m):
+                s = self._sessions[sid]
+                if s.opens <= now and d <= s.radius_m + slack_m:
+                    out.append((s, d))
+        out.sort(key=lambda sd: (sd[1], sd[0].id))
+        return out
+
+    def check(self, sid: int, lat: float, lon: float, now: float | None = None,
+              slack_m: float = 0.0) -> tuple[float | None, str | None]:
+        """(distance_m, None) when (lat, lon) may check in to sid now, else (distance_m, reason)."""
+        now = time.time() if now is None else now
+        s = self._sessions.get(sid)
+        if s is None or s.closes <= now:
+            return None, "closed"
+        d = haversine_m(lat, lon, s.lat, s.lon)
+        if now < s.opens:
+            return d, "not_open"
+        if d > s.radius_m + slack_m:
+            return d, "too_far"
+        return d, None
+
+
+checkin_index = CheckinIndex()
+
+REASONS = {
+    "closed": "This session is over (or doesn't exist).",
+    "not_open": f"Check-in opens {CHECKIN_EARLY_MINUTES} minutes before the start.",
+    "too_far": "You're too far from the meeting point.",
+    "bad_coords": "We couldn't read your location.",
+    "duplicate": "You're already checked in.",
+    "bad_nonce": "That check-in code has expired. Scan the host's QR code again.",
+}
+
+
+def _slack(accuracy: float | None) -> float:
+    return min(max(accuracy or 0.0, 0.0), CHECKIN_MAX_SLACK_M)
+
+
+# ---------- routes ----------
+router = APIRouter()
+
+
+@router.get("/sessions/new", response_class=HTMLResponse)
+def session_new_page(request: Request):
+    me = request_user(request)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    return templates.TemplateResponse(request, "session_new.html", {"user": me, "error": None})
+
+
+@router.post("/sessions/new")
+def session_create(
+    request: Request,
+    title: str = Form(...),
+    lat: float = Form(...),
+    lon: float = Form(...),
+    starts_at: str = Form(...),
+    duration_min: int = Form(60),
+    radius_m: int = Form(150),
+    sport: str = Form(""),
+    tz_offset_min: int = Form(0),  # browser's getTimezoneOffset(); datetime-local has no zone
+    session: Session = Depends(get_session),
+):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+
+    error = None
+    try:
+        start = datetime.fromisoformat(starts_at)
+    except ValueError:
+        error = "Invalid start time"
+    else:
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc) + timedelta(minutes=tz_offset_min)
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if not valid_coords(lat, lon):
+        error = "Pick a location"
+    elif not (title or "").strip():
+        error = "Give the session a title"
+    if error:
+        return templates.TemplateResponse(
+            request, "session_new.html", {"user": me, "error": error}, status_code=400
+        )
+
+    duration = min(max(duration_min, MIN_DURATION_MIN), MAX_DURATION_MIN)
+    ws = WorkoutSession(
+        host_id=me.id,
+        title=title.strip(),
+        sport=(sport or "").strip() or me.sport,
+        lat=lat,
+        lon=lon,
+        radius_m=min(max(radius_m, MIN_RADIUS_M), MAX_RADIUS_M),
+        starts_at=start,
+        ends_at=start + timedelta(minutes=duration),
+    )
+    session.add(ws)
+    session.commit()
+    session.refresh(ws)
+    checkin_index.add(ActiveSession.from_row(ws.id, ws.lat, ws.lon, ws.radius_m, ws.starts_at, ws.ends_at))
+    return RedirectResponse(f"/session/{ws.id}", status_code=303)
+
+
+@router.get("/sessions/nearby")
+def sessions_nearby(request: Request, lat: float, lon: float, accuracy: float = 0.0):
+    if not request_user(request):
+        return JSONResponse({"error": "login required"}, status_code=401)
+    if not valid_coords(lat, lon):
+        return JSONResponse({"error": "bad coordinates"}, status_code=400)
+    if time.monotonic() - checkin_index.caught_up_at > CHECKIN_CATCHUP_SECONDS:
+        checkin_index.catch_up(engine)
+    return {
+        "sessions": [
+            {"id": s.id, "distance_m": round(d, 1), "radius_m": s.radius_m, "closes": s.closes}
+            for s, d in checkin_index.nearby(lat, lon, slack_m=_slack(accuracy))[:20]
+        ]
+    }
+
+
+@router.get("/session/{sid}", response_class=HTMLResponse)
+def session_page(
+    sid: int,
+    request: Request,
+    n: str | None = None,
+    msg: str | None = None,
+    session: Session = Depends(get_session),
+):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    ws = session.get(WorkoutSession, sid)
+    if not ws:
+        return HTMLResponse("Session not found", status_code=404)
+
+    count = session.exec(select(func.count()).select_from(CheckIn).where(CheckIn.session_id == sid)).one()
+    mine = session.exec(select(CheckIn).where(CheckIn.session_id == sid, CheckIn.user_id == me.id)).first()
+    is_host = ws.host_id == me.id
+    checkin_url, refresh_in = None, None
+    if is_host:
+        nonce, refresh_in = qr.signer.issue(sid)
+        checkin_url = f"{request.base_url}session/{sid}?n={nonce}"
+    return templates.TemplateResponse(
+        request,
+        "session_qr.html",
+        {
+            "user": me,
+            "sid": sid,
+            "ws": ws,
+            "host": get_user(ws.host_id, session),
+            "is_host": is_host,
+            "checkin_url": checkin_url,
+            "qr_available": qr.available(),
+            "refresh_ms": int(refresh_in * 1000) + 500 if refresh_in else None,
+            "nonce": n,
+            "checkin_count": count,
+            "checked_in": mine is not None,
+            "msg": msg,
+        },
+    )
+
+
+@router.get("/session/{sid}/qr.png")
+def session_qr_png(sid: int, request: Request, session: Session = Depends(get_session)):
+    me = request_user(request, session)
+    ws = session.get(WorkoutSession, sid)
+    if not ws:
+        return Response("Session not found", status_code=404)
+    if not me or ws.host_id != me.id:  # the code is only useful on site, shown by the host
+        return Response("Only the host can show the check-in code", status_code=403)
+
+    nonce, _ = qr.signer.issue(sid)
+    etag = f'"{nonce}"'
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    try:
+        png = qr.qr_png_bytes(f"{request.base_url}session/{sid}?n={nonce}")
+    except RuntimeError as e:
+        return Response(str(e), status_code=503)
+    return with_etag(Response(png, media_type="image/png"), etag)
+
+
+@router.post("/session/{sid}/checkin")
+def session_checkin(
+    sid: int,
+    request: Request,
+    lat: float = Form(...),
+    lon: float = Form(...),
+    accuracy: float = Form(0.0),
+    nonce: str = Form(""),
+    session: Session = Depends(get_session),
+):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+
+    # all in-memory: signature, location/window, then the seen-set; the DB only sees accepted check-ins
+    expires = qr.signer.verify(sid, nonce)
+    distance = None
+    if expires is None:
+        reason = "bad_nonce"
+    elif not valid_coords(lat, lon):
+        reason = "bad_coords"
+    else:
+        if checkin_index.get(sid) is None and sid > checkin_index.last_id:
+            checkin_index.catch_up(engine)
+        distance, reason = checkin_index.check(sid, lat, lon, slack_m=_slack(accuracy))
+        if reason is None and not qr.used_nonces.add_if_absent((sid, me.id, nonce), expires):
+            reason = "duplicate"
+
+    if reason is None:
+        session.add(CheckIn(session_id=sid, user_id=me.id, lat=lat, lon=lon, distance_m=round(distance, 1)))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            reason = "duplicate"
+        else:
+            rewards.run_in_background()
+
+    msg = "Checked in!" if reason is None else REASONS[reason]
+    back = f"/session/{sid}?msg={quote_plus(msg)}"
+    if reason in ("too_far", "bad_coords", "not_open"):
+        back += f"&n={quote_plus(nonce)}"  # let them retry without rescanning
+    return RedirectResponse(back, status_code=303)
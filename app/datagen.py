@@ -0,0 +1,256 @@
+# app/datagen.py — synthetic dataset generator for benchmarks
+#
+#   python -m app.datagen --scale small                  # ~1k users
+#   python -m app.datagen --scale large                  # 1M users, 10M messages
+#   python -m app.datagen --users 50000 --messages 2000000 --database-url sqlite:///./bench.db
+#
+# Rows go straight into the app/models.py tables with executemany in batched
+# transactions (no ORM, no per-user Argon2: every user shares one precomputed
+# hash of --password). Activity follows a Zipf-like skew so a few users/rooms
+# are very busy and most are quiet, like real traffic.
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import sys
+import time
+from dataclasses import dataclass, fields, replace
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import text
+
+SPORTS = ["gym", "running", "soccer", "others"]
+SPORT_WEIGHTS = [45, 30, 15, 10]
+REGIONS = [
+    "Burnaby", "Vancouver", "Surrey", "Richmond", "Coquitlam", "North Vancouver",
+    "New Westminster", "Langley", "Delta", "Port Moody", "Maple Ridge", "White Rock",
+]
+TIME_WINDOWS = ["morning", "lunch", "afternoon", "evening", "night", "weekend"]
+GOALS = ["lose weight", "build muscle", "10k run", "stay active", "marathon", "flexibility"]
+SYLLABLES = ["ka", "mi", "ro", "su", "ne", "ta", "ji", "po", "le", "da", "yo", "hu", "ri", "an"]
+WORDS = (
+    "great workout today leg day finally new pr morning run who wants to join "
+    "gym buddy needed soccer this weekend stretching matters feeling strong"
+).split()
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    posts: int
+    comments: int
+    rooms: int
+    messages: int
+    txs: int
+    orders: int
+
+
+PRESETS = {
+    "small": Scale(users=1_000, posts=2_000, comments=5_000, rooms=1_500, messages=20_000, txs=10_000, orders=1_000),
+    "medium": Scale(users=100_000, posts=200_000, comments=500_000, rooms=150_000, messages=1_000_000,
+                    txs=1_000_000, orders=50_000),
+    "large": Scale(users=1_000_000, posts=2_000_000, comments=5_000_000, rooms=1_500_000, messages=10_000_000,
+                   txs=10_000_000, orders=500_000),
+}
+
+
+class Skewed:
+    """Zipf-like sampler over ids first..first+n-1 (rank 1 is the busiest)."""
+
+    def __init__(self, rng: random.Random, first: int, n: int, s: float = 1.07):
+        self.rng = rng
+        self.ids = range(first, first + n)
+        weights = [1.0 / (rank ** s) for rank in range(1, n + 1)]
+        # shuffle so busy ids are spread out rather than the lowest ids
+        rng.shuffle(weights)
+        self.cum = list(itertools.accumulate(weights))
+
+    def sample(self, k: int) -> list[int]:
+        return self.rng.choices(self.ids, cum_weights=self.cum, k=k)
+
+
+def _batched(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    it = iter(rows)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def _max_id(conn, table: str) -> int:
+    return conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table}")).scalar_one()
+
+
+def _password_hash(password: str) -> str:
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["argon2"], deprecated="auto").hash(password)
+
+
+class Generator:
+    def __init__(self, engine, scale: Scale, seed: int = 42, batch: int = 10_000, days: int = 365,
+                 password: str = "Passw0rd!", log: Callable[[str], None] = print):
+        self.engine = engine
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.batch = batch
+        self.log = log
+        self.password = password
+        # stored the way SQLAlchemy writes DateTime columns to SQLite (naive UTC)
+        self.end = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        self.start = self.end - timedelta(days=days)
+        self.timings: dict[str, tuple[int, float]] = {}
+
+    # ---------- helpers ----------
+    def _insert(self, table: str, columns: list[str], rows: Iterable[tuple]) -> int:
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        t0 = time.perf_counter()
+        n = 0
+        with self.engine.connect() as conn:
+            for batch in _batched(rows, self.batch):
+                conn.exec_driver_sql(sql, batch)
+                conn.commit()
+                n += len(batch)
+        dt = time.perf_counter() - t0
+        self.timings[table] = (n, dt)
+        self.log(f"[datagen] {table:<11} {n:>11,} rows  {dt:7.1f}s  {n / dt if dt else 0:>10,.0f} rows/s")
+        return n
+
+    def _times(self, n: int) -> Iterator[str]:
+        """n timestamps increasing over [start, end], so id order ~ time order."""
+        span = (self.end - self.start).total_seconds()
+        step = span / max(n, 1)
+        jitter = self.rng.random
+        for i in range(n):
+            yield (self.start + timedelta(seconds=i * step + jitter() * step)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    def _text(self, lo: int, hi: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(lo, hi)))
+
+    # ---------- tables ----------
+    def run(self) -> dict[str, tuple[int, float]]:
+        with self.engine.connect() as conn:
+            base = {t: _max_id(conn, t) for t in ("users", "posts", "chat_rooms")}
+        sc = self.scale
+        rng = self.rng
+
+        pw_hash = _password_hash(self.password)
+        users = Skewed(rng, base["users"] + 1, sc.users)
+        created = list(self._times(sc.users))
+
+        def user_rows():
+            for i in range(sc.users):
+                uid = base["users"] + 1 + i
+                nick = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) + str(uid % 1000)
+                yield (
+                    uid, f"user{uid:07d}", f"user{uid}@example.com", pw_hash, 0, nick[:12],
+                    date(rng.randint(1965, 2006), rng.randint(1, 12), rng.randint(1, 28)).isoformat(),
+                    rng.choice(("male", "female", "prefer_not_to_answer")),
+                    rng.choices(SPORTS, SPORT_WEIGHTS)[0],
+                    rng.choice(TIME_WINDOWS),
+                    # region popularity is skewed too: big cities first
+                    REGIONS[min(int(rng.expovariate(0.35)), len(REGIONS) - 1)],
+                    rng.choice(GOALS), 1, created[i], created[i],
+                )
+
+        self._insert("users", ["id", "username", "email", "password_hash", "coins", "nickname", "birth_date",
+                               "gender", "sport", "time_window", "region", "goal", "is_active",
+                               "email_confirmed_at", "created_at"], user_rows())
+
+        authors = users.sample(sc.posts)
+        self._insert("posts", ["id", "author_id", "caption", "image_url", "created_at"], (
+            (base["posts"] + 1 + i, authors[i], self._text(3, 20), None, t)
+            for i, t in enumerate(self._times(sc.posts))
+        ))
+
+        if sc.posts:
+            posts = Skewed(rng, base["posts"] + 1, sc.posts, s=1.2)
+            post_ids, comment_authors = posts.sample(sc.comments), users.sample(sc.comments)
+            self._insert("comments", ["post_id", "author_id", "content", "created_at"], (
+                (post_ids[i], comment_authors[i], self._text(1, 12), t)
+                for i, t in enumerate(self._times(sc.comments))
+            ))
+
+        # rooms: unique (user1 < user2) pairs between skewed users
+        pairs: dict[tuple[int, int], None] = {}
+        while len(pairs) < sc.rooms and sc.users > 1:
+            for a, b in zip(users.sample(sc.rooms), users.sample(sc.rooms)):
+                if a != b:
+                    pairs.setdefault((min(a, b), max(a, b)))
+                    if len(pairs) == sc.rooms:
+                        break
+        room_list = list(pairs)
+        self._insert("chat_rooms", ["id", "user1_id", "user2_id", "created_at"], (
+            (base["chat_rooms"] + 1 + i, u1, u2, t)
+            for i, ((u1, u2), t) in enumerate(zip(room_list, self._times(len(room_list))))
+        ))
+
+        if room_list:
+            rooms = Skewed(rng, 0, len(room_list), s=1.15)
+            picks = rooms.sample(sc.messages)
+            self._insert("messages", ["room_id", "sender_id", "content", "image_url", "created_at"], (
+                (base["chat_rooms"] + 1 + picks[i], room_list[picks[i]][rng.random() < 0.5], self._text(1, 15), None, t)
+                for i, t in enumerate(self._times(sc.messages))
+            ))
+
+        coins: dict[int, int] = {}
+
+        def tx_rows():
+            owners = users.sample(sc.txs)
+            for i, t in enumerate(self._times(sc.txs)):
+                kind = rng.choices(("earn", "bonus", "spend"), (70, 10, 20))[0]
+                amount = -rng.randint(1, 10) if kind == "spend" else rng.randint(1, 15)
+                coins[owners[i]] = coins.get(owners[i], 0) + amount
+                yield owners[i], amount, kind, {"earn": "Workout check-in", "bonus": "Streak",
+                                               "spend": "Reward"}[kind], t
+
+        self._insert("txs", ["user_id", "amount", "kind", "note", "created_at"], tx_rows())
+
+        t0 = time.perf_counter()
+        with self.engine.connect() as conn:
+            for batch in _batched(((c, uid) for uid, c in coins.items()), self.batch):
+                conn.exec_driver_sql("UPDATE users SET coins = coins + ? WHERE id = ?", batch)
+                conn.commit()
+        self.log(f"[datagen] users.coins {len(coins):>11,} rows  {time.perf_counter() - t0:7.1f}s")
+
+        order_users = users.sample(sc.orders)
+        self._insert("orders", ["user_id", "side", "price", "amount", "created_at"], (
+            (order_users[i], side, max(1, int(rng.gauss(100 if side == "buy" else 106, 4))), rng.randint(1, 50), t)
+            for i, t in enumerate(self._times(sc.orders))
+            for side in (rng.choice(("buy", "sell")),)
+        ))
+        return self.timings
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Bulk-generate a synthetic SweatMarket dataset.")
+    ap.add_argument("--scale", choices=sorted(PRESETS), default="small")
+    for f in fields(Scale):
+        ap.add_argument(f"--{f.name}", type=int, help=f"override the preset's {f.name} count")
+    ap.add_argument("--database-url", help="defaults to DATABASE_URL")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--batch", type=int, default=10_000, help="rows per executemany/transaction")
+    ap.add_argument("--days", type=int, default=365, help="spread timestamps over this many days")
+    ap.add_argument("--password", default="Passw0rd!", help="password shared by all generated users")
+    args = ap.parse_args(argv)
+
+    import os
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from .db import DATABASE_URL, engine, init_db
+
+    scale = replace(PRESETS[args.scale], **{f.name: getattr(args, f.name) for f in fields(Scale)
+                                             if getattr(args, f.name) is not None})
+    print(f"[datagen] DATABASE_URL={DATABASE_URL}")
+    print(f"[datagen] {scale}")
+    init_db()
+
+    t0 = time.perf_counter()
+    Generator(engine, scale, seed=args.seed, batch=args.batch, days=args.days, password=args.password).run()
+    print(f"[datagen] Done in {time.perf_counter() - t0:.1f}s.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,139 @@
 # app/db.py
+import atexit
 import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy.pool import StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sweatmarket.db")
 TESTING = os.getenv("TESTING") == "1"
 
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    """Connection pragmas + pool sizing for file-backed SQLite.
+
+    SQLITE_PROFILE=production (default) enables WAL so page reads don't block
+    on chat writes; SQLITE_PROFILE=legacy keeps SQLite's stock settings.
+    """
+
+    journal_mode: str | None = "WAL"
+    synchronous: str | None = "NORMAL"
+    busy_timeout_ms: int | None = 5000
+    mmap_size: int | None = 256 * 1024 * 1024
+    cache_size: int | None = -64000  # negative = KiB, i.e. ~64 MB per connection
+    pool_size: int = 8
+    max_overflow: int = 16
+
+    @classmethod
+    def from_env(cls) -> "SQLiteProfile":
+        if os.getenv("SQLITE_PROFILE", "production") == "legacy":
+            return LEGACY_PROFILE
+        base = cls()
+
+        def _int(name: str, default: int | None) -> int | None:
+            v = os.getenv(name)
+            return int(v) if v not in (None, "") else default
+
+        return cls(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", base.journal_mode),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", base.synchronous),
+            busy_timeout_ms=_int("SQLITE_BUSY_TIMEOUT_MS", base.busy_timeout_ms),
+            mmap_size=_int("SQLITE_MMAP_SIZE", base.mmap_size),
+            cache_size=_int("SQLITE_CACHE_SIZE", base.cache_size),
+            pool_size=_int("DB_POOL_SIZE", base.pool_size),
+            max_overflow=_int("DB_MAX_OVERFLOW", base.max_overflow),
+        )
+
+    def pragmas(self) -> list[str]:
+        out = []
+        if self.journal_mode:
+            out.append(f"PRAGMA journal_mode={self.journal_mode}")
+        if self.synchronous:
+            out.append(f"PRAGMA synchronous={self.synchronous}")
+        if self.busy_timeout_ms is not None:
+            out.append(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        if self.mmap_size is not None:
+            out.append(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        if self.cache_size is not None:
+            out.append(f"PRAGMA cache_size={int(self.cache_size)}")
+        return out
+
+
+# sqlite3 defaults: rollback journal, synchronous=FULL, no mmap; SA's default pool
+LEGACY_PROFILE = SQLiteProfile(None, None, None, None, None, pool_size=5, max_overflow=10)
+
+
+def apply_sqlite_profile(engine, profile: SQLiteProfile) -> None:
+    pragmas = profile.pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for stmt in pragmas:
+            cur.execute(stmt)
+        cur.close()
+
+
+def _engine_kwargs(profile: SQLiteProfile) -> dict:
+    connect_args = {"check_same_thread": False}
+    if profile.busy_timeout_ms is not None:
+        connect_args["timeout"] = profile.busy_timeout_ms / 1000
+    return {
+        "connect_args": connect_args,
+        "pool_size": profile.pool_size,
+        "max_overflow": profile.max_overflow,
+    }
+
+
+def make_engine(url: str, profile: SQLiteProfile | None = None):
+    profile = profile or SQLiteProfile.from_env()
+    eng = create_engine(url, **_engine_kwargs(profile))
+    apply_sqlite_profile(eng, profile)
+    return eng
+
+
+def make_async_engine(url: str, profile: SQLiteProfile | None = None):
+    """aiosqlite engine on the same database file (sqlite:/// -> sqlite+aiosqlite:///)."""
+    profile = profile or SQLiteProfile.from_env()
+    eng = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1), **_engine_kwargs(profile))
+    apply_sqlite_profile(eng.sync_engine, profile)
+    return eng
+
+
 if TESTING or DATABASE_URL == "sqlite://" or ":memory:" in DATABASE_URL:
-    engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,   # <-- in-memory DB를 테스트 동안 유지
-    )
-else:
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},
-    )
+    # throwaway file DB instead of :memory: so the sync and async engines (each
+    # with their own connection pool) see the same data and can run concurrently
+    _tmpdir = tempfile.mkdtemp(prefix="sweatmarket-")
+    atexit.register(shutil.rmtree, _tmpdir, ignore_errors=True)
+    DATABASE_URL = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+
+engine = make_engine(DATABASE_URL)
+async_engine = make_async_engine(DATABASE_URL)
+
+def init_tables() -> None:
+    from . import models  # noqa: F401  (registers the tables when used outside app.main)
 
-def init_db() -> None:
     SQLModel.metadata.create_all(engine)
 
+def init_db() -> None:
+    from .migrations import run_migrations
+
+    init_tables()
+    run_migrations(engine)
+
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    # for async def routes: awaits DB I/O instead of blocking the event loop
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,79 @@
+# app/geo.py — great-circle distance and a lat/lon grid index
+#
+# GridIndex buckets points into fixed-size lat/lon cells (CELL_DEG, ~1.1 km
+# of latitude). A radius query only visits the cells overlapping the
+# radius' bounding box — 3x3 cells for radii up to one cell, a few more
+# near the poles where longitude degrees shrink — and then confirms each
+# hit with an exact haversine distance.
+
+from __future__ import annotations
+
+import math
+from typing import Generic, Hashable, Iterator, TypeVar
+
+EARTH_RADIUS_M = 6_371_008.8
+M_PER_DEG_LAT = 111_320.0
+CELL_DEG = 0.01
+
+K = TypeVar("K", bound=Hashable)
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_coords(lat: float, lon: float) -> bool:
+    return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+
+class GridIndex(Generic[K]):
+    """Points keyed by K in lat/lon cells; not thread-safe (callers lock)."""
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], dict[K, tuple[float, float]]] = {}
+        self._where: dict[K, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._where
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def add(self, key: K, lat: float, lon: float) -> None:
+        self.remove(key)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[key] = (lat, lon)
+        self._where[key] = cell
+
+    def remove(self, key: K) -> None:
+        cell = self._where.pop(key, None)
+        if cell is not None:
+            bucket = self._cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self._cells[cell]
+
+    def within(self, lat: float, lon: float, radius_m: float) -> Iterator[tuple[K, float]]:
+        """(key, distance_m) for every point within radius_m of (lat, lon)."""
+        dlat = radius_m / M_PER_DEG_LAT
+        coslat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = min(radius_m / (M_PER_DEG_LAT * coslat), 180.0)
+        c = self.cell_deg
+        lat0, lat1 = math.floor((lat - dlat) / c), math.floor((lat + dlat) / c)
+        lon0, lon1 = math.floor((lon - dlon) / c), math.floor((lon + dlon) / c)
+        for i in range(lat0, lat1 + 1):
+            for j in range(lon0, lon1 + 1):
+                bucket = self._cells.get((i, j))
+                if not bucket:
+                    continue
+                for key, (plat, plon) in bucket.items():
+                    d = haversine_m(lat, lon, plat, plon)
+                    if d <= radius_m:
+                        yield key, d
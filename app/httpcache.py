@@ -0,0 +1,253 @@
+# app/httpcache.py — conditional GET, static caching policy, compression
+#
+# Pages: routes compute an ETag from cheap version stamps (max post id, a
+# book sequence number, ...) in one small query before loading anything else;
+# a matching If-None-Match gets a bodiless 304 without the scan or rendering.
+# Pages that show user data (nicknames, avatars, the nav bar's balance) also
+# select USERS_REVISION, a counter a DB trigger bumps on every users update,
+# so a profile edit served by any worker invalidates them. Page ETags also
+# cover the viewer and BOOT_ID, which changes on deploy (new templates).
+#
+# /static: uploaded media (post/chat images, avatars) get unique names, so
+# they are served "immutable" for a year; other assets revalidate hourly.
+# A precompressed "<file>.br"/"<file>.gz" next to an asset is served in its
+# place when the client accepts it:
+#
+#   python -m app.httpcache precompress [static]
+#
+# CompressionMiddleware gzips (or, with the optional `brotli` package,
+# brotli-compresses) text responses on the fly.
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import secrets
+import sys
+import zlib
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import literal_column
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+try:  # optional
+    import brotli
+except ImportError:  # pragma: no cover - depends on environment
+    brotli = None
+
+BOOT_ID = secrets.token_hex(4)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+IMMUTABLE_PREFIXES = ("post_images/", "chat_images/", "avatars/")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+PRECOMPRESS_SUFFIXES = (".css", ".js", ".svg", ".html", ".json", ".txt", ".xml", ".map")
+
+
+# ---------- pages ----------
+# bumped by triggers on users (migration 3); select it beside a page's own stamp
+USERS_REVISION = literal_column("(SELECT value FROM revisions WHERE name = 'users')")
+
+
+def page_etag(request: Request, *stamps) -> str:
+    """Weak ETag for a server-rendered page from version stamps of its data."""
+    parts = (BOOT_ID, request.session.get("uid"), *stamps)
+    return 'W/"' + hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest() + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """A 304 if the client already has this version, else None (render as usual)."""
+    header = request.headers.get("if-none-match")
+    if header and _etag_matches(header, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return None
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# ---------- static files ----------
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with Cache-Control and precompressed .br/.gz variants."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accept or scope["method"] not in ("GET", "HEAD"):
+                continue
+            full_path, stat_result = await self._lookup(path + suffix)
+            if stat_result is None:
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            if response.status_code == 200:
+                response.headers["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept-Encoding"
+            return self._cache_headers(path, response)
+        return self._cache_headers(path, await super().get_response(path, scope))
+
+    async def _lookup(self, path: str):
+        try:
+            full_path, stat_result = await run_in_threadpool(self.lookup_path, path)
+        except (PermissionError, OSError):
+            return None, None
+        if stat_result is None or not os.path.isfile(full_path):
+            return None, None
+        return full_path, stat_result
+
+    @staticmethod
+    def _cache_headers(path: str, response: Response) -> Response:
+        if response.status_code in (200, 304):
+            normalized = path.replace(os.sep, "/")
+            if normalized.startswith(IMMUTABLE_PREFIXES):
+                response.headers["Cache-Control"] = IMMUTABLE
+            else:
+                response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+        return response
+
+
+def precompress(directory: str | Path, min_size: int = 1024) -> list[Path]:
+    """Write .gz (and .br with `brotli`) next to text assets; returns written files."""
+    written = []
+    for path in Path(directory).rglob("*"):
+        if not path.is_file() or path.suffix not in PRECOMPRESS_SUFFIXES or path.stat().st_size < min_size:
+            continue
+        data = path.read_bytes()
+        variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+        for suffix, compress in variants:
+            out = path.with_name(path.name + suffix)
+            if out.exists() and out.stat().st_mtime >= path.stat().st_mtime:
+                continue
+            out.write_bytes(compress(data))
+            written.append(out)
+    return written
+
+
+# ---------- on-the-fly compression ----------
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _gzip(level: int):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return lambda data, more: z.compress(data) + z.flush(zlib.Z_SYNC_FLUSH if more else zlib.Z_FINISH)
+
+
+def _brotli(quality: int):
+    c = brotli.Compressor(quality=quality)
+    return lambda data, more: c.process(data) + (c.flush() if more else c.finish())
+
+
+class _Responder:
+    """Compress one response's body with `make_compressor()`, or pass it through.
+
+    Bodies that are already encoded, not text-like (images, archives...) or,
+    when sent in one piece, smaller than minimum_size go out untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, encoding: str, make_compressor) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.make_compressor = make_compressor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start: Message | None = None
+        compress = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, compress
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:  # headers are out: keep going the way we started
+                if compress is not None and message["type"] == "http.response.body":
+                    more = message.get("more_body", False)
+                    message = {**message, "body": compress(message.get("body", b""), more)}
+                await send(message)
+                return
+
+            pending, start = start, None
+            body, more = message.get("body", b""), message.get("more_body", False)
+            headers = MutableHeaders(raw=pending["headers"])
+            if (
+                message["type"] != "http.response.body"
+                or "content-encoding" in headers
+                or not _compressible(headers.get("content-type", ""))
+                or (len(body) < self.minimum_size and not more)
+            ):
+                await send(pending)
+                await send(message)
+                return
+
+            compress = self.make_compressor()
+            body = compress(body, more)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await send(pending)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+        if start is not None:  # a bodiless response
+            await send(start)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and "br" in accept:
+            responder = _Responder(self.app, self.minimum_size, "br", lambda: _brotli(self.brotli_quality))
+        elif "gzip" in accept:
+            responder = _Responder(self.app, self.minimum_size, "gzip", lambda: _gzip(self.gzip_level))
+        else:
+            await self.app(scope, receive, send)
+            return
+        await responder(scope, receive, send)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] != "precompress":
+        sys.exit("usage: python -m app.httpcache precompress [directory]")
+    written = precompress(argv[1] if len(argv) > 1 else "static")
+    for p in written:
+        print(f"wrote {p}")
+    print(f"{len(written)} file(s) precompressed{'' if brotli else ' (gzip only; install brotli for .br)'}")
+
+
+if __name__ == "__main__":
+    main()
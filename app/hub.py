@@ -0,0 +1,227 @@
+# app/hub.py — per-user WebSocket delivery
+#
+# Each logged-in browser tab/device holds one socket (/ws, see chat.py) that
+# multiplexes its chat-room subscriptions and a notification channel. The hub
+# indexes open sockets by user id, so an event is routed straight to the
+# devices of the users it concerns (both members of a DM room, a post's
+# author) without scanning rooms or connections.
+#
+# Every connection has a bounded outbox drained by its own writer task: a
+# slow device can't hold up delivery to anyone else, and one whose outbox
+# fills up is disconnected (the client reconnects and reloads). Events are
+# encoded once per event and shape, not once per recipient. publish() may be
+# called from sync routes (threadpool) as well as from the event loop.
+#
+# Delivery is per process: with several workers a user only gets events
+# raised by the worker their socket is on (same as the room sockets).
+#
+# Wire format is chosen per socket with the WebSocket subprotocol:
+#
+#   sweatmarket.json      text frames, the default (browsers)
+#   sweatmarket.msgpack   binary MessagePack frames with created_at as integer
+#                         epoch milliseconds (when msgpack is installed)
+#
+# A Frame encodes its event lazily, at most once per format, however many
+# sockets it goes to. permessage-deflate is negotiated by uvicorn on top of
+# either format (--ws-per-message-deflate, on by default); unlike encoding it
+# costs CPU per socket, since every connection keeps its own zlib stream.
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from fastapi import WebSocket
+
+from . import metrics
+
+try:  # optional: compact binary frames for clients that ask for them
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+log = logging.getLogger(__name__)
+
+HUB_OUTBOX_SIZE = int(os.getenv("HUB_OUTBOX_SIZE", "256"))  # queued frames per device
+PREVIEW_CHARS = 80
+SUBPROTOCOLS = {"sweatmarket.json": "json", "sweatmarket.msgpack": "msgpack"}
+FORMATS = ("json", "msgpack") if msgpack is not None else ("json",)
+
+
+def _epoch_ms(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        if value.tzinfo is None:  # stored timestamps are naive UTC
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return value
+
+
+def encode(payload: dict, fmt: str = "json") -> str | bytes:
+    if fmt == "msgpack":
+        if "created_at" in payload:
+            payload = {**payload, "created_at": _epoch_ms(payload["created_at"])}
+        return msgpack.packb(payload, default=str)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def decode(data: str | bytes) -> Any:
+    """A client frame: text is JSON, binary is MessagePack."""
+    if isinstance(data, bytes):
+        if msgpack is None:
+            raise ValueError("binary frames need msgpack")
+        return msgpack.unpackb(data)
+    return json.loads(data)
+
+
+def negotiate(ws: WebSocket) -> tuple[str, str | None]:
+    """(format, subprotocol to accept) from the client's offered subprotocols, in its order of preference."""
+    for proto in ws.scope.get("subprotocols") or ():
+        fmt = SUBPROTOCOLS.get(proto)
+        if fmt in FORMATS:
+            return fmt, proto
+    return "json", None
+
+
+class Frame:
+    """One event, encoded at most once per wire format."""
+
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self._encoded: dict[str, str | bytes] = {}
+
+    def encoded(self, fmt: str) -> str | bytes:
+        data = self._encoded.get(fmt)
+        if data is None:
+            data = self._encoded[fmt] = encode(self.payload, fmt)
+        return data
+
+
+async def send(ws: WebSocket, data: str | bytes) -> None:
+    if isinstance(data, bytes):
+        await ws.send_bytes(data)
+    else:
+        await ws.send_text(data)
+    metrics.ws_sent_bytes.inc("binary" if isinstance(data, bytes) else "text", amount=len(data))
+
+
+class Conn:
+    """One device's socket."""
+
+    __slots__ = ("ws", "uid", "fmt", "rooms", "loop", "outbox", "writer", "closed")
+
+    def __init__(self, ws: WebSocket, uid: int, fmt: str = "json"):
+        self.ws = ws
+        self.uid = uid
+        self.fmt = fmt
+        self.rooms: set[int] = set()
+        self.loop = asyncio.get_running_loop()
+        self.outbox: asyncio.Queue[str | bytes] = asyncio.Queue(HUB_OUTBOX_SIZE)
+        self.writer: asyncio.Task | None = None
+        self.closed = False
+
+    def push(self, frame: Frame) -> None:
+        """Queue a frame in this socket's format; safe from any thread."""
+        data = frame.encoded(self.fmt)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(data)
+        else:
+            self.loop.call_soon_threadsafe(self._put, data)
+
+    def send(self, payload: dict) -> None:
+        self.push(Frame(payload))
+
+    def _put(self, data: str | bytes) -> None:
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(data)
+        except asyncio.QueueFull:
+            log.warning("hub: dropping slow socket of user %s", self.uid)
+            self.closed = True
+            asyncio.ensure_future(self.ws.close(code=1013))  # try again later
+
+    async def drain(self) -> None:
+        try:
+            while True:
+                await send(self.ws, await self.outbox.get())
+        except Exception:  # socket gone; the reader side detaches us
+            self.closed = True
+
+
+class Hub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_user: dict[int, set[Conn]] = {}
+
+    def users(self) -> int:
+        return len(self._by_user)
+
+    def connections(self, uid: int) -> int:
+        return len(self._by_user.get(uid, ()))
+
+    def attach(self, ws: WebSocket, uid: int, fmt: str = "json") -> Conn:
+        """Register an accepted socket (call from its event loop)."""
+        conn = Conn(ws, uid, fmt)
+        conn.writer = asyncio.create_task(conn.drain())
+        with self._lock:
+            self._by_user.setdefault(uid, set()).add(conn)
+        metrics.ws_connections.inc()
+        return conn
+
+    def detach(self, conn: Conn) -> None:
+        conn.closed = True
+        if conn.writer is not None:
+            conn.writer.cancel()
+        with self._lock:
+            conns = self._by_user.get(conn.uid)
+            if conns is None or conn not in conns:
+                return
+            conns.discard(conn)
+            if not conns:
+                del self._by_user[conn.uid]
+        metrics.ws_connections.dec()
+
+    def _targets(self, uids: Iterable[int]) -> list[Conn]:
+        with self._lock:
+            return [c for uid in set(uids) for c in self._by_user.get(uid, ())]
+
+    def publish(self, uids: Iterable[int], payload: dict) -> int:
+        """Send payload to every device of the given users; returns the number of sockets."""
+        targets = self._targets(uids)
+        frame = Frame(payload)
+        for conn in targets:
+            conn.push(frame)
+        return len(targets)
+
+    def room_message(self, room_id: int, members: Iterable[int], message: dict) -> int:
+        """A new chat message: the full message to devices viewing the room, an inbox notification to the rest."""
+        targets = self._targets(members)
+        full = Frame({**message, "type": "message", "kind": message["type"], "room": room_id})
+        note = Frame({
+            "type": "notify", "kind": "dm", "room": room_id, "id": message["id"],
+            "from": message["sender_id"],
+            "preview": (message.get("content") or "📷 Photo")[:PREVIEW_CHARS],
+        })
+        for conn in targets:
+            conn.push(full if room_id in conn.rooms else note)
+        return len(targets)
+
+
+hub = Hub()
+metrics.GaugeFunc("sweatmarket_ws_users", "Users with at least one open /ws socket", hub.users)
@@ -0,0 +1,256 @@
+# app/leaderboard.py — live coin and streak leaderboards
+#
+# Each board is a SortedList of packed int keys, (-score << 32) | user_id, so
+# ascending order is "highest score first, then lower id" and one small int
+# per entry keeps 1M users cheap. Updates (remove old key, add new) and rank
+# lookups (bisect) are O(log n); top-N is a slice. Only positive scores are
+# stored: everyone else shares the last place.
+#
+# There is a global board plus one per sport and per region, for coins and
+# for the current streak. Boards are bulk-loaded from the DB at startup, kept
+# current by the rewards engine (which reports new balances and streaks after
+# every batch) and profile edits, and reloaded in the background every
+# LEADERBOARD_RELOAD_SECONDS to pick up writes from other processes. Streaks
+# lapse a day after the last check-in; lapsed entries are swept by day bucket.
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Request
+from fastapi.responses import RedirectResponse
+from sortedcontainers import SortedList
+from sqlalchemy import text
+
+from .matching import normalize
+from .rewards import Streak, effective_streak, rewards
+from .templating import templates
+from .usercache import get_user, request_user
+
+log = logging.getLogger(__name__)
+
+LEADERBOARD_RELOAD_SECONDS = float(os.getenv("LEADERBOARD_RELOAD_SECONDS", "300"))
+METRICS = ("coins", "streak")
+UID_BITS = 32
+UID_MASK = (1 << UID_BITS) - 1
+
+
+def _key(score: int, uid: int) -> int:
+    return (-score << UID_BITS) | uid
+
+
+class Board:
+    def __init__(self, pairs=()):
+        self._score = {uid: s for uid, s in pairs if s > 0}
+        self._keys = SortedList(_key(s, uid) for uid, s in self._score.items())
+
+    def __len__(self) -> int:
+        return len(self._score)
+
+    def set(self, uid: int, score: int) -> None:
+        old = self._score.pop(uid, 0)
+        if old > 0:
+            self._keys.remove(_key(old, uid))
+        if score > 0:
+            self._score[uid] = score
+            self._keys.add(_key(score, uid))
+
+    def score(self, uid: int) -> int:
+        return self._score.get(uid, 0)
+
+    def top(self, n: int) -> list[tuple[int, int]]:
+        return [(k & UID_MASK, -(k >> UID_BITS)) for k in self._keys.islice(0, n)]
+
+    def rank(self, uid: int) -> int:
+        """1-based rank; users with the same score share it (1, 2, 2, 4)."""
+        return self._keys.bisect_left(_key(self.score(uid), 0)) + 1
+
+
+def _scopes(sport: str | None, region: str | None) -> list[str]:
+    out = ["all"]
+    if sport:
+        out.append(f"sport:{sport}")
+    if region:
+        out.append(f"region:{region}")
+    return out
+
+
+class Leaderboards:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._boards: dict[tuple[str, str], Board] = {}
+        self._profile: dict[int, tuple[str | None, str | None]] = {}
+        self._coins: dict[int, int] = {}
+        self._streak: dict[int, tuple[int, int]] = {}  # uid -> (current, last_checkin_day)
+        self._lapse: dict[int, set[int]] = {}  # last_checkin_day -> uids, for sweeping
+        self._replay: list[tuple] | None = None  # updates made during a reload
+        self.loaded_at = 0.0
+
+    def _board(self, metric: str, scope: str) -> Board:
+        board = self._boards.get((metric, scope))
+        if board is None:
+            board = self._boards[(metric, scope)] = Board()
+        return board
+
+    def _set(self, metric: str, uid: int, score: int) -> None:
+        for scope in _scopes(*self._profile.get(uid, (None, None))):
+            self._board(metric, scope).set(uid, score)
+
+    # ---------- writes ----------
+    def set_profile(self, uid: int, sport: str | None, region: str | None) -> None:
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("profile", uid, sport, region))
+            coins = self._coins.get(uid, 0)
+            current = self._streak.get(uid, (0, 0))[0]
+            self._set("coins", uid, 0)
+            self._set("streak", uid, 0)
+            self._profile[uid] = (sport or None, normalize(region) or None)
+            self._set("coins", uid, coins)
+            self._set("streak", uid, current)
+
+    def set_coins(self, uid: int, coins: int) -> None:
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("coins", uid, coins))
+            self._coins[uid] = coins
+            self._set("coins", uid, coins)
+
+    def set_streak(self, uid: int, current: int, last_day: int) -> None:
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("streak", uid, current, last_day))
+            _, old_day = self._streak.get(uid, (0, 0))
+            self._lapse.get(old_day, set()).discard(uid)
+            self._streak[uid] = (current, last_day)
+            self._lapse.setdefault(last_day, set()).add(uid)
+            self._set("streak", uid, current)
+
+    def on_rewards(self, balances: dict[int, int], streaks: dict[int, Streak]) -> None:
+        for uid, coins in balances.items():
+            self.set_coins(uid, coins)
+        for uid, s in streaks.items():
+            self.set_streak(uid, s.current, s.last_checkin_day)
+
+    def sweep(self, today: int) -> None:
+        """Drop streaks whose last check-in was before yesterday."""
+        with self._lock:
+            for day in [d for d in self._lapse if d < today - 1]:
+                for uid in self._lapse.pop(day):
+                    self._streak.pop(uid, None)
+                    self._set("streak", uid, 0)
+
+    # ---------- reads ----------
+    def top(self, metric: str, scope: str = "all", n: int = 50) -> list[tuple[int, int]]:
+        with self._lock:
+            board = self._boards.get((metric, scope))
+            return board.top(n) if board else []
+
+    def rank(self, metric: str, scope: str, uid: int) -> tuple[int, int]:
+        """(rank, score) of uid on a board."""
+        with self._lock:
+            board = self._boards.get((metric, scope)) or Board()
+            return board.rank(uid), board.score(uid)
+
+    # ---------- bulk load ----------
+    def load(self, users, streaks, today: int) -> int:
+        """Rebuild from (id, coins, sport, region) and (user_id, current, last_checkin_day, best) rows."""
+        with self._lock:
+            self._replay = []
+        fresh = Leaderboards()
+        per_board: dict[tuple[str, str], list[tuple[int, int]]] = {}
+        for uid, coins, sport, region in users:
+            profile = fresh._profile[uid] = (sport or None, normalize(region) or None)
+            if coins > 0:
+                fresh._coins[uid] = coins
+                for scope in _scopes(*profile):
+                    per_board.setdefault(("coins", scope), []).append((uid, coins))
+        for uid, current, last_day, best in streaks:
+            current = effective_streak(Streak(last_day, current, best), today)
+            if current > 0:
+                fresh._streak[uid] = (current, last_day)
+                fresh._lapse.setdefault(last_day, set()).add(uid)
+                for scope in _scopes(*fresh._profile.get(uid, (None, None))):
+                    per_board.setdefault(("streak", scope), []).append((uid, current))
+        fresh._boards = {key: Board(pairs) for key, pairs in per_board.items()}
+
+        with self._lock:
+            replay, self._replay = self._replay, None
+            for op, uid, *args in replay:
+                {"profile": fresh.set_profile, "coins": fresh.set_coins, "streak": fresh.set_streak}[op](uid, *args)
+            fresh.loaded_at = time.monotonic()
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != "_lock"})
+        return len(self._coins)
+
+    def load_from_db(self, engine) -> int:
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            users = conn.execute(text("SELECT id, coins, sport, region FROM users"))
+            streaks = conn.execute(text("SELECT user_id, current, last_checkin_day, best FROM streak_states "
+                                        "WHERE current > 0"))
+            n = self.load(users, streaks, _today())
+        log.info("leaderboards: %d ranked users in %.2f s", n, time.perf_counter() - t0)
+        return n
+
+    def reload_in_background(self, engine) -> None:
+        if self.loaded_at and time.monotonic() - self.loaded_at < LEADERBOARD_RELOAD_SECONDS:
+            return
+        self.loaded_at = time.monotonic()  # claim the reload
+        threading.Thread(target=self.load_from_db, args=(engine,), daemon=True).start()
+
+
+def _today() -> int:
+    return datetime.now(timezone.utc).date().toordinal()
+
+
+leaderboards = Leaderboards()
+rewards.listeners.append(leaderboards.on_rewards)
+
+
+# ---------- routes ----------
+router = APIRouter()
+
+
+@router.get("/leaderboard")
+def leaderboard_page(request: Request, metric: str = "coins", scope: str = "all"):
+    from .db import engine
+
+    me = request_user(request)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    leaderboards.reload_in_background(engine)
+    leaderboards.sweep(_today())
+
+    metric = metric if metric in METRICS else "coins"
+    scopes = {"all": "Everyone"}
+    if me.sport:
+        scopes[f"sport:{me.sport}"] = me.sport.title()
+    if me.region:
+        scopes[f"region:{normalize(me.region)}"] = me.region
+    if scope not in scopes:
+        scope = "all"
+
+    rows, rank, prev = [], 0, None
+    for i, (uid, score) in enumerate(leaderboards.top(metric, scope, 50), start=1):
+        if score != prev:  # ties share a rank, as in rank(); skipped users still take their place
+            rank, prev = i, score
+        if (u := get_user(uid)) is not None:
+            rows.append((rank, u, score))
+    my_rank, my_score = leaderboards.rank(metric, scope, me.id)
+    return templates.TemplateResponse(
+        request,
+        "leaderboard.html",
+        {
+            "user": me,
+            "rows": rows,
+            "metric": metric,
+            "scope": scope,
+            "scopes": scopes,
+            "my_rank": my_rank,
+            "my_score": my_score,
+        },
+    )
@@ -18,33 +18,48 @@ try:
 except Exception:
     pass
 
-from fastapi import FastAPI, Request, Form, UploadFile, File
+from fastapi import FastAPI, Request, Form, UploadFile, File, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-from sqlmodel import Session as SQLSession, select
+from sqlmodel import Session as SQLSession, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 # ---- Project modules
-from .db import init_db, engine
+from .db import init_db, engine, async_engine, get_async_session
 from .auth import router as auth_router
+from .posts import router as posts_router
+from .sessions import ServerSessionMiddleware, session_store
+from .ratelimit import DEFAULT_RULES, RATE_LIMIT_ENABLED, RateLimitMiddleware, rules_from_env
+from .sqlstats import QueryStatsMiddleware, instrument, router as sqlstats_router
+from .profiler import ProfilerMiddleware, router as profiler_router
+from . import metrics
 
 try:
     from .chat import router as chat_router  # DM(WebSocket)
 except Exception:
     chat_router = None  # optional
 
-from .models import User, Tx, Order, Post
-
-# ---- Templates / Static
-templates = Jinja2Templates(directory="app/templates")
-
-# Post image folder (served via /static)
+from .models import Tx, Order, Post, StreakState, User
+from .usercache import get_user, request_user
+from .templating import precompile, templates
+from .matching import matcher, router as matching_router
+from .checkins import checkin_index, router as checkins_router
+from .offers import router as offers_router
+from .leaderboard import leaderboards, router as leaderboard_router
+from .typeahead import people, router as typeahead_router
+from .api import APIError, api_error_handler, router as api_router
+from .rewards import rewards, streak_value
+from .httpcache import CachedStaticFiles, CompressionMiddleware, not_modified, page_etag, with_etag, USERS_REVISION
+
+# ---- Static
+# Post image folder (served via /static); created in lifespan, not at import
 POST_IMG_DIR = Path("static/post_images")
-POST_IMG_DIR.mkdir(parents=True, exist_ok=True)
+POSTS_PAGE_SIZE = int(os.getenv("POSTS_PAGE_SIZE", "30"))
 
 # ---- DEX demo storage
 _MOCK_ORDERS: Dict[str, List[Dict[str, int]]] = {"buy": [], "sell": []}
+_MOCK_SEQ = 0  # bumped on every demo order; version stamp for /dex?demo=1 ETags
 
 
 def _seed_mock_orders() -> None:
@@ -66,23 +81,63 @@ logging.getLogger("uvicorn").info(f"DATABASE_URL={os.getenv('DATABASE_URL')}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    POST_IMG_DIR.mkdir(parents=True, exist_ok=True)
     init_db()
+    precompile()
+    matcher.load_from_db(engine)
+    checkin_index.load_from_db(engine)
+    rewards.start()
+    leaderboards.load_from_db(engine)
+    people.load_from_db(engine)
     _seed_mock_orders()
     yield
+    if session_store is not None:
+        session_store.flush()
+    metrics.flush(force=True)
 
 
 app = FastAPI(title="SweatMarket", lifespan=lifespan)
 
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.getenv("SECRET_KEY", "dev-secret"),
-    session_cookie="sweatmarket_session",
-)
+instrument(engine)
+instrument(async_engine.sync_engine)
+app.add_middleware(ProfilerMiddleware)  # inside QueryStatsMiddleware: reads its per-request SQL stats
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# added before the session middleware so it runs inside it (per-uid keys)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, rules=rules_from_env(DEFAULT_RULES))
+
+if session_store is None:
+    app.add_middleware(
+        SessionMiddleware,
+        secret_key=os.getenv("SECRET_KEY", "dev-secret"),
+        session_cookie="sweatmarket_session",
+    )
+else:
+    app.add_middleware(
+        ServerSessionMiddleware,
+        store=session_store,
+        session_cookie="sweatmarket_session",
+    )
+
+app.add_middleware(CompressionMiddleware)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 # ---- Routers
 app.include_router(auth_router)
+app.include_router(posts_router)  # POST /posts, /posts/{id}, comments
+app.include_router(sqlstats_router)  # /debug/sql
+app.include_router(profiler_router)  # /debug/profiles
+app.include_router(metrics.router)  # /metrics
+app.include_router(matching_router)  # /partners
+app.include_router(checkins_router)  # /sessions/*, /session/{sid}
+app.include_router(offers_router)  # /offers
+app.include_router(leaderboard_router)  # /leaderboard
+app.include_router(typeahead_router)  # /users/search
+app.include_router(api_router)  # /api/v1/*
+app.add_exception_handler(APIError, api_error_handler)
 if chat_router:
     app.include_router(chat_router)  # /chat, /ws/chat/*
 
@@ -92,11 +147,7 @@ if chat_router:
 # =========================================================
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
-    uid = request.session.get("uid")
-    user = None
-    if uid:
-        with SQLSession(engine) as s:
-            user = s.exec(select(User).where(User.id == uid)).first()
+    user = request_user(request)
     return templates.TemplateResponse(request, "index.html", {"user": user})
 
 
@@ -109,29 +160,36 @@ def health():
 #                       Posts (Part A)
 # =========================================================
 @app.get("/posts", response_class=HTMLResponse)
-def posts_list(request: Request):
-    uid = request.session.get("uid")
+def posts_list(request: Request, before: int | None = None):
     with SQLSession(engine) as s:
-        user_for_nav = s.get(User, uid) if uid else None
-        posts = s.exec(select(Post).order_by(Post.created_at.desc())).all()
-        authors = {p.author_id: s.get(User, p.author_id) for p in posts}
-
-    return templates.TemplateResponse(
-        request,
-        "posts_list.html",
-        {"user": user_for_nav, "posts": posts, "authors": authors},
+        # posts are append-only: the newest id versions every page
+        etag = page_etag(request, "posts", before, *s.exec(select(func.max(Post.id), USERS_REVISION)).one())
+        if (cached := not_modified(request, etag)) is not None:
+            return cached
+        user_for_nav = request_user(request, s)
+        # newest page by default; ?before=<id> walks back (keyset, so deep pages cost the same)
+        q = select(Post).order_by(Post.id.desc()).limit(POSTS_PAGE_SIZE + 1)
+        posts = s.exec(q.where(Post.id < before) if before is not None else q).all()
+        older = posts[POSTS_PAGE_SIZE - 1].id if len(posts) > POSTS_PAGE_SIZE else None
+        posts = posts[:POSTS_PAGE_SIZE]
+        authors = {p.author_id: get_user(p.author_id, s) for p in posts}
+
+    return with_etag(
+        templates.TemplateResponse(
+            request,
+            "posts_list.html",
+            {"user": user_for_nav, "posts": posts, "authors": authors, "older": older},
+        ),
+        etag,
     )
 
 
 @app.get("/posts/new", response_class=HTMLResponse)
 def posts_new_page(request: Request):
-    uid = request.session.get("uid")
-    if not uid:
+    user = request_user(request)
+    if not user:
         return RedirectResponse("/login", status_code=303)
 
-    with SQLSession(engine) as s:
-        user = s.get(User, uid)
-
     return templates.TemplateResponse(request, "posts_new.html", {"user": user})
 
 
@@ -140,6 +198,7 @@ async def posts_new(
     request: Request,
     caption: str = Form(...),
     image: UploadFile | None = File(None),
+    session: AsyncSession = Depends(get_async_session),
 ):
     uid = request.session.get("uid")
     if not uid:
@@ -150,12 +209,14 @@ async def posts_new(
         suffix = Path(image.filename).suffix or ".png"
         fname = f"{uuid4().hex}{suffix}"
         dest = POST_IMG_DIR / fname
-        dest.write_bytes(await image.read())
+        data = await image.read()
+        metrics.upload_bytes.inc("post", amount=len(data))
+        await run_in_threadpool(dest.write_bytes, data)
         image_url = f"/static/post_images/{fname}"
 
-    with SQLSession(engine) as s:
-        s.add(Post(author_id=uid, caption=caption, image_url=image_url))
-        s.commit()
+    session.add(Post(author_id=uid, caption=caption, image_url=image_url))
+    await session.commit()
+    rewards.run_in_background()  # first post of the day earns coins
 
     return RedirectResponse("/posts", status_code=303)
 
@@ -165,12 +226,7 @@ async def posts_new(
 # =========================================================
 @app.get("/wallet", response_class=HTMLResponse)
 def wallet_page(request: Request) -> HTMLResponse:
-    uid = request.session.get("uid")
-
-    user_for_nav = None
-    if uid:
-        with SQLSession(engine) as s:
-            user_for_nav = s.get(User, uid)
+    user_for_nav = request_user(request)
 
     if _is_demo(request):
         demo_user = type("U", (), {"coins": 42})()
@@ -182,22 +238,32 @@ def wallet_page(request: Request) -> HTMLResponse:
         return templates.TemplateResponse(
             request,
             "wallet.html",
-            {"u": demo_user, "txs": txs, "demo": True, "user": user_for_nav},
+            {"u": demo_user, "txs": txs, "streak": 3, "demo": True, "user": user_for_nav},
         )
 
-    if not uid:
+    if not request.session.get("uid"):
         return RedirectResponse("/login", status_code=303)
 
+    u = user_for_nav
+    if not u:
+        return HTMLResponse("<h2>Wallet</h2><p>User not found.</p>", status_code=404)
     with SQLSession(engine) as s:
-        u = s.get(User, uid)
-        if not u:
-            return HTMLResponse("<h2>Wallet</h2><p>User not found.</p>", status_code=404)
-        txs = s.exec(select(Tx).where(Tx.user_id == uid).order_by(Tx.id.desc())).all()
+        # one round trip: the user's streak row rides along with every Tx row
+        rows = s.exec(
+            select(StreakState, Tx)
+            .select_from(User)
+            .outerjoin(StreakState, StreakState.user_id == User.id)
+            .outerjoin(Tx, Tx.user_id == User.id)
+            .where(User.id == u.id)
+            .order_by(Tx.id.desc())
+        ).all()
+    txs = [tx for _, tx in rows if tx is not None]
+    streak = streak_value(rows[0][0] if rows else None)
 
     return templates.TemplateResponse(
         request,
         "wallet.html",
-        {"u": u, "txs": txs, "demo": False, "user": u},
+        {"u": u, "txs": txs, "streak": streak, "demo": False, "user": u},
     )
 
 
@@ -206,25 +272,30 @@ def wallet_page(request: Request) -> HTMLResponse:
 # =========================================================
 @app.get("/dex", response_class=HTMLResponse)
 def dex_page(request: Request) -> HTMLResponse:
-    uid = request.session.get("uid")
-    user_for_nav = None
-    if uid:
-        with SQLSession(engine) as s:
-            user_for_nav = s.get(User, uid)
-
     if _is_demo(request):
+        etag = page_etag(request, "dex-demo", _MOCK_SEQ)
+        if (cached := not_modified(request, etag)) is not None:
+            return cached
         buys = sorted(_MOCK_ORDERS["buy"], key=lambda o: o["price"], reverse=True)
         sells = sorted(_MOCK_ORDERS["sell"], key=lambda o: o["price"])
-        return templates.TemplateResponse(
-            request,
-            "dex.html",
-            {"buys": buys, "sells": sells, "demo": True, "user": user_for_nav},
+        return with_etag(
+            templates.TemplateResponse(
+                request,
+                "dex.html",
+                {"buys": buys, "sells": sells, "demo": True, "user": request_user(request)},
+            ),
+            etag,
         )
 
+    user_for_nav = request_user(request)
     try:
         with SQLSession(engine) as s:
-            buys = s.exec(select(Order).where(Order.side == "buy").order_by(Order.price.desc())).all()
-            sells = s.exec(select(Order).where(Order.side == "sell").order_by(Order.price.asc())).all()
+            # orders are append-only: the newest id versions the book
+            etag = page_etag(request, "dex", *s.exec(select(func.max(Order.id), USERS_REVISION)).one())
+            if (cached := not_modified(request, etag)) is not None:
+                return cached
+            # plain rows, not ORM objects: the page renders the whole book
+            book = s.exec(select(Order.id, Order.side, Order.price, Order.amount).order_by(Order.price.desc())).all()
     except Exception as e:
         buys = sorted(_MOCK_ORDERS["buy"], key=lambda o: o["price"], reverse=True)
         sells = sorted(_MOCK_ORDERS["sell"], key=lambda o: o["price"])
@@ -234,10 +305,16 @@ def dex_page(request: Request) -> HTMLResponse:
             {"buys": buys, "sells": sells, "demo": True, "user": user_for_nav, "error": str(e)},
         )
 
-    return templates.TemplateResponse(
-        request,
-        "dex.html",
-        {"buys": buys, "sells": sells, "demo": False, "user": user_for_nav},
+    buys = [o for o in book if o.side == "buy"]
+    sells = [o for o in reversed(book) if o.side == "sell"]
+
+    return with_etag(
+        templates.TemplateResponse(
+            request,
+            "dex.html",
+            {"buys": buys, "sells": sells, "demo": False, "user": user_for_nav},
+        ),
+        etag,
     )
 
 
@@ -245,10 +322,13 @@ def dex_page(request: Request) -> HTMLResponse:
 def dex_new(
     request: Request, side: str = Form(...), price: int = Form(...), amount: int = Form(...)
 ) -> RedirectResponse:
+    global _MOCK_SEQ
     if _is_demo(request):
         if side not in ("buy", "sell"):
             side = "buy"
         _MOCK_ORDERS[side].append({"price": int(price), "amount": int(amount)})
+        _MOCK_SEQ += 1
+        metrics.dex_orders.inc(side, "demo")
         return RedirectResponse("/dex?demo=1", status_code=303)
 
     uid = request.session.get("uid")
@@ -258,4 +338,5 @@ def dex_new(
     with SQLSession(engine) as s:
         s.add(Order(user_id=uid, side=side, price=price, amount=amount))
         s.commit()
+    metrics.dex_orders.inc(side if side in ("buy", "sell") else "other", "db")
     return RedirectResponse("/dex", status_code=303)
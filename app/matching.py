@@ -0,0 +1,356 @@
+# app/matching.py — in-memory workout partner matching
+#
+# Profiles live in a compact column table (array.array, indexed by user id)
+# plus an inverted index keyed by (sport, region, time bucket) whose postings
+# are int arrays. A query unions the postings for the caller's sport/region/
+# time buckets and scores the candidates in one batch (NumPy when installed,
+# a plain loop otherwise), so top-K stays in the milliseconds at 1M users.
+#
+# Updates are incremental (signup/profile_update call `matcher.upsert`).
+# Postings are append-only: a user who moves to another key leaves a stale
+# entry behind, which queries filter out against the table and compaction
+# drops once a posting is mostly stale. The index is per process; it is
+# rebuilt from the DB at startup and, in the background, every
+# MATCHING_RELOAD_SECONDS so edits handled by other workers show up.
+
+from __future__ import annotations
+
+import functools
+import heapq
+import importlib.util
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable
+
+from fastapi import APIRouter, Request
+from fastapi.responses import RedirectResponse
+from sqlalchemy import text
+
+from .templating import templates
+from .usercache import get_user, request_user
+
+# optional: vectorized scoring. Imported on the first numpy query, not at
+# startup: it is the single heaviest import in the app.
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+@functools.cache
+def _np():
+    import numpy
+
+    return numpy
+
+log = logging.getLogger(__name__)
+
+MATCHING_RELOAD_SECONDS = float(os.getenv("MATCHING_RELOAD_SECONDS", "600"))
+
+SPORTS = ("gym", "soccer", "running", "others")
+# free-text time_window -> bucket bits; several may match ("weekday mornings, weekends")
+TIME_BUCKETS = (
+    ("morning", re.compile(r"morning|dawn|early|\bam\b|[5-9]\s*am")),
+    ("lunch", re.compile(r"lunch|noon|midday")),
+    ("afternoon", re.compile(r"afternoon|\bpm\b")),
+    ("evening", re.compile(r"evening|after work|dinner")),
+    ("night", re.compile(r"night|late")),
+    ("weekend", re.compile(r"weekend|saturday|sunday|sat\b|sun\b")),
+)
+ANY_TIME = -1  # bucket key for users without a usable time window: they match any time
+POPCOUNT = [bin(i).count("1") for i in range(1 << len(TIME_BUCKETS))]
+BUCKETS_OF = [[b for b in range(len(TIME_BUCKETS)) if m >> b & 1] or [ANY_TIME] for m in range(1 << len(TIME_BUCKETS))]
+
+GOAL_WEIGHT = 1.5
+OVERLAP_WEIGHT = 1.0
+AGE_WEIGHT = 0.1  # per year of difference, capped
+AGE_CAP = 20
+UNKNOWN_AGE_PENALTY = 0.5
+
+
+@functools.lru_cache(maxsize=4096)  # few distinct strings, millions of rows at load
+def time_mask(time_window: str | None) -> int:
+    t = (time_window or "").casefold()
+    return sum(1 << i for i, (_, rx) in enumerate(TIME_BUCKETS) if rx.search(t))
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(value: str | None) -> str:
+    return " ".join((value or "").casefold().split())
+
+
+@dataclass(frozen=True)
+class Profile:
+    sport: str | None
+    region: str | None
+    time_window: str | None
+    goal: str | None
+    birth_date: date | str | None
+
+    @classmethod
+    def from_user(cls, user) -> "Profile":
+        return cls(user.sport, user.region, user.time_window, user.goal, user.birth_date)
+
+
+def _birth_year(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, date):
+        return value.year
+    try:
+        return int(str(value)[:4])
+    except ValueError:
+        return 0
+
+
+class Matcher:
+    def __init__(self, use_numpy: bool = HAS_NUMPY):
+        self.use_numpy = use_numpy and HAS_NUMPY
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            # columns, indexed by user id; sport == -1 means "not matchable"
+            self.sport = array("b")
+            self.region = array("i")
+            self.mask = array("B")
+            self.birth_year = array("H")
+            self.goal = array("i")
+            self._regions: dict[str, int] = {}
+            self._goals: dict[str, int] = {"": 0}
+            self._postings: dict[tuple[int, int, int], array] = {}
+            self._np_cache: dict[tuple[int, int, int], object] = {}
+            self.count = 0
+            self.loaded_at = 0.0
+            self._replay: dict[int, Profile] | None = None  # upserts made during a rebuild
+
+    # ---------- writes ----------
+    def _code(self, table: dict[str, int], value: str) -> int:
+        code = table.get(value)
+        if code is None:
+            code = table[value] = len(table)
+        return code
+
+    def _grow(self, uid: int) -> None:
+        missing = uid + 1 - len(self.sport)
+        if missing > 0:
+            self.sport.extend([-1] * missing)
+            for col in (self.region, self.mask, self.birth_year, self.goal):
+                col.extend([0] * missing)
+
+    def _keys(self, uid: int) -> list[tuple[int, int, int]]:
+        s, r = self.sport[uid], self.region[uid]
+        return [(s, r, b) for b in BUCKETS_OF[self.mask[uid]]] if s >= 0 else []
+
+    def upsert(self, uid: int, profile: Profile) -> None:
+        sport = SPORTS.index(profile.sport) if profile.sport in SPORTS else -1
+        region = normalize(profile.region)
+        with self._lock:
+            if self._replay is not None:
+                self._replay[uid] = profile
+            self._grow(uid)
+            old = set(self._keys(uid))
+            if self.sport[uid] < 0 and sport >= 0:
+                self.count += 1
+            elif self.sport[uid] >= 0 and sport < 0:
+                self.count -= 1
+            self.sport[uid] = sport
+            self.region[uid] = self._code(self._regions, region)
+            self.mask[uid] = time_mask(profile.time_window)
+            self.birth_year[uid] = _birth_year(profile.birth_date)
+            self.goal[uid] = self._code(self._goals, normalize(profile.goal))
+            for key in set(self._keys(uid)) - old:
+                posting = self._postings.get(key)
+                if posting is None:
+                    posting = self._postings[key] = array("i")
+                posting.append(uid)
+                self._np_cache.pop(key, None)
+
+    def remove(self, uid: int) -> None:
+        with self._lock:
+            if uid < len(self.sport) and self.sport[uid] >= 0:
+                self.sport[uid] = -1
+                self.count -= 1
+
+    def load(self, rows: Iterable[tuple]) -> int:
+        """Bulk (re)build from (id, sport, region, time_window, goal, birth_date) rows."""
+        with self._lock:
+            self._replay = {}
+        fresh = Matcher(self.use_numpy)
+        rows = list(rows)
+        fresh._grow(max((row[0] for row in rows), default=0))
+        sport_col, region_col, mask_col = fresh.sport, fresh.region, fresh.mask
+        year_col, goal_col = fresh.birth_year, fresh.goal
+        postings: dict[tuple[int, int, int], list[int]] = {}
+        # same as upsert() per row, minus the locking and set bookkeeping
+        for uid, sport, region, time_window, goal, birth_date in rows:
+            if sport not in SPORTS:
+                continue
+            s = sport_col[uid] = SPORTS.index(sport)
+            r = region_col[uid] = fresh._code(fresh._regions, normalize(region))
+            m = mask_col[uid] = time_mask(time_window)
+            year_col[uid] = _birth_year(birth_date)
+            goal_col[uid] = fresh._code(fresh._goals, normalize(goal))
+            for b in BUCKETS_OF[m]:
+                postings.setdefault((s, r, b), []).append(uid)
+            fresh.count += 1
+        fresh._postings = {key: array("i", uids) for key, uids in postings.items()}
+        with self._lock:
+            # the rows may predate upserts that happened while we were reading them
+            for uid, profile in self._replay.items():
+                fresh.upsert(uid, profile)
+            fresh.loaded_at = time.monotonic()
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != "_lock"})
+        return self.count
+
+    def load_from_db(self, engine) -> int:
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT id, sport, region, time_window, goal, birth_date FROM users WHERE sport IS NOT NULL"
+            ))
+            n = self.load(rows)
+        log.info("matching index: %d profiles in %.2f s", n, time.perf_counter() - t0)
+        return n
+
+    def reload_in_background(self, engine) -> None:
+        if self.loaded_at and time.monotonic() - self.loaded_at < MATCHING_RELOAD_SECONDS:
+            return
+        self.loaded_at = time.monotonic()  # claim the reload
+        threading.Thread(target=self.load_from_db, args=(engine,), daemon=True).start()
+
+    # ---------- reads ----------
+    def _candidates_live(self, key: tuple[int, int, int]) -> array:
+        """Posting for key without stale entries (compacted in place when mostly stale)."""
+        posting = self._postings.get(key)
+        if not posting:
+            return array("i")
+        s, r, b = key
+        live = array("i", (u for u in posting if self.sport[u] == s and self.region[u] == r
+                           and (self.mask[u] >> b & 1 if b != ANY_TIME else not self.mask[u])))
+        if len(live) * 2 < len(posting):
+            self._postings[key] = live
+            self._np_cache.pop(key, None)
+        return live
+
+    def top_k(self, uid: int, k: int = 20) -> list[tuple[int, float]]:
+        """Best partners for uid as [(user_id, score)], highest score first."""
+        with self._lock:
+            if uid >= len(self.sport) or self.sport[uid] < 0:
+                return []
+            s, r, m = self.sport[uid], self.region[uid], self.mask[uid]
+            # people with a time window overlap, plus people who didn't give one;
+            # without a window of our own, everyone in our sport and region
+            buckets = [b for b in range(len(TIME_BUCKETS)) if m >> b & 1] if m else range(len(TIME_BUCKETS))
+            keys = [(s, r, b) for b in buckets] + [(s, r, ANY_TIME)]
+            if self.use_numpy:
+                return self._top_k_numpy(uid, keys, k)
+            return self._top_k_python(uid, keys, k)
+
+    def _top_k_python(self, uid, keys, k):
+        seen = set()
+        for key in keys:
+            seen.update(self._candidates_live(key))
+        seen.discard(uid)
+        m, g, y = self.mask[uid], self.goal[uid], self.birth_year[uid]
+        mask, goal, year = self.mask, self.goal, self.birth_year
+
+        def score(c: int) -> float:
+            sc = OVERLAP_WEIGHT * POPCOUNT[mask[c] & m]
+            if g and goal[c] == g:
+                sc += GOAL_WEIGHT
+            if y and year[c]:
+                sc -= AGE_WEIGHT * min(abs(year[c] - y), AGE_CAP)
+            else:
+                sc -= UNKNOWN_AGE_PENALTY
+            return sc
+
+        best = heapq.nlargest(k, seen, key=lambda c: (score(c), -c))
+        return [(c, round(score(c), 3)) for c in best]
+
+    def _np_posting(self, key):
+        cached = self._np_cache.get(key)
+        if cached is None:
+            np = _np()
+            posting = self._postings.get(key)
+            cached = self._np_cache[key] = (np.frombuffer(posting, dtype=np.int32).copy()
+                                            if posting else np.empty(0, dtype=np.int32))
+        return cached
+
+    def _top_k_numpy(self, uid, keys, k):
+        np = _np()
+        sport = np.frombuffer(self.sport, dtype=np.int8)
+        region = np.frombuffer(self.region, dtype=np.int32)
+        mask = np.frombuffer(self.mask, dtype=np.uint8)
+        goal = np.frombuffer(self.goal, dtype=np.int32)
+        year = np.frombuffer(self.birth_year, dtype=np.uint16).astype(np.int32)
+
+        parts = []
+        for key in keys:
+            cand = self._np_posting(key)
+            if not len(cand):
+                continue
+            s, r, b = key
+            ok = (sport[cand] == s) & (region[cand] == r)
+            ok &= ((mask[cand] >> b) & 1).astype(bool) if b != ANY_TIME else mask[cand] == 0
+            parts.append(cand[ok])
+            if len(parts[-1]) * 2 < len(cand):
+                self._postings[key] = array("i", parts[-1].tobytes())
+                self._np_cache[key] = parts[-1]
+        if not parts:
+            return []
+        cand = np.unique(np.concatenate(parts))
+        cand = cand[cand != uid]
+        if not len(cand):
+            return []
+
+        m, g, y = self.mask[uid], self.goal[uid], self.birth_year[uid]
+        score = OVERLAP_WEIGHT * np.asarray(POPCOUNT, dtype=np.float64)[mask[cand] & m]
+        if g:
+            score += GOAL_WEIGHT * (goal[cand] == g)
+        cy = year[cand]
+        if y:
+            known = cy > 0
+            score -= np.where(known, AGE_WEIGHT * np.minimum(np.abs(cy - y), AGE_CAP), UNKNOWN_AGE_PENALTY)
+        else:
+            score -= UNKNOWN_AGE_PENALTY
+
+        if len(cand) > k:
+            # everything above the k-th best score, then ties by lower id (cand is sorted)
+            kth = np.partition(score, len(score) - k)[len(score) - k]
+            above = np.flatnonzero(score > kth)
+            ties = np.flatnonzero(score == kth)[: k - len(above)]
+            idx = np.concatenate((above, ties))
+            cand, score = cand[idx], score[idx]
+        order = np.lexsort((cand, -score))  # score desc, then lower id
+        return [(int(c), round(float(sc), 3)) for c, sc in zip(cand[order], score[order])]
+
+
+matcher = Matcher()
+
+
+# ---------- routes ----------
+router = APIRouter()
+
+
+@router.get("/partners")
+def partners(request: Request, k: int = 20):
+    from .db import engine
+
+    me = request_user(request)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    matcher.reload_in_background(engine)
+
+    k = max(1, min(k, 100))
+    results = [(get_user(uid), score) for uid, score in matcher.top_k(me.id, k)]
+    return templates.TemplateResponse(
+        request,
+        "partners.html",
+        {"user": me, "partners": [(u, score) for u, score in results if u is not None],
+         "has_profile": bool(me.sport)},
+    )
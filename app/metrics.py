@@ -0,0 +1,300 @@
+# app/metrics.py — Prometheus text-format metrics without extra dependencies
+#
+# Writes are lock-free: every metric keeps one value dict per thread
+# (threading.local) and only the scrape sums the shards. The event loop and
+# each threadpool worker therefore update their own dicts without contention.
+#
+# Multiple uvicorn workers: set METRICS_DIR to a shared directory. Each worker
+# dumps its snapshot there (at most every METRICS_FLUSH_INTERVAL seconds, from
+# a threadpool worker so the event loop never waits on the file, and on every
+# scrape), and /metrics merges all files: counters and histograms are summed
+# across every worker that ever ran, gauges only across live ones.
+
+from __future__ import annotations
+
+import abc
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Callable, Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _values(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            d = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(d)
+            return d
+
+    @abc.abstractmethod
+    def samples(self) -> dict[tuple, object]:
+        """Label tuple -> value, summed over every thread's shard."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        d = self._values()
+        d[labels] = d.get(labels, 0) + amount
+
+    def samples(self) -> dict[tuple, float]:
+        out: dict[tuple, float] = {}
+        for shard in list(self._shards):
+            for k, v in list(shard.items()):
+                out[k] = out.get(k, 0) + v
+        return out
+
+
+class Gauge(Counter):
+    """Up/down gauge; shards sum just like a counter."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class GaugeFunc(_Metric):
+    """Gauge read from a callback at scrape time (e.g. len(manager.rooms))."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def samples(self) -> dict[tuple, float]:
+        return {(): float(self.fn())}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        d = self._values()
+        h = d.get(labels)
+        if h is None:
+            # [count per bucket..., +Inf bucket, sum]
+            h = d[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        h[bisect.bisect_left(self.buckets, value)] += 1
+        h[-1] += value
+
+    def samples(self) -> dict[tuple, list]:
+        out: dict[tuple, list] = {}
+        for shard in list(self._shards):
+            for k, h in list(shard.items()):
+                acc = out.get(k)
+                out[k] = list(h) if acc is None else [a + b for a, b in zip(acc, h)]
+        return out
+
+
+REGISTRY: list[_Metric] = []
+
+
+# ---------- app metrics ----------
+http_requests = Counter("sweatmarket_http_requests_total", "HTTP requests", ("method", "route", "status"))
+http_latency = Histogram("sweatmarket_http_request_duration_seconds", "HTTP latency", ("method", "route"))
+http_in_flight = Gauge("sweatmarket_http_requests_in_flight", "HTTP requests being served")
+ws_connections = Gauge("sweatmarket_ws_connections", "Open chat WebSocket connections")
+ws_sent_bytes = Counter("sweatmarket_ws_sent_bytes_total", "WebSocket payload bytes sent, before permessage-deflate",
+                        ("frame",))
+chat_messages = Counter("sweatmarket_chat_messages_total", "Chat messages stored and broadcast", ("type",))
+dex_orders = Counter("sweatmarket_dex_orders_total", "DEX orders placed", ("side", "mode"))
+upload_bytes = Counter("sweatmarket_upload_bytes_total", "Bytes received in file uploads", ("kind",))
+
+
+# ---------- exposition ----------
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _local_snapshot() -> dict:
+    return {
+        m.name: {
+            "kind": m.kind,
+            "help": m.help,
+            "labelnames": list(m.labelnames),
+            "buckets": list(getattr(m, "buckets", ())),
+            "samples": [[list(k), v] for k, v in m.samples().items()],
+        }
+        for m in REGISTRY
+    }
+
+
+def render(snapshot: dict) -> str:
+    lines = []
+    for name, m in snapshot.items():
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        names = tuple(m["labelnames"])
+        for labels, v in sorted(m["samples"], key=lambda s: s[0]):
+            labels = tuple(labels)
+            if m["kind"] != "histogram":
+                lines.append(f"{name}{_fmt_labels(names, labels)} {_fmt_value(v)}")
+                continue
+            cumulative = 0
+            for bound, n in zip(list(m["buckets"]) + ["+Inf"], v[:-1]):
+                cumulative += n
+                le = 'le="' + (bound if bound == "+Inf" else _fmt_value(bound)) + '"'
+                lines.append(f"{name}_bucket{_fmt_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_fmt_labels(names, labels)} {_fmt_value(v[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- multi-worker ----------
+_last_flush = 0.0
+
+
+def _flush_due(force: bool = False) -> bool:
+    global _last_flush
+    now = time.monotonic()
+    if not METRICS_DIR or (not force and now - _last_flush < METRICS_FLUSH_INTERVAL):
+        return False
+    _last_flush = now
+    return True
+
+
+def _write_snapshot() -> None:
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"worker-{os.getpid()}.json")
+    tmp = f"{path}.{threading.get_ident()}.tmp"  # a scrape may write while the middleware does
+    with open(tmp, "w") as f:
+        json.dump({"pid": os.getpid(), "metrics": _local_snapshot()}, f)
+    os.replace(tmp, path)
+
+
+def flush(force: bool = False) -> None:
+    """Write this worker's snapshot to METRICS_DIR (no-op without it)."""
+    if _flush_due(force):
+        _write_snapshot()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(snapshots: list[tuple[bool, dict]]) -> dict:
+    """Merge (alive, snapshot) pairs: sum counters/histograms, gauges of live workers only."""
+    merged: dict = {}
+    for alive, snap in snapshots:
+        for name, m in snap.items():
+            if m["kind"] == "gauge" and not alive:
+                continue
+            out = merged.setdefault(name, {**m, "samples": {}})
+            for labels, v in m["samples"]:
+                key = tuple(labels)
+                prev = out["samples"].get(key)
+                if prev is None:
+                    out["samples"][key] = v
+                elif isinstance(v, list):
+                    out["samples"][key] = [a + b for a, b in zip(prev, v)]
+                else:
+                    out["samples"][key] = prev + v
+    for m in merged.values():
+        m["samples"] = [[list(k), v] for k, v in m["samples"].items()]
+    return merged
+
+
+def collect() -> str:
+    if not METRICS_DIR:
+        return render(_local_snapshot())
+    flush(force=True)
+    snaps = []
+    for fname in os.listdir(METRICS_DIR):
+        if not (fname.startswith("worker-") and fname.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, fname)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        snaps.append((_pid_alive(data["pid"]), data["metrics"]))
+    return render(merge(snaps))
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+        http_in_flight.inc()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            method = scope["method"]
+            http_latency.observe(time.perf_counter() - t0, method, route)
+            http_requests.inc(method, route, str(status))
+            if _flush_due():
+                await run_in_threadpool(_write_snapshot)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(collect(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,205 @@
+# app/migrations.py — versioned, idempotent schema migrations
+#
+# `init_db()` still runs `create_all` for brand-new tables; everything that
+# changes an *existing* table (columns, indexes) goes here so old databases
+# catch up. Applied versions are recorded in `schema_migrations`.
+#
+#   python -m app.migrations            # apply pending migrations
+#   python -m app.migrations status     # list applied / pending
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str):
+    def deco(fn: Callable[[sqlite3.Cursor], None]):
+        assert all(m.version != version for m in MIGRATIONS), f"duplicate migration {version}"
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+
+    return deco
+
+
+# ---------- helpers ----------
+def has_column(cur: sqlite3.Cursor, table: str, col: str) -> bool:
+    cur.execute(f"PRAGMA table_info({table})")
+    return any(r[1] == col for r in cur.fetchall())
+
+
+def add_column_if_missing(cur: sqlite3.Cursor, table: str, col_stmt: str) -> None:
+    # col_stmt example: "is_active INTEGER NOT NULL DEFAULT 1"
+    if not has_column(cur, table, col_stmt.split()[0]):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {col_stmt}")
+
+
+# ---------- migrations ----------
+@migration(1, "user_profile_columns")
+def _user_profile_columns(cur: sqlite3.Cursor) -> None:
+    # replaces the old one-off migrate_add_profile_fields.py script
+    for col in (
+        "coins INTEGER NOT NULL DEFAULT 0",
+        "is_active INTEGER NOT NULL DEFAULT 1",
+        "email_confirmed_at TIMESTAMP NULL",
+        "created_at TIMESTAMP NULL",
+        "nickname TEXT",
+        "birth_date DATE",
+        "gender TEXT",
+        "avatar_url TEXT",
+        "sport TEXT",
+        "time_window TEXT",
+        "region TEXT",
+        "goal TEXT",
+    ):
+        add_column_if_missing(cur, "users", col)
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_users_nickname ON users (nickname)")
+
+
+@migration(2, "hot_query_indexes")
+def _hot_query_indexes(cur: sqlite3.Cursor) -> None:
+    # wallet: WHERE user_id = ? ORDER BY id DESC
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_txs_user_id_id ON txs (user_id, id)")
+    # chat history: WHERE room_id = ? ORDER BY id
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_messages_room_id_id ON messages (room_id, id)")
+    # order book: WHERE side = ? ORDER BY price
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_orders_side_price ON orders (side, price)")
+    # room lookup by (user1, user2) and the inbox's user1 = ? OR user2 = ?
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_chat_rooms_user1_user2 ON chat_rooms (user1_id, user2_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_chat_rooms_user2_id ON chat_rooms (user2_id)")
+    # feed: ORDER BY created_at DESC
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_posts_created_at ON posts (created_at)")
+
+
+@migration(3, "users_revision")
+def _users_revision(cur: sqlite3.Cursor) -> None:
+    # one counter every worker can read: page ETags include it (app/httpcache.py),
+    # so a profile or balance change made anywhere invalidates cached pages
+    cur.execute("CREATE TABLE IF NOT EXISTS revisions (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    cur.execute("INSERT OR IGNORE INTO revisions (name, value) VALUES ('users', 0)")
+    for event in ("UPDATE", "DELETE"):
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_users_revision_{event.lower()} AFTER {event} ON users "
+            "BEGIN UPDATE revisions SET value = value + 1 WHERE name = 'users'; END"
+        )
+
+
+# ---------- runner ----------
+_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL,
+    duration_ms REAL NOT NULL
+)
+"""
+
+
+def _applied(cur: sqlite3.Cursor) -> dict[int, tuple]:
+    cur.execute("SELECT version, name, applied_at, duration_ms FROM schema_migrations")
+    return {r[0]: r for r in cur.fetchall()}
+
+
+def run_migrations(engine, target: int | None = None) -> list[tuple[int, str, float]]:
+    """Apply pending migrations in order; returns [(version, name, ms)] for this run.
+
+    Each step runs in its own BEGIN IMMEDIATE transaction together with its
+    version row, so concurrent workers starting up apply every step once.
+    """
+    ran = []
+    raw = engine.raw_connection()
+    try:
+        dbapi = raw.driver_connection
+        prev_isolation = dbapi.isolation_level
+        dbapi.isolation_level = None  # we issue BEGIN/COMMIT ourselves
+        cur = dbapi.cursor()
+        cur.execute(_VERSION_TABLE)
+        try:
+            for m in MIGRATIONS:
+                if target is not None and m.version > target:
+                    break
+                cur.execute("BEGIN IMMEDIATE")
+                try:
+                    if m.version in _applied(cur):
+                        cur.execute("COMMIT")
+                        continue
+                    t0 = time.perf_counter()
+                    m.apply(cur)
+                    ms = (time.perf_counter() - t0) * 1000
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)",
+                        (m.version, m.name, datetime.now(timezone.utc).isoformat(), ms),
+                    )
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+                log.info("migration %03d %s applied in %.1f ms", m.version, m.name, ms)
+                ran.append((m.version, m.name, ms))
+        finally:
+            cur.close()
+            dbapi.isolation_level = prev_isolation
+    finally:
+        raw.close()
+    return ran
+
+
+def status(engine) -> list[tuple[int, str, str | None, float | None]]:
+    """[(version, name, applied_at or None, duration_ms or None)] for every known migration."""
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(_VERSION_TABLE)
+        applied = _applied(cur)
+        cur.close()
+        raw.commit()
+    finally:
+        raw.close()
+    return [
+        (m.version, m.name, *(applied[m.version][2:] if m.version in applied else (None, None)))
+        for m in MIGRATIONS
+    ]
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .db import DATABASE_URL, engine, init_tables
+
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "upgrade"
+    print(f"[migrate] DATABASE_URL={DATABASE_URL}")
+
+    if cmd == "status":
+        for version, name, applied_at, ms in status(engine):
+            state = f"applied {applied_at} ({ms:.1f} ms)" if applied_at else "pending"
+            print(f"[migrate] {version:03d} {name:<24} {state}")
+        return
+    if cmd != "upgrade":
+        sys.exit("usage: python -m app.migrations [upgrade|status]")
+
+    init_tables()
+    ran = run_migrations(engine)
+    for version, name, ms in ran:
+        print(f"[migrate] {version:03d} {name:<24} {ms:8.1f} ms")
+    print(f"[migrate] Done. {len(ran)} migration(s) applied.")
+
+
+if __name__ == "__main__":
+    main()
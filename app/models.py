@@ -1,8 +1,9 @@
 # app/models.py — merged Part A (User, Post/Comment, Chat) + Part D (Tx, Order)
+# Indexes/columns added to existing tables live in app/migrations.py.
 
 from typing import Optional
 from datetime import datetime, date, timezone
-from sqlmodel import SQLModel, Field, UniqueConstraint
+from sqlmodel import SQLModel, Field, Index, UniqueConstraint
 
 
 def utcnow():
@@ -94,3 +95,91 @@ class Order(SQLModel, table=True):
     price: int
     amount: int
     created_at: datetime = Field(default_factory=utcnow)
+
+
+# ---------- Server-side sessions (SESSION_BACKEND=sqlite) ----------
+class ServerSession(SQLModel, table=True):
+    __tablename__ = "server_sessions"
+
+    id: str = Field(primary_key=True)
+    user_id: Optional[int] = Field(default=None, index=True)
+    data: str = "{}"
+    expires_at: float = Field(index=True)
+
+
+# ---------- Check-ins ----------
+class WorkoutSession(SQLModel, table=True):
+    __tablename__ = "workout_sessions"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    host_id: int = Field(foreign_key="users.id", index=True)
+    title: str
+    sport: Optional[str] = None
+    lat: float
+    lon: float
+    radius_m: int = 150
+    starts_at: datetime
+    ends_at: datetime = Field(index=True)
+    created_at: datetime = Field(default_factory=utcnow)
+
+
+class CheckIn(SQLModel, table=True):
+    __tablename__ = "checkins"
+    __table_args__ = (UniqueConstraint("session_id", "user_id", name="uq_checkin_session_user"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    session_id: int = Field(foreign_key="workout_sessions.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
+    lat: float
+    lon: float
+    distance_m: float
+    created_at: datetime = Field(default_factory=utcnow)
+
+
+# ---------- Offers ----------
+class Offer(SQLModel, table=True):
+    __tablename__ = "offers"
+    __table_args__ = (
+        # open-offer listing: WHERE sport = ? AND region = ? AND starts_at > ? ORDER BY starts_at, id
+        Index("ix_offers_sport_region_starts_at", "sport", "region", "starts_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    host_id: int = Field(foreign_key="users.id", index=True)
+    title: str
+    sport: Optional[str] = None
+    region: Optional[str] = None
+    where_text: str = ""
+    starts_at: datetime = Field(index=True)
+    capacity: int
+    joined_count: int = 0  # only ever changed by the conditional UPDATEs in app/offers.py
+    created_at: datetime = Field(default_factory=utcnow)
+
+
+class OfferJoin(SQLModel, table=True):
+    __tablename__ = "offer_joins"
+    __table_args__ = (UniqueConstraint("offer_id", "user_id", name="uq_offer_join"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    offer_id: int = Field(foreign_key="offers.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
+    created_at: datetime = Field(default_factory=utcnow)
+
+
+# ---------- Rewards engine state (app/rewards.py) ----------
+class RewardCursor(SQLModel, table=True):
+    __tablename__ = "reward_cursors"
+
+    source: str = Field(primary_key=True)  # event table, e.g. "checkins"
+    last_id: int = 0  # high-water mark: events up to this id have been rewarded
+    updated_at: Optional[datetime] = None
+
+
+class StreakState(SQLModel, table=True):
+    __tablename__ = "streak_states"
+
+    user_id: int = Field(primary_key=True, foreign_key="users.id")
+    last_checkin_day: int = 0  # date.toordinal() of the latest check-in
+    current: int = 0
+    best: int = 0
+    last_post_day: int = 0
@@ -0,0 +1,270 @@
+# app/offers.py — workout offers with a capacity counter
+#
+# A join is admitted by one conditional UPDATE:
+#
+#   UPDATE offers SET joined_count = joined_count + 1
+#    WHERE id = ? AND joined_count < capacity AND starts_at > now AND host_id != ?
+#
+# followed by the OfferJoin insert in the same transaction (a duplicate join
+# rolls the increment back via the unique constraint). There is no
+# count-then-insert read, so concurrent joins can't overbook, and since the
+# transaction's first statement is a write it takes SQLite's write lock
+# straight away instead of upgrading a read lock (which fails with "database
+# is locked" under contention rather than waiting). Reads only happen on the
+# rejection path, to tell the user why.
+#
+# The open-offer list is keyset-paginated on (starts_at, id) and served by
+# ix_offers_sport_region_starts_at when filtered by sport and region.
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote_plus, urlencode
+
+from fastapi import APIRouter, Depends, Form, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy import delete, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from .db import get_session
+from .matching import SPORTS
+from .models import Offer, OfferJoin
+from .templating import templates
+from .usercache import get_user, request_user
+
+PAGE_SIZE = 20
+MIN_CAPACITY, MAX_CAPACITY = 1, 500
+CURSOR_FORMAT = "%Y%m%d%H%M%S%f"
+
+MESSAGES = {
+    "joined": "You're in!",
+    "left": "You left the offer.",
+    "full": "Sorry, this offer is full.",
+    "closed": "This offer has already started.",
+    "already": "You've already joined this offer.",
+    "host": "You're hosting this offer.",
+    "missing": "Offer not found.",
+    "not_joined": "You hadn't joined this offer.",
+}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)  # stored naive UTC
+
+
+def join_offer(session: Session, offer_id: int, user_id: int, now: datetime | None = None) -> str:
+    """Admit user_id to offer_id if there is room: "joined", or why not."""
+    now = now or _now()
+    admitted = session.execute(
+        update(Offer)
+        .where(
+            Offer.id == offer_id,
+            Offer.joined_count < Offer.capacity,
+            Offer.starts_at > now,
+            Offer.host_id != user_id,
+        )
+        .values(joined_count=Offer.joined_count + 1)
+    ).rowcount
+    if admitted:
+        try:
+            session.execute(insert(OfferJoin).values(offer_id=offer_id, user_id=user_id, created_at=now))
+            session.commit()
+            return "joined"
+        except IntegrityError:
+            session.rollback()  # also undoes the increment
+            return "already"
+    session.rollback()
+
+    offer = session.get(Offer, offer_id)
+    if offer is None:
+        return "missing"
+    if offer.host_id == user_id:
+        return "host"
+    if session.exec(select(OfferJoin.id).where(OfferJoin.offer_id == offer_id, OfferJoin.user_id == user_id)).first():
+        return "already"
+    return "closed" if offer.starts_at <= now else "full"
+
+
+def leave_offer(session: Session, offer_id: int, user_id: int) -> str:
+    removed = session.execute(
+        delete(OfferJoin).where(OfferJoin.offer_id == offer_id, OfferJoin.user_id == user_id)
+    ).rowcount
+    if not removed:
+        session.rollback()
+        return "not_joined"
+    session.execute(update(Offer).where(Offer.id == offer_id).values(joined_count=Offer.joined_count - 1))
+    session.commit()
+    return "left"
+
+
+def encode_cursor(offer: Offer) -> str:
+    return f"{offer.starts_at.strftime(CURSOR_FORMAT)}.{offer.id}"
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    try:
+        ts, oid = (cursor or "").split(".")
+        return datetime.strptime(ts, CURSOR_FORMAT), int(oid)
+    except ValueError:
+        return None
+
+
+def list_open(
+    session: Session,
+    sport: str | None = None,
+    region: str | None = None,
+    after: tuple[datetime, int] | None = None,
+    limit: int = PAGE_SIZE,
+    now: datetime | None = None,
+) -> tuple[list[Offer], str | None]:
+    """One page of upcoming offers, soonest first, and the cursor of the next page."""
+    q = select(Offer).where(Offer.starts_at > (now or _now()))
+    if sport:
+        q = q.where(Offer.sport == sport)
+    if region:
+        q = q.where(Offer.region == region)
+    if after:
+        q = q.where(tuple_(Offer.starts_at, Offer.id) > tuple_(*after))
+    rows = session.exec(q.order_by(Offer.starts_at, Offer.id).limit(limit + 1)).all()
+    page = rows[:limit]
+    return page, encode_cursor(page[-1]) if len(rows) > limit else None
+
+
+def _clean_region(region: str | None) -> str | None:
+    return " ".join((region or "").split()) or None
+
+
+# ---------- routes ----------
+router = APIRouter()
+
+
+@router.get("/offers", response_class=HTMLResponse)
+def offers_page(
+    request: Request,
+    sport: str | None = None,
+    region: str | None = None,
+    after: str | None = None,
+    msg: str | None = None,
+    session: Session = Depends(get_session),
+):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+
+    # first visit: filter by the profile's sport/region; an empty value means "any"
+    if sport is None and region is None:
+        sport, region = me.sport, me.region
+    sport, region = (sport or None), _clean_region(region)
+
+    now = _now()
+    offers, next_cursor = list_open(session, sport, region, decode_cursor(after), now=now)
+    hosted = session.exec(
+        select(Offer).where(Offer.host_id == me.id, Offer.starts_at > now).order_by(Offer.starts_at).limit(50)
+    ).all()
+    joined = session.exec(
+        select(Offer)
+        .join(OfferJoin, OfferJoin.offer_id == Offer.id)
+        .where(OfferJoin.user_id == me.id, Offer.starts_at > now)
+        .order_by(Offer.starts_at)
+        .limit(50)
+    ).all()
+    joined_ids = {o.id for o in joined}
+    hosts = {o.host_id: get_user(o.host_id, session) for o in (*offers, *hosted, *joined)}
+
+    next_url = None
+    if next_cursor:
+        next_url = "/offers?" + urlencode({"sport": sport or "", "region": region or "", "after": next_cursor})
+    return templates.TemplateResponse(
+        request,
+        "offers.html",
+        {
+            "user": me,
+            "offers": offers,
+            "hosted": hosted,
+            "joined": joined,
+            "joined_ids": joined_ids,
+            "hosts": hosts,
+            "sports": SPORTS,
+            "sport": sport or "",
+            "region": region or "",
+            "next_url": next_url,
+            "msg": msg,
+        },
+    )
+
+
+@router.get("/offers/new", response_class=HTMLResponse)
+def offer_new_page(request: Request):
+    me = request_user(request)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    return templates.TemplateResponse(request, "offer_new.html", {"user": me, "sports": SPORTS, "error": None})
+
+
+@router.post("/offers/new")
+def offer_create(
+    request: Request,
+    title: str = Form(...),
+    starts_at: str = Form(...),
+    capacity: int = Form(...),
+    sport: str = Form(""),
+    region: str = Form(""),
+    where_text: str = Form(""),
+    tz_offset_min: int = Form(0),  # browser's getTimezoneOffset(); datetime-local has no zone
+    session: Session = Depends(get_session),
+):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+
+    error = None
+    try:
+        start = datetime.fromisoformat(starts_at)
+    except ValueError:
+        error = "Invalid start time"
+    else:
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc) + timedelta(minutes=tz_offset_min)
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        if start <= _now():
+            error = "Pick a time in the future"
+    if not (title or "").strip():
+        error = "Give the offer a title"
+    elif not MIN_CAPACITY <= capacity <= MAX_CAPACITY:
+        error = f"Capacity must be between {MIN_CAPACITY} and {MAX_CAPACITY}"
+    if error:
+        return templates.TemplateResponse(
+            request, "offer_new.html", {"user": me, "sports": SPORTS, "error": error}, status_code=400
+        )
+
+    offer = Offer(
+        host_id=me.id,
+        title=title.strip(),
+        sport=(sport if sport in SPORTS else None) or me.sport,
+        region=_clean_region(region) or _clean_region(me.region),
+        where_text=(where_text or "").strip(),
+        starts_at=start,
+        capacity=capacity,
+    )
+    session.add(offer)
+    session.commit()
+    return RedirectResponse("/offers?msg=Offer+created", status_code=303)
+
+
+@router.post("/offers/{offer_id}/join")
+def offer_join(offer_id: int, request: Request, session: Session = Depends(get_session)):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    result = join_offer(session, offer_id, me.id)
+    return RedirectResponse(f"/offers?msg={quote_plus(MESSAGES[result])}", status_code=303)
+
+
+@router.post("/offers/{offer_id}/leave")
+def offer_leave(offer_id: int, request: Request, session: Session = Depends(get_session)):
+    me = request_user(request, session)
+    if not me:
+        return RedirectResponse("/login?msg=Please+log+in+first", status_code=303)
+    result = leave_offer(session, offer_id, me.id)
+    return RedirectResponse(f"/offers?msg={quote_plus(MESSAGES[result])}", status_code=303)
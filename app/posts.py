@@ -7,25 +7,21 @@ from pathlib import Path
 
 from fastapi import APIRouter, Request, Depends, Form, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
-
-from .db import engine
-from .models import User, Post, Comment
+from sqlmodel import Session, func, select
+
+from .db import get_session
+from .models import Post, Comment
+from .usercache import get_user
+from .templating import templates
+from .httpcache import not_modified, page_etag, with_etag, USERS_REVISION
+from . import metrics
+from .hub import hub, PREVIEW_CHARS
+from .rewards import rewards
 from .auth import current_user  # chat.py에서도 쓰는 거라 너 프로젝트에 이미 있을 확률 높음
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-
-POST_IMG_DIR = Path("static/post_images")
-POST_IMG_DIR.mkdir(parents=True, exist_ok=True)
 
-
-def get_session():
-    # 프로젝트에 이미 get_session이 있으면 그걸 쓰는 게 더 깔끔하지만,
-    # 없을 수도 있으니 안전하게 여기서도 제공
-    with Session(engine) as s:
-        yield s
+POST_IMG_DIR = Path("static/post_images")  # created in main's lifespan
 
 
 def _save_upload(image: UploadFile) -> str:
@@ -34,39 +30,16 @@ def _save_upload(image: UploadFile) -> str:
         ext = ".png"
     fname = f"{uuid.uuid4().hex}{ext}"
     dest = POST_IMG_DIR / fname
+    data = image.file.read()
+    metrics.upload_bytes.inc("post", amount=len(data))
     with dest.open("wb") as f:
-        f.write(image.file.read())
+        f.write(data)
     return f"/static/post_images/{fname}"
 
 
-@router.get("/posts", response_class=HTMLResponse)
-def posts_list(request: Request, session: Session = Depends(get_session)):
-    uid = request.session.get("uid")
-    user = session.get(User, uid) if uid else None
-
-    posts = session.exec(select(Post).order_by(Post.created_at.desc())).all()
-    authors = {p.author_id: session.get(User, p.author_id) for p in posts}
-
-    return templates.TemplateResponse(
-        "posts_list.html",
-        {"request": request, "user": user, "posts": posts, "authors": authors},
-    )
-
-
-@router.get("/posts/new", response_class=HTMLResponse)
-def posts_new_page(request: Request, session: Session = Depends(get_session)):
-    me = current_user(request, session)
-    if not me:
-        return RedirectResponse("/login", status_code=303)
-
-    return templates.TemplateResponse(
-        "posts_new.html",
-        {"request": request, "user": me},
-    )
-
-
-@router.post("/posts/new")
-def posts_create_new(
+# ✅ 테스트 호환용: tests가 POST /posts 로 쏘고 있어서 alias 제공
+@router.post("/posts")
+def posts_create_alias(
     request: Request,
     caption: str = Form(...),
     image: UploadFile | None = File(default=None),
@@ -76,51 +49,51 @@ def posts_create_new(
     if not me:
         return RedirectResponse("/login", status_code=303)
 
-    image_url = _save_upload(image) if image else None
+    image_url = _save_upload(image) if image and image.filename else None
     post = Post(author_id=me.id, caption=(caption or "").strip(), image_url=image_url)
     session.add(post)
     session.commit()
     session.refresh(post)
+    rewards.run_in_background()
 
     return RedirectResponse(f"/posts/{post.id}", status_code=303)
 
 
-# ✅ 테스트 호환용: tests가 POST /posts 로 쏘고 있어서 alias 제공
-@router.post("/posts")
-def posts_create_alias(
-    request: Request,
-    caption: str = Form(...),
-    image: UploadFile | None = File(default=None),
-    session: Session = Depends(get_session),
-):
-    return posts_create_new(request, caption, image, session)
-
-
-@router.get("/posts/{post_id}", response_class=HTMLResponse)
+# `:int` keeps GET /posts/new (main.py) out of this route whatever the include order
+@router.get("/posts/{post_id:int}", response_class=HTMLResponse)
 def posts_detail(post_id: int, request: Request, session: Session = Depends(get_session)):
-    uid = request.session.get("uid")
-    user = session.get(User, uid) if uid else None
-
-    post = session.get(Post, post_id)
-    if not post:
+    # posts are immutable and comments append-only: the newest comment id versions the page
+    last_comment = select(func.max(Comment.id)).where(Comment.post_id == post_id).scalar_subquery()
+    row = session.exec(select(Post, last_comment, USERS_REVISION).where(Post.id == post_id)).first()
+    if not row:
         return HTMLResponse("Post not found", status_code=404)
+    post, *stamps = row
+    etag = page_etag(request, "post", post_id, *stamps)
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
 
-    author = session.get(User, post.author_id)
     comments = session.exec(
         select(Comment).where(Comment.post_id == post_id).order_by(Comment.created_at)
     ).all()
-    comment_authors = {c.author_id: session.get(User, c.author_id) for c in comments}
-
-    return templates.TemplateResponse(
-        "posts_detail.html",
-        {
-            "request": request,
-            "user": user,
-            "post": post,
-            "author": author,
-            "comments": comments,
-            "comment_authors": comment_authors,
-        },
+
+    user = current_user(request, session)
+
+    author = get_user(post.author_id, session)
+    comment_authors = {c.author_id: get_user(c.author_id, session) for c in comments}
+
+    return with_etag(
+        templates.TemplateResponse(
+            request,
+            "posts_detail.html",
+            {
+                "user": user,
+                "post": post,
+                "author": author,
+                "comments": comments,
+                "comment_authors": comment_authors,
+            },
+        ),
+        etag,
     )
 
 
@@ -142,5 +115,10 @@ def posts_add_comment(
     c = Comment(post_id=post_id, author_id=me.id, content=(content or "").strip())
     session.add(c)
     session.commit()
+    if post.author_id != me.id:
+        hub.publish([post.author_id], {
+            "type": "notify", "kind": "comment", "post_id": post_id, "id": c.id,
+            "from": me.id, "preview": c.content[:PREVIEW_CHARS],
+        })
 
     return RedirectResponse(f"/posts/{post_id}#comments", status_code=303)
@@ -0,0 +1,243 @@
+# app/profiler.py — on-demand request profiles (sampled call stacks + SQL time)
+#
+# A request is profiled when an admin sends `X-Profile: 1` (see admin.py) or,
+# with PROFILE_SAMPLE_RATE > 0, at random. While it runs, a sampler thread
+# records the stacks of the event loop thread and of the threadpool workers
+# that are busy (sync routes and their DB calls) every PROFILE_INTERVAL_MS.
+# Stacks are rooted at "loop" or "worker"; other requests being served at the
+# same time show up in them too, as with any wall-clock sampler.
+#
+# The last PROFILE_KEEP profiles are kept in memory:
+#
+#   /debug/profiles                  summaries (route, status, ms, SQL count/ms, samples)
+#   /debug/profiles/{id}/collapsed   collapsed stacks ("a;b;c 12"), for flamegraph.pl etc.
+#   /debug/profiles/{id}/speedscope  a speedscope.app file
+#
+# Requests that are not profiled cost one header scan.
+
+from __future__ import annotations
+
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admin import is_admin_request, require_admin
+from .sqlstats import current_stats, route_key
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests, 0 = header only
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+HEADER = b"x-profile"
+WORKER_THREAD = "AnyIO worker thread"  # Starlette's threadpool (run_in_threadpool)
+_IDLE = ("threading.py", "queue.py")  # a worker parked waiting for work
+_ROOTS = tuple(sorted({os.path.join(os.path.abspath(p), "") for p in sys.path if p}, key=len, reverse=True))
+
+
+def _where(code) -> str:
+    path = code.co_filename
+    for root in _ROOTS:
+        if path.startswith(root):
+            path = path[len(root):]
+            break
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({path}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> tuple[str, ...]:
+    out = []
+    while frame is not None:
+        out.append(_where(frame.f_code))
+        frame = frame.f_back
+    out.reverse()
+    return tuple(out)
+
+
+class Sampler:
+    """Wall-clock stack samples of one thread (and the busy workers) until stop()."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter[tuple[str, ...]]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        workers = {t.ident for t in threading.enumerate() if t.name == WORKER_THREAD}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if (frame := frames.get(self.thread_id)) is not None:
+                self.samples[("loop", *_stack(frame))] += 1
+            for t in threading.enumerate():  # workers come and go
+                if t.name == WORKER_THREAD:
+                    workers.add(t.ident)
+            for tid in workers:
+                frame = frames.get(tid)
+                if frame is not None and not frame.f_code.co_filename.endswith(_IDLE):
+                    self.samples[("worker", *_stack(frame))] += 1
+
+
+class Profile:
+    __slots__ = ("id", "at", "method", "path", "route", "status", "ms", "sql_count", "sql_ms", "interval_ms", "samples")
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "at": self.at,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "ms": round(self.ms, 2),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_ms, 2),
+            "interval_ms": self.interval_ms,
+            "samples": sum(self.samples.values()),
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(s.replace(';', ':') for s in stack)} {n}\n"
+                       for stack, n in self.samples.most_common())
+
+    def speedscope(self) -> dict:
+        index: dict[str, int] = {}
+        frames, samples, weights = [], [], []
+        for stack, n in self.samples.most_common():
+            ids = []
+            for name in stack:
+                if name not in index:
+                    index[name] = len(frames)
+                    frames.append({"name": name})
+                ids.append(index[name])
+            samples.append(ids)
+            weights.append(n * self.interval_ms)
+        name = f"{self.method} {self.path} — {self.ms:.1f} ms, SQL {self.sql_count} queries / {self.sql_ms:.1f} ms"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "sweatmarket",
+            "name": name,
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "milliseconds",
+                "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+            }],
+        }
+
+
+_profiles: deque[Profile] = deque(maxlen=PROFILE_KEEP)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+def profiles() -> list[Profile]:
+    with _lock:
+        return list(_profiles)
+
+
+def get_profile(pid: int) -> Profile | None:
+    return next((p for p in profiles() if p.id == pid), None)
+
+
+def reset() -> None:
+    with _lock:
+        _profiles.clear()
+
+
+def _wanted(scope: Scope, sample_rate: float) -> bool:
+    if sample_rate and random.random() < sample_rate:
+        return True
+    for name, value in scope["headers"]:
+        if name == HEADER:
+            return value not in (b"", b"0") and is_admin_request(Request(scope))
+    return False
+
+
+class ProfilerMiddleware:
+    """Add inside QueryStatsMiddleware so the request's SQL stats are visible here."""
+
+    def __init__(self, app: ASGIApp, sample_rate: float = PROFILE_SAMPLE_RATE, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _wanted(scope, self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        p = Profile()
+        p.id = next(_ids)
+        p.status = 500
+        show_id = is_admin_request(Request(scope))  # randomly sampled visitors don't learn they were
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                p.status = message["status"]
+                if show_id:
+                    MutableHeaders(scope=message)["X-Profile-Id"] = str(p.id)
+            await send(message)
+
+        p.at = time.time()
+        sampler = Sampler(threading.get_ident(), self.interval_ms / 1000).start()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            p.ms = (time.perf_counter() - t0) * 1000
+            p.samples = await run_in_threadpool(sampler.stop)  # joins the sampler thread
+            stats = current_stats()
+            p.sql_count, p.sql_ms = (stats.count, stats.total_ms) if stats else (0, 0.0)
+            p.method, p.path, p.route = scope["method"], scope["path"], route_key(scope)
+            p.interval_ms = self.interval_ms
+            with _lock:
+                _profiles.append(p)
+
+
+router = APIRouter(prefix="/debug/profiles", dependencies=[Depends(require_admin)])
+
+
+def _found(pid: int) -> Profile:
+    p = get_profile(pid)
+    if p is None:
+        raise HTTPException(status_code=404, detail="profile not found (only the last PROFILE_KEEP are kept)")
+    return p
+
+
+@router.get("")
+def profile_list():
+    return {"profiles": [p.summary() for p in reversed(profiles())]}
+
+
+@router.get("/{pid}/collapsed")
+def profile_collapsed(pid: int):
+    return PlainTextResponse(
+        _found(pid).collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{pid}.collapsed.txt"'},
+    )
+
+
+@router.get("/{pid}/speedscope")
+def profile_speedscope(pid: int):
+    return JSONResponse(
+        _found(pid).speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{pid}.speedscope.json"'},
+    )
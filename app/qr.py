@@ -1,3 +1,143 @@
-# QR utilities.
-# TODO (C):
-# - qr_png_bytes(payload: str) -> bytes using qrcode library.
+# app/qr.py — QR codes and signed check-in nonces
+#
+# A session's host shows a QR code linking to /session/{sid}?n=<nonce>.
+# Nonces are stateless: HMAC(SECRET_KEY, sid + time window), so every worker
+# issues the same nonce for the same window and verifying one is a hash, not
+# a lookup. A nonce is accepted in its own window and the one after
+# (QR_NONCE_TTL..2*QR_NONCE_TTL seconds). Because the payload only changes
+# once per window, PNGs come from an LRU cache keyed by payload and host
+# refreshes never re-encode.
+#
+# A nonce proves presence during its window, not identity: everyone at the
+# session scans the same code, so it is not single-use. What is consumed is
+# the (session, user, nonce) triple: used_nonces, a small ExpiringSet,
+# remembers it until the nonce expires so a resubmitted form is turned away
+# in memory instead of costing an INSERT and an IntegrityError. The set is
+# per worker and capped at QR_SEEN_MAX entries (oldest evicted first), so it
+# is only a fast path; the CheckIn (session, user) unique constraint stays
+# the cross-worker backstop.
+
+from __future__ import annotations
+
+import base64
+import functools
+import hashlib
+import hmac
+import importlib.util
+import io
+import os
+import threading
+import time
+from collections import deque
+from typing import Hashable
+
+QR_NONCE_TTL = int(os.getenv("QR_NONCE_TTL", "120"))
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "1024"))
+QR_SWEEP_SECONDS = float(os.getenv("QR_SWEEP_SECONDS", "30"))
+QR_SEEN_MAX = int(os.getenv("QR_SEEN_MAX", "100000"))
+SIG_BYTES = 12
+
+
+@functools.cache
+def available() -> bool:
+    return importlib.util.find_spec("qrcode") is not None
+
+
+def _encode(payload: str) -> bytes:
+    # optional dependency, `pip install qrcode[png]` (pure Python, via pypng);
+    # imported on first use so processes that never render a code don't load it
+    try:
+        import qrcode
+        from qrcode.image.pure import PyPNGImage
+
+        img = qrcode.make(payload, image_factory=PyPNGImage, box_size=8, border=2)
+    except ImportError as e:
+        raise RuntimeError("QR rendering needs the optional 'qrcode[png]' package") from e
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_png_bytes(payload: str) -> bytes:
+    """PNG for payload; cached, so the same payload is encoded once per process."""
+    return _encode(payload)
+
+
+# ---------- nonces ----------
+def _window(now: float | None = None) -> int:
+    return int((time.time() if now is None else now) // QR_NONCE_TTL)
+
+
+def _sign(secret: bytes, sid: int, window: int) -> str:
+    mac = hmac.new(secret, f"checkin:{sid}:{window}".encode(), hashlib.sha256).digest()[:SIG_BYTES]
+    return base64.urlsafe_b64encode(mac).decode().rstrip("=")
+
+
+class NonceSigner:
+    def __init__(self, secret: str | bytes):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+
+    def issue(self, sid: int, now: float | None = None) -> tuple[str, float]:
+        """(nonce, seconds until the QR should be refreshed)."""
+        now = time.time() if now is None else now
+        w = _window(now)
+        return f"{w:x}.{_sign(self.secret, sid, w)}", (w + 1) * QR_NONCE_TTL - now
+
+    def verify(self, sid: int, nonce: str, now: float | None = None) -> float | None:
+        """Expiry (epoch seconds) of a valid nonce for sid, else None."""
+        try:
+            w_hex, sig = nonce.split(".", 1)
+            w = int(w_hex, 16)
+        except (AttributeError, ValueError):
+            return None
+        if _window(now) - w not in (0, 1):
+            return None
+        if not hmac.compare_digest(sig, _sign(self.secret, sid, w)):
+            return None
+        return (w + 2) * QR_NONCE_TTL
+
+
+class ExpiringSet:
+    """Keys with an expiry; O(1) add/contains, expired keys swept in batches, size capped."""
+
+    def __init__(self, sweep_every: float = QR_SWEEP_SECONDS, max_size: int = QR_SEEN_MAX):
+        self._lock = threading.Lock()
+        self._expiry: dict[Hashable, float] = {}
+        self._order: deque[tuple[float, Hashable]] = deque()  # expiries arrive roughly in order
+        self.sweep_every = sweep_every
+        self.max_size = max_size
+        self._swept_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def add_if_absent(self, key: Hashable, expires: float, now: float | None = None) -> bool:
+        """Add key; False if it is already present and unexpired (i.e. a replay)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._swept_at >= self.sweep_every:
+                self._sweep(now)
+            current = self._expiry.get(key)
+            if current is not None and current > now:
+                return False
+            while len(self._expiry) >= self.max_size and self._order:
+                self._evict(*self._order.popleft())  # full: forget the oldest, the DB still catches it
+            self._expiry[key] = expires
+            self._order.append((expires, key))
+            return True
+
+    def _sweep(self, now: float) -> None:
+        self._swept_at = now
+        order = self._order
+        while order and order[0][0] <= now:
+            self._evict(*order.popleft())
+
+    def _evict(self, exp: float, key: Hashable) -> None:
+        if self._expiry.get(key) == exp:
+            del self._expiry[key]
+
+
+signer = NonceSigner(os.getenv("SECRET_KEY", "dev-secret"))
+used_nonces = ExpiringSet()
+
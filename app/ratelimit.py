@@ -0,0 +1,151 @@
+# app/ratelimit.py — in-process token-bucket rate limiting for expensive routes
+#
+# Each rule owns one TokenBucketLimiter. Buckets live in an OrderedDict kept in
+# last-used order, so a key costs O(1) memory and idle keys are evicted from
+# the front as soon as their bucket would have refilled (a full bucket is the
+# same as no bucket). Runs on the event loop only, so no locking is needed.
+#
+# Limits are per worker process; with N uvicorn workers the effective limit is
+# roughly N times the configured one.
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Literal
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+TESTING = os.getenv("TESTING") == "1"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT", "0" if TESTING else "1") == "1"
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate            # tokens per second
+        self.burst = burst          # bucket capacity
+        self.max_keys = max_keys
+        self.clock = clock
+        self.refill_time = burst / rate
+        self._buckets: OrderedDict[object, list[float]] = OrderedDict()
+
+    def hit(self, key, cost: float = 1.0) -> float:
+        """Take `cost` tokens for `key`. Returns 0 if allowed, else seconds to wait."""
+        now = self.clock()
+        buckets = self._buckets
+
+        # evict idle keys: anything untouched for refill_time is a full bucket
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if now - oldest[1] < self.refill_time and len(buckets) < self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+        b = buckets.get(key)
+        if b is None:
+            tokens = self.burst
+            b = buckets[key] = [tokens, now]
+        else:
+            tokens = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            buckets.move_to_end(key)
+
+        b[1] = now
+        if tokens >= cost:
+            b[0] = tokens - cost
+            return 0.0
+        b[0] = tokens
+        return (cost - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+@dataclass
+class RateLimitRule:
+    name: str
+    method: str
+    path: str                       # regex, matched against the full path
+    limit: int                      # requests ...
+    per: float                      # ... per this many seconds (also the burst)
+    by: Literal["ip", "uid"] = "ip"  # "uid" falls back to ip when logged out
+    limiter: TokenBucketLimiter = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._re = re.compile(self.path + r"\Z")
+        self.limiter = TokenBucketLimiter(rate=self.limit / self.per, burst=self.limit)
+
+
+DEFAULT_RULES = [
+    RateLimitRule("login", "POST", r"/login", limit=10, per=60),
+    RateLimitRule("signup", "POST", r"/signup", limit=5, per=600),
+    RateLimitRule("post_upload", "POST", r"/posts(/new)?", limit=20, per=60, by="uid"),
+    RateLimitRule("chat_upload", "POST", r"/chat/\d+/image", limit=30, per=60, by="uid"),
+    RateLimitRule("avatar_upload", "POST", r"/profile/edit", limit=10, per=60, by="uid"),
+    RateLimitRule("dex_order", "POST", r"/dex/new", limit=30, per=60, by="uid"),
+    RateLimitRule("offer_join", "POST", r"/offers/\d+/(join|leave)", limit=30, per=60, by="uid"),
+    RateLimitRule("checkin", "POST", r"/session/\d+/checkin", limit=20, per=60, by="uid"),
+]
+
+
+def rules_from_env(rules: list[RateLimitRule], spec: str | None = None) -> list[RateLimitRule]:
+    """Apply RATE_LIMITS overrides like "login=20/60,dex_order=off"."""
+    spec = spec if spec is not None else os.getenv("RATE_LIMITS", "")
+    overrides = dict(part.split("=", 1) for part in spec.split(",") if "=" in part)
+    out = []
+    for r in rules:
+        value = overrides.get(r.name, "").strip()
+        if value == "off":
+            continue
+        if value:
+            limit, per = value.split("/")
+            r = RateLimitRule(r.name, r.method, r.path, int(limit), float(per), r.by)
+        out.append(r)
+    return out
+
+
+class RateLimitMiddleware:
+    """Must sit inside the session middleware so per-uid rules can see the session."""
+
+    def __init__(self, app: ASGIApp, rules: list[RateLimitRule]):
+        self.app = app
+        self.by_method: dict[str, list[RateLimitRule]] = {}
+        for r in rules:
+            self.by_method.setdefault(r.method, []).append(r)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        rules = self.by_method.get(scope.get("method", "")) if scope["type"] == "http" else None
+        if rules:
+            path = scope["path"]
+            for rule in rules:
+                if rule._re.match(path):
+                    key = None
+                    if rule.by == "uid":
+                        key = (scope.get("session") or {}).get("uid")
+                    if key is None:
+                        client = scope.get("client")
+                        key = "ip:" + (client[0] if client else "?")
+                    wait = rule.limiter.hit(key)
+                    if wait:
+                        await self._reject(send, wait)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send: Send, wait: float) -> None:
+        body = b"Too many requests, slow down."
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
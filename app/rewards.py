@@ -0,0 +1,315 @@
+# app/rewards.py — incremental coin-earning rules (check-ins, streaks, posts)
+#
+# Events are read from their own tables in id order, starting after a
+# per-source high-water mark (reward_cursors). Each batch is one
+# BEGIN IMMEDIATE transaction that loads the compact per-user StreakState
+# rows it needs, applies the rules, appends Tx rows, bumps users.coins once
+# per user, saves the touched streak states and advances the cursor. The
+# ledger and the cursor commit together, so a crash or a second run (even
+# from another process) never credits an event twice.
+#
+#   python -m app.rewards            # process everything new (nightly job)
+#   python -m app.rewards --backfill # first run: reward history too
+#
+# --backfill is refused once any cursor exists: the app's startup places the
+# cursors at the end of each table, and the events below a cursor may already
+# have been paid, so backfill has to run before the app is first started.
+#
+# Web workers also run it in the background after check-ins and new posts, at
+# most every REWARDS_INTERVAL_SECONDS, so coins show up without waiting for
+# the night.
+
+from __future__ import annotations
+
+import argparse
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Callable, Iterable
+
+from .db import engine
+from .models import StreakState
+from .usercache import invalidate_user
+
+log = logging.getLogger(__name__)
+
+REWARDS_BATCH = int(os.getenv("REWARDS_BATCH", "20000"))
+REWARDS_INTERVAL_SECONDS = float(os.getenv("REWARDS_INTERVAL_SECONDS", "30"))
+CHECKIN_REWARD = int(os.getenv("CHECKIN_REWARD", "10"))
+POST_REWARD = int(os.getenv("POST_REWARD", "2"))  # first post of each day
+STREAK_BONUSES = {3: 5, 7: 15, 14: 30, 30: 60}  # streak length -> bonus coins
+STREAK_BONUS_EVERY_30 = 60  # 60, 90, 120, ... days
+
+IN_CHUNK = 500  # ids per "WHERE user_id IN (...)"
+
+
+@functools.lru_cache(maxsize=4096)
+def _day(ymd: str) -> int:
+    return date.fromisoformat(ymd).toordinal()
+
+
+def day_of(created_at) -> int:
+    """UTC day number of a stored timestamp (a 'YYYY-MM-DD ...' string or datetime)."""
+    if isinstance(created_at, datetime):
+        return created_at.date().toordinal()
+    return _day(str(created_at)[:10])
+
+
+@dataclass
+class Streak:
+    last_checkin_day: int = 0
+    current: int = 0
+    best: int = 0
+    last_post_day: int = 0
+    dirty: bool = field(default=False, compare=False)
+
+
+def effective_streak(s: Streak | None, today: int) -> int:
+    """Streak as of today: it survives until the end of the day after the last check-in."""
+    return s.current if s and s.last_checkin_day >= today - 1 else 0
+
+
+def streak_bonus(length: int) -> int:
+    if length in STREAK_BONUSES:
+        return STREAK_BONUSES[length]
+    return STREAK_BONUS_EVERY_30 if length > 30 and length % 30 == 0 else 0
+
+
+# rule(state, day) -> [(amount, kind, note)]
+def checkin_rule(s: Streak, day: int) -> list[tuple[int, str, str]]:
+    out = [(CHECKIN_REWARD, "earn", "Workout check-in")]
+    if day > s.last_checkin_day:
+        s.current = s.current + 1 if day == s.last_checkin_day + 1 else 1
+        s.best = max(s.best, s.current)
+        s.last_checkin_day = day
+        s.dirty = True
+        if bonus := streak_bonus(s.current):
+            out.append((bonus, "bonus", f"Streak: {s.current} days"))
+    return out
+
+
+def post_rule(s: Streak, day: int) -> list[tuple[int, str, str]]:
+    if day <= s.last_post_day:
+        return []
+    s.last_post_day = day
+    s.dirty = True
+    return [(POST_REWARD, "earn", "Daily post")]
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str  # also the table
+    user_col: str
+    rule: Callable[[Streak, int], list[tuple[int, str, str]]]
+
+
+SOURCES = (
+    Source("checkins", "user_id", checkin_rule),
+    Source("posts", "author_id", post_rule),
+)
+
+_STATE_COLS = "user_id, last_checkin_day, current, best, last_post_day"
+
+
+def _stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")  # stored timestamp format
+
+
+def _chunks(xs: list, n: int) -> Iterable[list]:
+    for i in range(0, len(xs), n):
+        yield xs[i : i + n]
+
+
+class RewardsEngine:
+    def __init__(self, engine, sources: tuple[Source, ...] = SOURCES, batch: int = REWARDS_BATCH):
+        self.engine = engine
+        self.sources = sources
+        self.batch = batch
+        self._running = threading.Lock()
+        self.last_run = 0.0
+        # called after each committed batch with {uid: coins} and {uid: Streak} (new absolute values)
+        self.listeners: list[Callable[[dict[int, int], dict[int, Streak]], None]] = []
+
+    @contextmanager
+    def _cursor(self):
+        raw = self.engine.raw_connection()
+        try:
+            dbapi = raw.driver_connection
+            prev_isolation = dbapi.isolation_level
+            dbapi.isolation_level = None  # we issue BEGIN/COMMIT ourselves
+            try:
+                yield dbapi.cursor()
+            finally:
+                dbapi.isolation_level = prev_isolation
+        finally:
+            raw.close()
+
+    def start(self) -> None:
+        """Start missing cursors at the current end of their source (history isn't paid out)."""
+        with self._cursor() as cur:
+            for src in self.sources:
+                cur.execute(
+                    "INSERT OR IGNORE INTO reward_cursors (source, last_id, updated_at) "
+                    f"SELECT ?, coalesce(max(id), 0), ? FROM {src.name}",
+                    (src.name, _stamp()),
+                )
+
+    def run(self, backfill: bool = False) -> dict[str, tuple[int, int]]:
+        """Reward all new events; {source: (events, coins credited)}. Safe to re-run.
+
+        backfill=True raises RuntimeError once any cursor exists (see the header).
+        """
+        with self._running:
+            with self._cursor() as cur:
+                if backfill:
+                    self._check_backfill(cur)
+                totals = {src.name: self._run_source(cur, src, backfill) for src in self.sources}
+            self.last_run = time.monotonic()
+        return totals
+
+    def _check_backfill(self, cur) -> None:
+        names = [src.name for src in self.sources]
+        placed = cur.execute(
+            f"SELECT source, last_id FROM reward_cursors WHERE source IN ({', '.join('?' * len(names))})", names
+        ).fetchall()
+        if placed:
+            marks = ", ".join(f"{name} at id {last_id}" for name, last_id in placed)
+            raise RuntimeError(
+                f"can't backfill: reward cursors already exist ({marks}); history is only paid out "
+                "on the very first run, before the app (which starts the cursors) has been started"
+            )
+
+    def _run_source(self, cur, src: Source, backfill: bool) -> tuple[int, int]:
+        events = coins = 0
+        while True:
+            cur.execute("BEGIN IMMEDIATE")  # one writer; the cursor is read under the lock
+            try:
+                n, credited, balances, streaks = self._batch(cur, src, backfill)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            for uid in balances:
+                invalidate_user(uid)  # nav/wallet show the new balance
+            if balances:
+                for listener in self.listeners:
+                    listener(balances, streaks)
+            events += n
+            coins += credited
+            if n < self.batch:
+                return events, coins
+
+    def _batch(self, cur, src: Source, backfill: bool) -> tuple[int, int, dict[int, int], dict[int, Streak]]:
+        row = cur.execute("SELECT last_id FROM reward_cursors WHERE source = ?", (src.name,)).fetchone()
+        if row is None and not backfill:
+            # first sight of this source (see start())
+            (top,) = cur.execute(f"SELECT coalesce(max(id), 0) FROM {src.name}").fetchone()
+            self._save_cursor(cur, src, top)
+            return 0, 0, {}, {}
+        last_id = row[0] if row else 0
+
+        events = cur.execute(
+            f"SELECT id, {src.user_col}, created_at FROM {src.name} WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, self.batch),
+        ).fetchall()
+        if not events:
+            return 0, 0, {}, {}
+
+        uids = sorted({uid for _, uid, _ in events})
+        states: dict[int, Streak] = {}
+        for chunk in _chunks(uids, IN_CHUNK):
+            marks = ",".join("?" * len(chunk))
+            for uid, *vals in cur.execute(
+                f"SELECT {_STATE_COLS} FROM streak_states WHERE user_id IN ({marks})", chunk
+            ):
+                states[uid] = Streak(*vals)
+
+        txs, deltas = [], {}
+        for _, uid, created_at in events:
+            s = states.get(uid)
+            if s is None:
+                s = states[uid] = Streak()
+            for amount, kind, note in src.rule(s, day_of(created_at)):
+                txs.append((uid, amount, kind, note, created_at))
+                deltas[uid] = deltas.get(uid, 0) + amount
+
+        cur.executemany("INSERT INTO txs (user_id, amount, kind, note, created_at) VALUES (?, ?, ?, ?, ?)", txs)
+        cur.executemany("UPDATE users SET coins = coins + ? WHERE id = ?", [(d, uid) for uid, d in deltas.items()])
+        cur.executemany(
+            f"INSERT INTO streak_states ({_STATE_COLS}) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET last_checkin_day = excluded.last_checkin_day, "
+            "current = excluded.current, best = excluded.best, last_post_day = excluded.last_post_day",
+            [(uid, s.last_checkin_day, s.current, s.best, s.last_post_day) for uid, s in states.items() if s.dirty],
+        )
+        self._save_cursor(cur, src, events[-1][0])
+
+        balances: dict[int, int] = {}
+        for chunk in _chunks(list(deltas), IN_CHUNK):
+            marks = ",".join("?" * len(chunk))
+            balances.update(cur.execute(f"SELECT id, coins FROM users WHERE id IN ({marks})", chunk))
+        dirty = {uid: s for uid, s in states.items() if s.dirty}
+        return len(events), sum(deltas.values()), balances, dirty
+
+    @staticmethod
+    def _save_cursor(cur, src: Source, last_id: int) -> None:
+        cur.execute(
+            "INSERT INTO reward_cursors (source, last_id, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at",
+            (src.name, last_id, _stamp()),
+        )
+
+    def run_in_background(self) -> None:
+        if time.monotonic() - self.last_run < REWARDS_INTERVAL_SECONDS or self._running.locked():
+            return
+        self.last_run = time.monotonic()  # claim the run
+
+        def _run():
+            try:
+                self.run()
+            except Exception:  # next trigger retries; nothing was half-applied
+                log.exception("rewards run failed")
+
+        threading.Thread(target=_run, daemon=True).start()
+
+
+def streak_value(st: StreakState | None) -> int:
+    """The streak to show for a loaded StreakState row (None: never checked in)."""
+    today = datetime.now(timezone.utc).date().toordinal()
+    return effective_streak(Streak(st.last_checkin_day, st.current, st.best, st.last_post_day) if st else None, today)
+
+
+def streak_of(session, uid: int) -> int:
+    return streak_value(session.get(StreakState, uid))
+
+
+rewards = RewardsEngine(engine)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Credit coins for new check-ins, streaks and posts.")
+    ap.add_argument("--backfill", action="store_true", help="also reward events from before the first run")
+    ap.add_argument("--batch", type=int, default=REWARDS_BATCH)
+    args = ap.parse_args(argv)
+
+    from .db import init_db
+
+    init_db()
+    rewards.batch = args.batch
+    t0 = time.perf_counter()
+    try:
+        totals = rewards.run(backfill=args.backfill)
+    except RuntimeError as e:
+        sys.exit(f"[rewards] {e}")
+    for source, (events, coins) in totals.items():
+        print(f"[rewards] {source:<9} {events:>11,} events  {coins:>12,} coins")
+    print(f"[rewards] Done in {time.perf_counter() - t0:.1f}s.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# app/sessions.py — optional server-side session backend
+#
+# SESSION_BACKEND=cookie  (default) Starlette's signed-cookie SessionMiddleware
+# SESSION_BACKEND=memory  in-process LRU store (single worker / dev)
+# SESSION_BACKEND=sqlite  `server_sessions` table on the app engine (its calls run
+#                         in the threadpool, off the event loop)
+#
+# With a server-side backend the cookie only carries an opaque random id, so
+# requests skip the base64 + HMAC round trip, sessions can be listed/revoked,
+# and sliding-expiry writes are batched instead of re-sent on every response.
+
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Literal, Optional
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .models import ServerSession
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie")
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 60 * 60)))
+
+# (sid, uid, expires_at)
+SessionInfo = tuple[str, Optional[int], float]
+
+
+def _uid_of(data: dict) -> Optional[int]:
+    uid = data.get("uid")
+    return int(uid) if uid is not None else None
+
+
+class _SessionDict(dict):
+    """request.session that remembers whether the app (re)assigned `uid`."""
+
+    uid_assigned = False
+
+    def __setitem__(self, key, value):
+        if key == "uid":
+            self.uid_assigned = True
+        super().__setitem__(key, value)
+
+
+class MemorySessionStore:
+    """LRU-bounded in-process store. Not shared between workers."""
+
+    blocking = False  # cheap enough to call on the event loop
+
+    def __init__(self, maxsize: int = 100_000, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> tuple[dict, float] | None:
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            data, expires_at = item
+            if expires_at <= self.clock():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return dict(data), expires_at
+
+    def save(self, sid: str, data: dict, expires_at: float) -> None:
+        with self._lock:
+            self._data[sid] = (dict(data), expires_at)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def touch(self, sid: str, expires_at: float) -> None:
+        with self._lock:
+            item = self._data.get(sid)
+            if item is not None:
+                self._data[sid] = (item[0], expires_at)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def active(self, uid: int | None = None) -> list[SessionInfo]:
+        now = self.clock()
+        with self._lock:
+            items = list(self._data.items())
+        return [
+            (sid, _uid_of(data), exp)
+            for sid, (data, exp) in items
+            if exp > now and (uid is None or _uid_of(data) == uid)
+        ]
+
+    def revoke_user(self, uid: int) -> int:
+        with self._lock:
+            sids = [sid for sid, (data, _) in self._data.items() if _uid_of(data) == uid]
+            for sid in sids:
+                del self._data[sid]
+        return len(sids)
+
+    def flush(self) -> None:
+        pass
+
+
+class SQLiteSessionStore:
+    """Sessions in the `server_sessions` table; expiry bumps are written in batches."""
+
+    blocking = True  # sync SQLite I/O: the middleware calls it from the threadpool
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = 256,
+        flush_interval: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.engine = engine
+        self.table = ServerSession.__table__
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._pending: dict[str, float] = {}
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> tuple[dict, float] | None:
+        t = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(select(t.c.data, t.c.expires_at).where(t.c.id == sid)).first()
+        if row is None:
+            return None
+        expires_at = max(row.expires_at, self._pending.get(sid, 0.0))
+        if expires_at <= self.clock():
+            return None
+        return json.loads(row.data), expires_at
+
+    def save(self, sid: str, data: dict, expires_at: float) -> None:
+        t = self.table
+        values = {"data": json.dumps(data), "user_id": _uid_of(data), "expires_at": expires_at}
+        with self.engine.begin() as conn:
+            if conn.execute(update(t).where(t.c.id == sid).values(**values)).rowcount == 0:
+                conn.execute(t.insert().values(id=sid, **values))
+        with self._lock:
+            self._pending.pop(sid, None)
+
+    def touch(self, sid: str, expires_at: float) -> None:
+        with self._lock:
+            self._pending[sid] = expires_at
+            due = (
+                len(self._pending) >= self.batch_size
+                or self.clock() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = self.clock()
+        t = self.table
+        with self.engine.begin() as conn:
+            if pending:
+                conn.execute(
+                    t.update().where(t.c.id == bindparam("sid")).values(expires_at=bindparam("exp")),
+                    [{"sid": sid, "exp": exp} for sid, exp in pending.items()],
+                )
+            conn.execute(delete(t).where(t.c.expires_at <= self._last_flush))
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._pending.pop(sid, None)
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def active(self, uid: int | None = None) -> list[SessionInfo]:
+        t = self.table
+        q = select(t.c.id, t.c.user_id, t.c.expires_at).where(t.c.expires_at > self.clock())
+        if uid is not None:
+            q = q.where(t.c.user_id == uid)
+        with self.engine.connect() as conn:
+            return [(r.id, r.user_id, r.expires_at) for r in conn.execute(q)]
+
+    def revoke_user(self, uid: int) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.user_id == uid)).rowcount
+
+
+class ServerSessionMiddleware:
+    """Drop-in replacement for SessionMiddleware keeping only an opaque id in the cookie."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store,
+        session_cookie: str = "session",
+        max_age: int = SESSION_MAX_AGE,
+        path: str = "/",
+        same_site: Literal["lax", "strict", "none"] = "lax",
+        https_only: bool = False,
+        refresh_after: int | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        # sliding expiry is only extended once this many seconds have elapsed
+        self.refresh_after = refresh_after if refresh_after is not None else min(3600, max_age // 2)
+        self.clock = clock
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    def _cookie(self, value: str, max_age: int) -> str:
+        if max_age > 0:
+            lifetime = f"Max-Age={max_age}; "
+        else:
+            lifetime = "expires=Thu, 01 Jan 1970 00:00:00 GMT; "
+        return f"{self.session_cookie}={value}; path={self.path}; {lifetime}{self.security_flags}"
+
+    async def _store(self, method: str, *args):
+        fn = getattr(self.store, method)
+        if getattr(self.store, "blocking", True):
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        sid = HTTPConnection(scope).cookies.get(self.session_cookie)
+        loaded = await self._store("load", sid) if sid else None
+        if loaded is None:
+            sid, initial, expires_at = None, {}, 0.0
+        else:
+            initial, expires_at = loaded
+        initial_blob = json.dumps(initial, sort_keys=True)
+        scope["session"] = _SessionDict(initial)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal sid
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                now = self.clock()
+                cookie = None
+                if session:
+                    uid_assigned = getattr(session, "uid_assigned", False)
+                    if sid is None or uid_assigned or json.dumps(session, sort_keys=True) != initial_blob:
+                        # new id on every login (session fixation)
+                        if sid is not None and uid_assigned:
+                            await self._store("delete", sid)
+                            sid = None
+                        sid = sid or secrets.token_urlsafe(32)
+                        await self._store("save", sid, session, now + self.max_age)
+                        cookie = self._cookie(sid, self.max_age)
+                    elif now + self.max_age - expires_at >= self.refresh_after:
+                        await self._store("touch", sid, now + self.max_age)
+                        cookie = self._cookie(sid, self.max_age)
+                elif sid is not None:
+                    await self._store("delete", sid)
+                    cookie = self._cookie("null", 0)
+                if cookie:
+                    MutableHeaders(scope=message).append("Set-Cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def make_session_store(backend: str = SESSION_BACKEND):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        from .db import engine
+
+        return SQLiteSessionStore(engine)
+    return None
+
+
+# None when the default signed-cookie backend is in use
+session_store = make_session_store()
@@ -0,0 +1,184 @@
+# app/sqlstats.py — per-request SQL instrumentation
+#
+# Engine events attribute every statement to the request that issued it (via a
+# contextvar, which Starlette copies into the threadpool for sync routes).
+# Per request we keep count/total time and flag statements repeated more than
+# SQL_REPEAT_THRESHOLD times (the N+1 signature: same SQL, different params).
+# Statements slower than SQL_SLOW_MS are logged with the *shape* of their
+# parameters, never the values.
+#
+# DEBUG=1 adds X-DB-* response headers; /debug/sql serves per-route aggregates.
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admin import DEBUG, require_admin
+
+log = logging.getLogger(__name__)
+
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "100"))
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "total_ms", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> list[tuple[str, int]]:
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n > threshold]
+
+
+_current: ContextVar[RequestQueryStats | None] = ContextVar("sql_request_stats", default=None)
+
+
+def current_stats() -> RequestQueryStats | None:
+    return _current.get()
+
+
+def _params_shape(parameters, executemany: bool) -> str:
+    if executemany:
+        first = parameters[0] if parameters else ()
+        return f"{len(parameters)} x {_params_shape(first, False)}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters or ()) + ")"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    context._sqlstats_t0 = time.perf_counter()
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - context._sqlstats_t0) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, ms)
+    if ms >= SQL_SLOW_MS:
+        log.warning("slow query %.1f ms params=%s: %s", ms, _params_shape(parameters, executemany),
+                    " ".join(statement.split()))
+
+
+def instrument(engine) -> None:
+    """Attach the timing hooks to a sync Engine (use async_engine.sync_engine for async)."""
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+
+# ---------- per-route aggregates ----------
+class _RouteAgg:
+    __slots__ = ("requests", "queries", "total_ms", "max_queries", "n_plus_one")
+
+    def __init__(self):
+        self.requests = self.queries = self.max_queries = self.n_plus_one = 0
+        self.total_ms = 0.0
+
+
+_routes: dict[str, _RouteAgg] = {}
+_n_plus_one_samples: deque[dict] = deque(maxlen=50)
+_lock = threading.Lock()
+
+
+def route_key(scope: Scope) -> str:
+    route = scope.get("route")
+    return f'{scope.get("method", "WS")} {getattr(route, "path", None) or "<unmatched>"}'
+
+
+def _finish(scope: Scope, stats: RequestQueryStats) -> None:
+    key = route_key(scope)
+    repeated = stats.repeated()
+    with _lock:
+        agg = _routes.get(key)
+        if agg is None:
+            agg = _routes[key] = _RouteAgg()
+        agg.requests += 1
+        agg.queries += stats.count
+        agg.total_ms += stats.total_ms
+        agg.max_queries = max(agg.max_queries, stats.count)
+        if repeated:
+            agg.n_plus_one += 1
+            _n_plus_one_samples.append(
+                {"route": key, "path": scope.get("path"), "statements": [{"sql": s, "times": n} for s, n in repeated]}
+            )
+    if repeated:
+        stmt, n = repeated[0]
+        log.warning("possible N+1 on %s: statement repeated %d times: %s", key, n, " ".join(stmt.split()))
+
+
+def snapshot() -> dict:
+    with _lock:
+        routes = {
+            k: {
+                "requests": a.requests,
+                "queries": a.queries,
+                "avg_queries": round(a.queries / a.requests, 2),
+                "max_queries": a.max_queries,
+                "avg_ms": round(a.total_ms / a.requests, 3),
+                "n_plus_one_requests": a.n_plus_one,
+            }
+            for k, a in sorted(_routes.items())
+        }
+        samples = list(_n_plus_one_samples)
+    return {"slow_ms": SQL_SLOW_MS, "repeat_threshold": SQL_REPEAT_THRESHOLD, "routes": routes, "n_plus_one": samples}
+
+
+def reset() -> None:
+    with _lock:
+        _routes.clear()
+        _n_plus_one_samples.clear()
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, headers: bool = DEBUG):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if self.headers and message["type"] == "http.response.start":
+                h = MutableHeaders(scope=message)
+                h["X-DB-Query-Count"] = str(stats.count)
+                h["X-DB-Query-Time-ms"] = f"{stats.total_ms:.2f}"
+                h["X-DB-Repeated-Statements"] = str(len(stats.repeated()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _finish(scope, stats)
+
+
+router = APIRouter()
+
+
+@router.get("/debug/sql", dependencies=[Depends(require_admin)])
+def sql_stats():
+    return snapshot()
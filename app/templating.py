@@ -0,0 +1,57 @@
+# app/templating.py — the one Jinja2 environment shared by every router
+#
+# Compiled templates are cached as bytecode on disk (TEMPLATE_CACHE_DIR, or a
+# per-user temp dir), so a fresh worker loads code instead of re-parsing.
+# precompile() runs at startup and compiles every page up front so the first
+# request after a deploy doesn't pay for it. Templates are only re-checked
+# for changes on disk when TEMPLATE_AUTO_RELOAD=1 (defaults to DEBUG).
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from .admin import DEBUG
+
+log = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "1" if DEBUG else "0") == "1"
+TEMPLATE_BYTECODE_CACHE = os.getenv("TEMPLATE_BYTECODE_CACHE", "1") == "1"
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR") or None
+
+
+def make_environment(
+    directory: Path = TEMPLATE_DIR,
+    auto_reload: bool = TEMPLATE_AUTO_RELOAD,
+    bytecode_cache: bool = TEMPLATE_BYTECODE_CACHE,
+    cache_dir: str | None = TEMPLATE_CACHE_DIR,
+) -> Environment:
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,  # same as Jinja2Templates(directory=...)
+        auto_reload=auto_reload,
+        bytecode_cache=FileSystemBytecodeCache(cache_dir) if bytecode_cache else None,
+        cache_size=-1,  # never evict compiled templates; the set is small and fixed
+    )
+
+
+templates = Jinja2Templates(env=make_environment())
+
+
+def precompile(env: Environment | None = None) -> int:
+    """Compile (or load from bytecode cache) every .html template; returns the count."""
+    env = env or templates.env
+    if isinstance(env.bytecode_cache, FileSystemBytecodeCache):
+        os.makedirs(env.bytecode_cache.directory, exist_ok=True)  # here, not at import
+    t0 = time.perf_counter()
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    log.info("compiled %d templates in %.1f ms", len(names), (time.perf_counter() - t0) * 1000)
+    return len(names)
@@ -0,0 +1,129 @@
+# app/typeahead.py — find people by nickname or username prefix
+#
+# SQLite's LIKE is case-insensitive by default, so `nickname LIKE 'x%'` can't
+# use ix_users_nickname and scans the table. Instead every user's normalized
+# username and nickname go into one sorted array of "name\0uid" strings (a
+# single small object per entry); a prefix query is a bisect to the first
+# name >= prefix plus a short walk while names still start with it. "\0"
+# sorts before any other character, so an exact match comes first.
+#
+# Loaded at startup, updated on signup/profile edits and rebuilt in the
+# background every TYPEAHEAD_RELOAD_SECONDS to pick up other processes' users.
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from sortedcontainers import SortedList
+from sqlalchemy import text
+
+from .matching import normalize
+from .usercache import get_user, request_user
+
+log = logging.getLogger(__name__)
+
+TYPEAHEAD_RELOAD_SECONDS = float(os.getenv("TYPEAHEAD_RELOAD_SECONDS", "600"))
+TYPEAHEAD_LIMIT = 8
+SEP = "\0"
+
+
+def _keys(uid: int, username: str | None, nickname: str | None) -> tuple[str, ...]:
+    return tuple({f"{n}{SEP}{uid}" for n in (normalize(username), normalize(nickname)) if n})
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: SortedList = SortedList()
+        self._by_uid: dict[int, tuple[str, ...]] = {}  # the same str objects as in _keys
+        self._replay: dict[int, tuple] | None = None  # upserts made during a rebuild
+        self.loaded_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._by_uid)
+
+    def upsert(self, uid: int, username: str | None, nickname: str | None) -> None:
+        keys = _keys(uid, username, nickname)
+        with self._lock:
+            if self._replay is not None:
+                self._replay[uid] = (username, nickname)
+            for key in self._by_uid.pop(uid, ()):
+                self._keys.discard(key)
+            if keys:
+                self._by_uid[uid] = keys
+                self._keys.update(keys)
+
+    def search(self, prefix: str, limit: int = TYPEAHEAD_LIMIT) -> list[int]:
+        """User ids whose username or nickname starts with prefix, in name order."""
+        prefix = normalize(prefix).replace(SEP, "")
+        if not prefix:
+            return []
+        out: list[int] = []
+        with self._lock:
+            keys = self._keys
+            for key in keys.islice(keys.bisect_left(prefix)):
+                if not key.startswith(prefix):
+                    break
+                uid = int(key.rpartition(SEP)[2])
+                if uid not in out:  # matched by both names
+                    out.append(uid)
+                    if len(out) == limit:
+                        break
+        return out
+
+    def load(self, rows) -> int:
+        """Rebuild from (id, username, nickname) rows."""
+        with self._lock:
+            self._replay = {}
+        by_uid = {uid: ks for uid, username, nickname in rows if (ks := _keys(uid, username, nickname))}
+        keys = SortedList(k for ks in by_uid.values() for k in ks)
+        with self._lock:
+            self._keys, self._by_uid = keys, by_uid
+            replay, self._replay = self._replay, None
+            for uid, (username, nickname) in replay.items():
+                self.upsert(uid, username, nickname)
+            self.loaded_at = time.monotonic()
+        return len(by_uid)
+
+    def load_from_db(self, engine) -> int:
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            n = self.load(conn.execute(text("SELECT id, username, nickname FROM users")))
+        log.info("typeahead: %d users indexed in %.2f s", n, time.perf_counter() - t0)
+        return n
+
+    def reload_in_background(self, engine) -> None:
+        if self.loaded_at and time.monotonic() - self.loaded_at < TYPEAHEAD_RELOAD_SECONDS:
+            return
+        self.loaded_at = time.monotonic()  # claim the reload
+        threading.Thread(target=self.load_from_db, args=(engine,), daemon=True).start()
+
+
+people = PrefixIndex()
+
+# ---------- routes ----------
+router = APIRouter()
+
+
+@router.get("/users/search")
+def users_search(request: Request, q: str = "", limit: int = TYPEAHEAD_LIMIT):
+    from .db import engine
+
+    me = request_user(request)
+    if not me:
+        return JSONResponse({"error": "login required"}, status_code=401)
+    people.reload_in_background(engine)
+    limit = max(1, min(limit, 20))
+    users = (get_user(uid) for uid in people.search(q, limit + 1))  # +1: we drop ourselves
+    return {
+        "users": [
+            {"id": u.id, "username": u.username, "nickname": u.nickname, "avatar_url": u.avatar_url}
+            for u in users
+            if u is not None and u.id != me.id
+        ][:limit]
+    }
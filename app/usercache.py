@@ -0,0 +1,177 @@
+# app/usercache.py — shared TTL/LRU cache of user snapshots
+#
+# Nav bars and auth guards only need a read-only view of the logged-in user,
+# so we keep a small per-process cache keyed by uid instead of hitting the DB
+# on every request. Anything that writes a `users` row (profile edit, signup,
+# coin changes) must call `invalidate_user(uid)` after its commit.
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from fastapi import Request
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db import engine
+from .models import User
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Detached, read-only copy of a `User` row (no password hash)."""
+
+    id: int
+    username: str
+    email: Optional[str] = None
+    coins: int = 0
+    nickname: Optional[str] = None
+    birth_date: Optional[date] = None
+    gender: Optional[str] = None
+    avatar_url: Optional[str] = None
+    sport: Optional[str] = None
+    time_window: Optional[str] = None
+    region: Optional[str] = None
+    goal: Optional[str] = None
+    is_active: bool = False
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, u: User) -> "UserSnapshot":
+        return cls(
+            id=int(u.id),
+            username=u.username,
+            email=u.email,
+            coins=u.coins,
+            nickname=u.nickname,
+            birth_date=u.birth_date,
+            gender=u.gender,
+            avatar_url=u.avatar_url,
+            sport=u.sport,
+            time_window=u.time_window,
+            region=u.region,
+            goal=u.goal,
+            is_active=u.is_active,
+            created_at=u.created_at,
+        )
+
+
+_MISSING = object()
+
+
+class UserCache:
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # bumped on every invalidation; lets callers build cheap version stamps
+        self.revision = 0
+        self._data: OrderedDict[int, tuple[float, Optional[UserSnapshot]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uid: int):
+        """Return the cached snapshot (or None for a known-missing uid), else _MISSING."""
+        now = self.clock()
+        with self._lock:
+            item = self._data.get(uid)
+            if item is None:
+                self.misses += 1
+                return _MISSING
+            expires, snap = item
+            if expires < now:
+                del self._data[uid]
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(uid)
+            self.hits += 1
+            return snap
+
+    def put(self, uid: int, snap: Optional[UserSnapshot]) -> None:
+        with self._lock:
+            self._data[uid] = (self.clock() + self.ttl, snap)
+            self._data.move_to_end(uid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, uid: int) -> None:
+        with self._lock:
+            self._data.pop(uid, None)
+            self.revision += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.revision += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+user_cache = UserCache()
+
+
+def get_user(uid: int, session: Session | None = None) -> UserSnapshot | None:
+    snap = user_cache.get(uid)
+    if snap is not _MISSING:
+        return snap
+
+    if session is not None:
+        u = session.get(User, uid)
+    else:
+        with Session(engine) as s:
+            u = s.get(User, uid)
+    snap = UserSnapshot.from_user(u) if u else None
+    user_cache.put(uid, snap)
+    return snap
+
+
+async def aget_user(uid: int, session: AsyncSession) -> UserSnapshot | None:
+    snap = user_cache.get(uid)
+    if snap is not _MISSING:
+        return snap
+
+    u = await session.get(User, uid)
+    snap = UserSnapshot.from_user(u) if u else None
+    user_cache.put(uid, snap)
+    return snap
+
+
+def request_user(request: Request, session: Session | None = None) -> UserSnapshot | None:
+    """Resolve the logged-in user once per request (memoized on request.state)."""
+    state = request.state
+    if hasattr(state, "user"):
+        return state.user
+
+    uid = request.session.get("uid")
+    user = get_user(int(uid), session) if uid else None
+    state.user = user
+    return user
+
+
+async def arequest_user(request: Request, session: AsyncSession) -> UserSnapshot | None:
+    state = request.state
+    if hasattr(state, "user"):
+        return state.user
+
+    uid = request.session.get("uid")
+    user = await aget_user(int(uid), session) if uid else None
+    state.user = user
+    return user
+
+
+def invalidate_user(uid: int, request: Request | None = None) -> None:
+    user_cache.invalidate(int(uid))
+    if request is not None and hasattr(request.state, "user"):
+        del request.state.user
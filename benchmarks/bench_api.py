@@ -0,0 +1,131 @@
+# benchmarks/bench_api.py — /api/v1 JSON vs. the HTML pages it replaces
+#
+#   python -m benchmarks.bench_api [--size 4] [--requests 50]
+#
+# Seeds a database with app.datagen (BASE x --size, as in bench_routes) in a
+# subprocess, logs in as the busiest chat user and, for each page and its API
+# counterpart (full rows, then a fields= projection), records p50 latency,
+# body size and gzip size. Finally compares orjson with the json module on a
+# 100-item page.
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from benchmarks.bench_routes import BASE, PASSWORD
+from app.datagen import Scale
+
+PAIRS = [
+    ("/posts", "/api/v1/posts", "caption,author_id"),
+    ("/posts/{post_id}", "/api/v1/posts/{post_id}/comments", "content"),
+    ("/chat", "/api/v1/chats", "user1_id,user2_id"),
+    ("/chat/{room_id}", "/api/v1/chats/{room_id}/messages", "content"),
+    ("/wallet", "/api/v1/wallet", "amount"),
+    ("/dex", "/api/v1/orderbook", "price,amount"),
+]
+
+
+def _worker(size: int, db_path: str, requests: int) -> list[dict]:
+    from fastapi.testclient import TestClient
+
+    from app.datagen import Generator
+    from app.db import engine, init_db
+
+    init_db()
+    Generator(engine, Scale(**{k: v * size for k, v in asdict(BASE).items()}), seed=size,
+              log=lambda line: print(line, file=sys.stderr)).run()
+    with engine.connect() as conn:
+        q = conn.exec_driver_sql
+        room_id, = q("SELECT room_id FROM messages GROUP BY room_id ORDER BY COUNT(*) DESC LIMIT 1").one()
+        uid, = q("SELECT user1_id FROM chat_rooms WHERE id = ?", (room_id,)).one()
+        post_id, = q("SELECT post_id FROM comments GROUP BY post_id ORDER BY COUNT(*) DESC LIMIT 1").one()
+
+    from app.main import app
+
+    def measure(client, path, params=None):
+        for _ in range(2):
+            client.get(path, params=params)
+        samples = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            r = client.get(path, params=params)
+            samples.append((time.perf_counter() - t0) * 1000)
+            assert r.status_code == 200, f"GET {path} -> {r.status_code}"
+        return {"p50_ms": statistics.median(samples), "bytes": len(r.content), "gzip": len(gzip.compress(r.content))}
+
+    out = []
+    with TestClient(app) as client:
+        r = client.post("/login", data={"email": f"user{uid}@example.com", "password": PASSWORD},
+                        follow_redirects=False)
+        assert r.status_code == 303, f"login failed: {r.status_code}"
+        for html, api, fields in PAIRS:
+            html, api = (p.format(post_id=post_id, room_id=room_id) for p in (html, api))
+            out.append({
+                "route": html,
+                "html": measure(client, html),
+                "api": measure(client, api),
+                "fields": measure(client, api, {"fields": fields}),
+            })
+    return out
+
+
+def _encoders() -> None:
+    from datetime import datetime
+
+    from app.api import orjson
+
+    page = {"items": [{"id": i, "author_id": i * 7, "caption": f"Morning run #{i} 🏃 along the seawall",
+                       "image_url": f"/static/post_images/{i:032x}.jpg", "created_at": datetime(2030, 1, 1, 7, i % 60)}
+                      for i in range(100)], "next": 1}
+    encoders = {"json": lambda c: json.dumps(c, separators=(",", ":"), ensure_ascii=False, default=str).encode()}
+    if orjson is not None:
+        encoders["orjson"] = orjson.dumps
+    for name, enc in encoders.items():
+        t0 = time.perf_counter()
+        for _ in range(2000):
+            enc(page)
+        print(f"encode 100-post page  {name:<7} {(time.perf_counter() - t0) / 2000 * 1e6:7.1f} µs")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size", type=int, default=4, help="multiple of bench_routes.BASE")
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--db", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.size, args.db, args.requests)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "api.db")
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "TESTING": "0", "RATE_LIMIT": "0",
+               "SESSION_BACKEND": "cookie"}
+        cmd = [sys.executable, "-m", "benchmarks.bench_api", "--worker", "--size", str(args.size),
+               "--db", db_path, "--requests", str(args.requests)]
+        rows = json.loads(subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, text=True)
+                          .stdout.strip().splitlines()[-1])
+
+    print(f"{'route':<16} {'':>6} {'p50 ms':>8} {'bytes':>9} {'gzip':>8}")
+    for row in rows:
+        for kind in ("html", "api", "fields"):
+            m = row[kind]
+            label = row["route"] if kind == "html" else ""
+            print(f"{label:<16} {kind:>6} {m['p50_ms']:8.2f} {m['bytes']:9,} {m['gzip']:8,}")
+    _encoders()
+
+
+if __name__ == "__main__":
+    main()
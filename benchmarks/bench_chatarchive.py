@@ -0,0 +1,110 @@
+# benchmarks/bench_chatarchive.py — moving old chat history to cold segments
+#
+#   python -m benchmarks.bench_chatarchive [--messages 2000000] [--rooms 50000] [--days 365]
+#
+# Builds a throwaway database with --messages messages spread over --rooms
+# rooms and --days days (busy rooms get more), archives everything older than
+# --older-than days, then reports:
+#   hot size  — bytes used by `messages` and its indexes, before and after (VACUUMed)
+#   archive   — compressed segment bytes
+#   pages     — latency of a 50-message history page that is all hot, that
+#               straddles the boundary, and that is all archived (cold cache)
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel
+
+import app.models  # noqa: F401  (registers the tables)
+from app.chatarchive import ChatArchive
+from app.db import make_engine
+from app.migrations import run_migrations
+
+BATCH = 50_000
+NOW = datetime(2031, 1, 1)
+WORDS = "ok see you at the gym tomorrow morning run was great thanks let's go again same time 7am sounds good".split()
+
+
+def _messages(conn, n: int, rooms: int, days: int, rng: random.Random) -> None:
+    start = NOW - timedelta(days=days)
+    step = timedelta(days=days) / n
+    rows = (
+        (min(rooms, int(rng.paretovariate(1.1))), rng.randrange(1, 1000),
+         " ".join(rng.choices(WORDS, k=rng.randrange(2, 12))), (start + step * i).strftime("%Y-%m-%d %H:%M:%S.%f"))
+        for i in range(n)
+    )
+    while chunk := [r for _, r in zip(range(BATCH), rows)]:
+        conn.exec_driver_sql("INSERT INTO messages (room_id, sender_id, content, created_at) VALUES (?, ?, ?, ?)", chunk)
+
+
+def _hot_bytes(eng) -> int:
+    with eng.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+        return conn.execute(text(
+            "SELECT sum(pgsize) FROM dbstat WHERE name IN "
+            "(SELECT name FROM sqlite_master WHERE tbl_name = 'messages')"
+        )).scalar()
+
+
+def _pages(label: str, store: ChatArchive, hot, picks: list[tuple[int, int | None]]) -> None:
+    times = []
+    with Session(hot) as s:
+        for room, before in picks:
+            store._segment.cache_clear()
+            t0 = time.perf_counter()
+            store.history(s, room, before, 50)
+            times.append(time.perf_counter() - t0)
+    times.sort()
+    print(f"page {label:<10} p50 {statistics.median(times) * 1e3:6.2f} ms   "
+          f"p99 {times[int(len(times) * 0.99)] * 1e3:6.2f} ms   ({len(times)} pages)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=2_000_000)
+    ap.add_argument("--rooms", type=int, default=50_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--older-than", type=int, default=90, metavar="DAYS")
+    ap.add_argument("--pages", type=int, default=500)
+    ap.add_argument("--data-dir", type=Path, help="keep the databases here instead of a temp dir")
+    args = ap.parse_args()
+
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix="bench-chatarchive-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    hot = make_engine(f"sqlite:///{data_dir / 'hot.db'}")
+    SQLModel.metadata.create_all(hot)
+    run_migrations(hot)
+    rng = random.Random(1)
+    with hot.begin() as conn:
+        _messages(conn, args.messages, args.rooms, args.days, rng)
+    before_bytes = _hot_bytes(hot)
+
+    store = ChatArchive(f"sqlite:///{data_dir / 'archive.db'}")
+    t0 = time.perf_counter()
+    moved, segments = store.run(hot, timedelta(days=args.older_than), now=NOW)
+    dt = time.perf_counter() - t0
+    after_bytes = _hot_bytes(hot)
+    st = store.stats()
+    print(f"archived {moved:,} of {args.messages:,} messages into {segments:,} segments in {dt:.1f}s")
+    print(f"hot size  {before_bytes / 1e6:8.1f} MB -> {after_bytes / 1e6:8.1f} MB "
+          f"({1 - after_bytes / before_bytes:.0%} smaller)")
+    print(f"archive   {st['bytes'] / 1e6:8.1f} MB compressed")
+
+    with hot.connect() as conn:
+        boundary = dict(conn.execute(text("SELECT room_id, min(id) FROM messages GROUP BY room_id")).all())
+    busy = [r for r, _ in sorted(boundary.items())[:200]]  # low room ids are the busy ones
+    _pages("hot", store, hot, [(rng.choice(busy), None) for _ in range(args.pages)])
+    _pages("straddling", store, hot, [(r, boundary[r] + 25) for r in rng.choices(busy, k=args.pages)])
+    _pages("archived", store, hot, [(r, boundary[r] - 500) for r in rng.choices(busy, k=args.pages)])
+
+
+if __name__ == "__main__":
+    main()
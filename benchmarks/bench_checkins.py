@@ -0,0 +1,99 @@
+# benchmarks/bench_checkins.py — check-in validation with many open sessions
+#
+#   python -m benchmarks.bench_checkins [--sessions 1000,10000,100000] [--checks 20000]
+#
+# Open sessions are clustered around a few metro centres (most sessions in
+# the busiest city, like real traffic). For each size it times:
+#   nearby  — CheckinIndex.nearby(): sessions covering a point (grid cells)
+#   linear  — the same answer by haversine against every open session
+#   check   — CheckinIndex.check(): validating a check-in for a known session
+# and the nearby() throughput with --threads request threads sharing the index.
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.checkins import ActiveSession, CheckinIndex
+from app.geo import haversine_m
+
+CENTRES = [(49.2827, -123.1207), (37.7749, -122.4194), (40.7128, -74.0060), (51.5072, -0.1276), (37.5665, 126.9780)]
+CENTRE_WEIGHTS = [8, 4, 4, 2, 2]
+SPREAD_DEG = 0.15  # ~15 km around each centre
+LINEAR_MAX_CHECKS = 2000
+
+
+def _point(rng: random.Random) -> tuple[float, float]:
+    lat, lon = rng.choices(CENTRES, CENTRE_WEIGHTS)[0]
+    return lat + rng.gauss(0, SPREAD_DEG), lon + rng.gauss(0, SPREAD_DEG)
+
+
+def _build(n: int, rng: random.Random) -> tuple[CheckinIndex, list[ActiveSession]]:
+    idx = CheckinIndex()
+    sessions = []
+    for sid in range(1, n + 1):
+        lat, lon = _point(rng)
+        s = ActiveSession(sid, lat, lon, rng.choice([50, 100, 150, 300, 500]), 0.0, 1e12)
+        idx.add(s, now=1.0)
+        sessions.append(s)
+    return idx, sessions
+
+
+def _queries(sessions: list[ActiveSession], n: int, rng: random.Random) -> list[tuple[int, float, float]]:
+    # half near a real session (accepted or just outside), half anywhere in the metro areas
+    out = []
+    for _ in range(n):
+        s = rng.choice(sessions)
+        if rng.random() < 0.5:
+            lat, lon = s.lat + rng.uniform(-0.003, 0.003), s.lon + rng.uniform(-0.003, 0.003)
+        else:
+            lat, lon = _point(rng)
+        out.append((s.id, lat, lon))
+    return out
+
+
+def _rate(fn, queries) -> float:
+    t0 = time.perf_counter()
+    for q in queries:
+        fn(*q)
+    return len(queries) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", default="1000,10000,100000")
+    ap.add_argument("--checks", type=int, default=20000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+
+    print(f"{'sessions':>9} {'build s':>8} {'nearby/s':>10} {'linear/s':>10} {'check/s':>10} "
+          f"{'nearby/s x' + str(args.threads):>13} {'avg hits':>9}")
+    for n in (int(x) for x in args.sessions.split(",")):
+        rng = random.Random(n)
+        t0 = time.perf_counter()
+        idx, sessions = _build(n, rng)
+        build = time.perf_counter() - t0
+        queries = _queries(sessions, args.checks, rng)
+        now = 2.0
+
+        hits = sum(len(idx.nearby(lat, lon, now)) for _, lat, lon in queries[:1000]) / 1000
+        nearby = _rate(lambda sid, lat, lon: idx.nearby(lat, lon, now), queries)
+        linear = _rate(
+            lambda sid, lat, lon: [s for s in sessions if haversine_m(lat, lon, s.lat, s.lon) <= s.radius_m],
+            queries[: max(10, min(LINEAR_MAX_CHECKS, 2_000_000 // n))],
+        )
+        check = _rate(lambda sid, lat, lon: idx.check(sid, lat, lon, now), queries)
+
+        chunks = [queries[i :: args.threads] for i in range(args.threads)]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(lambda qs: [idx.nearby(lat, lon, now) for _, lat, lon in qs], chunks))
+        threaded = len(queries) / (time.perf_counter() - t0)
+
+        print(f"{n:>9} {build:>8.2f} {nearby:>10.0f} {linear:>10.0f} {check:>10.0f} {threaded:>13.0f} {hits:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_coldstart.py — time to first response of a fresh worker
+#
+#   python -m benchmarks.bench_coldstart [--runs 10]
+#
+# Starts --runs fresh interpreters. Each one times `import app.main`, the
+# lifespan startup (migrations, template precompile, in-memory indexes) and
+# the first GET /login (the first page a new visitor renders), then a second
+# GET /login for reference. Prints the median of each phase and the slowest
+# imports (self time) from one `python -X importtime` run.
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+from app.main import app
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    t2 = time.perf_counter()
+    assert client.get("/login").status_code == 200
+    t3 = time.perf_counter()
+    client.get("/login")
+    t4 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "lifespan": t2 - t1, "first": t3 - t2, "second": t4 - t3, "total": t3 - t0}))
+"""
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--top", type=int, default=12, help="slowest imports to list")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/cold.db", "TESTING": "0", "RATE_LIMIT": "0"}
+        runs = [json.loads(subprocess.run([sys.executable, "-c", PROBE], env=env, check=True,
+                                          capture_output=True, text=True).stdout.strip().splitlines()[-1])
+                for _ in range(args.runs)]
+        trace = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], env=env,
+                               check=True, capture_output=True, text=True).stderr
+
+    for phase in ("import", "lifespan", "first", "second", "total"):
+        xs = sorted(r[phase] * 1000 for r in runs)
+        print(f"{phase:<9} p50 {statistics.median(xs):8.1f} ms   max {xs[-1]:8.1f} ms")
+
+    own = sorted(((int(m.group(1)), m.group(2)) for m in
+                  re.finditer(r"import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)", trace)), reverse=True)
+    print("\nslowest imports (self):")
+    for us, name in own[: args.top]:
+        print(f"  {us / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_hub.py — per-user socket fan-out at 100k open sockets
+#
+#   python -m benchmarks.bench_hub [--users 50000] [--devices 2] [--events 20000]
+#
+# Attaches fake sockets (--devices per user) to the hub, then times routing
+# a chat message to both members of random DM rooms, including the time for
+# every writer task to hand its frame to the socket. --scan also times the
+# alternative of finding a user's sockets by scanning every connection.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.hub import Hub
+
+
+class NullSocket:
+    sent = 0
+
+    async def send_text(self, frame: str) -> None:
+        NullSocket.sent += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _pct(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+async def run(args) -> None:
+    hub = Hub()
+    rng = random.Random(1)
+    conns = []
+    t0 = time.perf_counter()
+    for uid in range(1, args.users + 1):
+        for _ in range(args.devices):
+            conns.append(hub.attach(NullSocket(), uid))
+    print(f"attach  {len(conns):,} sockets in {time.perf_counter() - t0:.2f}s")
+    for c in rng.sample(conns, len(conns) // 4):  # a quarter of the devices have a room open
+        c.rooms.add(c.uid)
+
+    msg = {"type": "text", "id": 1, "sender_id": 0, "content": "see you at the track", "created_at": "2030-01-01"}
+    lat, expected = [], 0
+    t0 = time.perf_counter()
+    for i in range(args.events):
+        a, b = rng.randint(1, args.users), rng.randint(1, args.users)
+        t1 = time.perf_counter()
+        expected += hub.room_message(a, (a, b), {**msg, "id": i, "sender_id": b})
+        lat.append(time.perf_counter() - t1)
+        if i % 1000 == 999:
+            await asyncio.sleep(0)  # let the writers drain
+    while NullSocket.sent < expected:
+        await asyncio.sleep(0)
+    total = time.perf_counter() - t0
+    print(f"route   p50 {statistics.median(lat) * 1e6:7.1f} µs  p99 {_pct(lat, 99) * 1e6:7.1f} µs  "
+          f"({NullSocket.sent:,} frames delivered, {args.events / total:,.0f} messages/s end to end)")
+
+    if args.scan:
+        lat = []
+        for _ in range(200):
+            uid = rng.randint(1, args.users)
+            t1 = time.perf_counter()
+            [c for c in conns if c.uid == uid]
+            lat.append(time.perf_counter() - t1)
+        print(f"scan    p50 {statistics.median(lat) * 1e6:7.1f} µs  (one user's sockets, no index)")
+
+    for c in conns:
+        hub.detach(c)
+    await asyncio.sleep(0)  # let the cancelled writers finish
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=50_000)
+    ap.add_argument("--devices", type=int, default=2)
+    ap.add_argument("--events", type=int, default=20_000)
+    ap.add_argument("--scan", action="store_true", help="also time a linear scan for one user's sockets")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
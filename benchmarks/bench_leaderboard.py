@@ -0,0 +1,90 @@
+# benchmarks/bench_leaderboard.py — ranked boards vs. sorting in SQL
+#
+#   python -m benchmarks.bench_leaderboard [--users 1000000] [--queries 2000]
+#
+# Builds a throwaway database with --users users (random coins, sport and
+# region), then times:
+#   load    — the startup bulk load of every board
+#   sql     — one page view done in SQL: ORDER BY coins DESC LIMIT 50 plus
+#             a COUNT(*) for "my rank"
+#   boards  — the same page view against the in-memory boards
+#   updates — coin changes applied to the boards (remove + add per board)
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  (registers the tables)
+from app.db import make_engine
+from app.leaderboard import Leaderboards
+
+BATCH = 50_000
+SPORTS = ["running", "gym", "cycling", "swimming", "climbing", "yoga"]
+
+
+def _users(conn, n: int, rng: random.Random) -> None:
+    rows = ((i, f"u{i}", int(rng.paretovariate(1.2) * 10), rng.choice(SPORTS), f"region {rng.randrange(40)}")
+            for i in range(1, n + 1))
+    while chunk := [r for _, r in zip(range(BATCH), rows)]:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash, coins, sport, region, is_active, created_at) "
+            "VALUES (?, ?, 'x', ?, ?, ?, 1, '2030-01-01 00:00:00.000000')",
+            chunk,
+        )
+
+
+def _rate(label: str, n: int, dt: float) -> None:
+    print(f"{label:<8} {n:>9,} ops  {dt:7.2f}s  {n / dt:>11,.0f} ops/s  {dt / n * 1e6:>9.1f} µs/op")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--data-dir", type=Path, help="keep the database here instead of a temp dir")
+    args = ap.parse_args()
+
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix="bench-leaderboard-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    eng = make_engine(f"sqlite:///{data_dir / 'leaderboard.db'}")
+    SQLModel.metadata.create_all(eng)
+    rng = random.Random(1)
+    with eng.begin() as conn:
+        _users(conn, args.users, rng)
+
+    lb = Leaderboards()
+    t0 = time.perf_counter()
+    lb.load_from_db(eng)
+    print(f"load     {args.users:,} users into {len(lb._boards)} boards in {time.perf_counter() - t0:.2f}s")
+
+    uids = [rng.randrange(1, args.users + 1) for _ in range(args.queries)]
+    sql_n = max(1, args.queries // 20)  # the SQL path is slow; sample it
+    with eng.connect() as conn:
+        t0 = time.perf_counter()
+        for uid in uids[:sql_n]:
+            conn.execute(text("SELECT id, coins FROM users ORDER BY coins DESC, id LIMIT 50")).all()
+            conn.execute(text("SELECT 1 + count(*) FROM users WHERE coins > (SELECT coins FROM users WHERE id = :u)"),
+                         {"u": uid}).scalar()
+        _rate("sql", sql_n, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for uid in uids:
+        lb.top("coins", "all", 50)
+        lb.rank("coins", "all", uid)
+    _rate("boards", len(uids), time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for uid in uids:
+        lb.set_coins(uid, lb.rank("coins", "all", uid)[1] + rng.randrange(1, 100))
+    _rate("updates", len(uids), time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_matching.py — partner matching at production scale
+#
+#   python -m benchmarks.bench_matching [--users 1000000] [--queries 500]
+#
+# Builds the in-memory index from synthetic profiles (same skew as
+# app.datagen: big sports and regions dominate), then times incremental
+# upserts and top-K queries for the NumPy and pure-Python scorers.
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.datagen import GOALS, REGIONS, SPORT_WEIGHTS, SPORTS, TIME_WINDOWS
+from app.matching import Matcher, Profile, HAS_NUMPY
+
+
+def _rows(n: int, rng: random.Random):
+    for uid in range(1, n + 1):
+        yield (
+            uid,
+            rng.choices(SPORTS, SPORT_WEIGHTS)[0],
+            REGIONS[min(int(rng.expovariate(0.35)), len(REGIONS) - 1)],
+            rng.choice(TIME_WINDOWS + [None]),
+            rng.choice(GOALS),
+            f"{rng.randint(1965, 2006)}-06-01",
+        )
+
+
+def _pct(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=20)
+    args = ap.parse_args()
+
+    rows = list(_rows(args.users, random.Random(1)))
+    for use_numpy in ([True] if HAS_NUMPY else []) + [False]:
+        m = Matcher(use_numpy=use_numpy)
+        t0 = time.perf_counter()
+        m.load(rows)
+        build = time.perf_counter() - t0
+
+        rng = random.Random(2)
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            uid = rng.randint(1, args.users)
+            m.upsert(uid, Profile(*rows[uid - 1][1:3], "evening", "marathon", "1990-01-01"))
+        upsert_us = (time.perf_counter() - t0) / 1000 * 1e6
+
+        lat = []
+        for _ in range(args.queries):
+            uid = rng.randint(1, args.users)
+            t0 = time.perf_counter()
+            m.top_k(uid, args.k)
+            lat.append((time.perf_counter() - t0) * 1000)
+
+        name = "numpy" if use_numpy else "python"
+        print(f"{name:<7} build {build:6.1f}s  upsert {upsert_us:5.1f} µs  "
+              f"top-{args.k} p50 {statistics.median(lat):6.2f} ms  p99 {_pct(lat, 99):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_profiler.py — cost of ProfilerMiddleware per request
+#
+#   python -m benchmarks.bench_profiler [--requests 20000]
+#
+# Drives a trivial ASGI app directly (no HTTP stack) with realistic browser
+# headers: bare, behind the middleware with profiling off, and with every
+# request profiled (sample_rate=1), to show that the disabled path is free
+# and what a profile costs.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from app import profiler
+
+HEADERS = [
+    (b"host", b"sweatmarket.example"),
+    (b"user-agent", b"Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15"),
+    (b"accept", b"text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"),
+    (b"accept-language", b"ko-KR,ko;q=0.9,en-US;q=0.8"),
+    (b"accept-encoding", b"gzip, deflate, br"),
+    (b"cookie", b"sweatmarket_session=" + b"x" * 180),
+]
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def _time(app, n: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": HEADERS}
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), _receive, _send)
+    return (time.perf_counter() - t0) / n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=20_000)
+    args = ap.parse_args()
+
+    bare = asyncio.run(_time(endpoint, args.requests))
+    off = asyncio.run(_time(profiler.ProfilerMiddleware(endpoint, sample_rate=0), args.requests))
+    on = asyncio.run(_time(profiler.ProfilerMiddleware(endpoint, sample_rate=1), min(args.requests, 2000)))
+    print(f"bare          {bare * 1e6:8.2f} µs/request")
+    print(f"profiler off  {off * 1e6:8.2f} µs/request  (+{(off - bare) * 1e6:.2f} µs)")
+    print(f"profiled      {on * 1e6:8.2f} µs/request  (sampler thread start/stop; stacks every "
+          f"{profiler.PROFILE_INTERVAL_MS:g} ms while it runs)")
+
+
+if __name__ == "__main__":
+    main()
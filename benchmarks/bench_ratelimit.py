@@ -0,0 +1,71 @@
+# benchmarks/bench_ratelimit.py — rate limiter overhead per request
+#
+#   python -m benchmarks.bench_ratelimit [--requests 200000] [--keys 100000]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from app.ratelimit import DEFAULT_RULES, RateLimitMiddleware, RateLimitRule, TokenBucketLimiter
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _noop_send(message):
+    pass
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _drive(app, method: str, path: str, n: int, distinct_ips: int) -> float:
+    scopes = [
+        {"type": "http", "method": method, "path": path, "client": (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 1), "session": {}}
+        for i in range(distinct_ips)
+    ]
+    t0 = time.perf_counter()
+    for i in range(n):
+        await app(scopes[i % distinct_ips], _receive, _noop_send)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200_000)
+    ap.add_argument("--keys", type=int, default=100_000)
+    args = ap.parse_args()
+
+    # generous limits so every request is admitted and we time the bookkeeping
+    rules = [RateLimitRule(r.name, r.method, r.path, 10**9, 1, r.by) for r in DEFAULT_RULES]
+    limited = RateLimitMiddleware(_endpoint, rules)
+
+    asyncio.run(_drive(_endpoint, "GET", "/posts", args.requests, 1))  # warm-up
+    base = asyncio.run(_drive(_endpoint, "GET", "/posts", args.requests, 1))
+    print(f"{'case':<36} {'us/req':>8} {'overhead':>9}")
+    for label, app, method, path, ips in (
+        ("no middleware", _endpoint, "GET", "/posts", 1),
+        ("unmatched route (GET /posts)", limited, "GET", "/posts", 1),
+        ("limited route, 1 key", limited, "POST", "/login", 1),
+        (f"limited route, {args.keys} keys", limited, "POST", "/login", args.keys),
+    ):
+        us = asyncio.run(_drive(app, method, path, args.requests, ips))
+        print(f"{label:<36} {us:>8.2f} {us - base:>+9.2f}")
+
+    lim = TokenBucketLimiter(rate=1.0, burst=10)
+    tracemalloc.start()
+    for i in range(args.keys):
+        lim.hit(f"ip:{i}")
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory: {size / args.keys:.0f} bytes/key over {len(lim)} active keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_rewards.py — nightly rewards run at production scale
+#
+#   python -m benchmarks.bench_rewards [--users 1000000] [--days 7] [--active 0.3]
+#
+# Builds a throwaway WAL database with --users users whose check-ins cover
+# --days days (each user is active on a given day with probability --active,
+# habitual users more so), then times:
+#   backfill — the first run over the whole history
+#   nightly  — one more day of check-ins on top of the existing streak state
+#   rerun    — running again with nothing new (must credit nothing)
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  (registers the tables)
+from app.db import make_engine
+from app.rewards import RewardsEngine
+
+BATCH = 50_000
+
+
+def _users(conn, n: int) -> None:
+    rows = ((i, f"u{i}", "x", "2030-01-01 00:00:00.000000") for i in range(1, n + 1))
+    while chunk := [r for _, r in zip(range(BATCH), rows)]:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash, coins, is_active, created_at) VALUES (?, ?, ?, 0, 1, ?)",
+            chunk,
+        )
+
+
+def _checkins(conn, habits: list[float], day: int, rng: random.Random, next_session: list[int]) -> int:
+    stamp = f"2030-01-{day:02d} 18:00:00.000000"
+    rows = []
+    for uid, p in enumerate(habits, start=1):
+        if rng.random() < p:
+            next_session[0] += 1
+            rows.append((next_session[0], uid, stamp))
+    for i in range(0, len(rows), BATCH):
+        conn.exec_driver_sql(
+            "INSERT INTO checkins (session_id, user_id, lat, lon, distance_m, created_at) VALUES (?, ?, 0, 0, 0, ?)",
+            rows[i : i + BATCH],
+        )
+    return len(rows)
+
+
+def _timed(label: str, rw: RewardsEngine, **kw) -> None:
+    t0 = time.perf_counter()
+    out = rw.run(**kw)
+    dt = time.perf_counter() - t0
+    events, coins = out["checkins"]
+    rate = events / dt if dt else 0
+    print(f"{label:<9} {events:>10,} events  {coins:>12,} coins  {dt:7.1f}s  {rate:>9,.0f} events/s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--active", type=float, default=0.3, help="mean daily check-in probability")
+    ap.add_argument("--batch", type=int, default=20_000, help="events per ledger transaction")
+    ap.add_argument("--data-dir", type=Path, help="keep the database here instead of a temp dir")
+    args = ap.parse_args()
+
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix="bench-rewards-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    eng = make_engine(f"sqlite:///{data_dir / 'rewards.db'}")
+    SQLModel.metadata.create_all(eng)
+
+    rng = random.Random(1)
+    habits = [min(1.0, rng.expovariate(1 / args.active)) for _ in range(args.users)]
+    t0 = time.perf_counter()
+    session_seq = [0]
+    with eng.begin() as conn:
+        _users(conn, args.users)
+        n = sum(_checkins(conn, habits, d, rng, session_seq) for d in range(1, args.days + 1))
+    print(f"seeded {args.users:,} users, {n:,} check-ins in {time.perf_counter() - t0:.1f}s")
+
+    rw = RewardsEngine(eng, batch=args.batch)
+    _timed("backfill", rw, backfill=True)
+    with eng.begin() as conn:
+        _checkins(conn, habits, args.days + 1, rng, session_seq)
+    _timed("nightly", rw)
+    _timed("rerun", rw)
+
+
+if __name__ == "__main__":
+    main()
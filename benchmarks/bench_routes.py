@@ -0,0 +1,241 @@
+# benchmarks/bench_routes.py — main HTML routes vs data size, with regression budgets
+#
+#   python -m benchmarks.bench_routes                      # sizes 1,4,16 x BASE, check budgets
+#   python -m benchmarks.bench_routes --sizes 1,8 --requests 50
+#   python -m benchmarks.bench_routes --update-budgets     # re-record route_budgets.json
+#
+# Each size runs in its own subprocess (the engine binds DATABASE_URL at import
+# time): app.datagen seeds a file DB, then a logged-in TestClient drives every
+# route in ROUTES against the busiest room/post/user. Per route we record
+# latency percentiles and SQL queries per request (from app.sqlstats), both
+# warm (user cache hot) and cold (first request after clearing the cache).
+#
+# Fails (exit 1) when a route's p95 goes over its ceiling for that size (sizes
+# without a recorded ceiling use the largest one), when its query count goes
+# over budget at any size, or when p50 grows faster than data size (log-log
+# slope between the smallest and largest size above max_scaling_exponent).
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from app.datagen import Scale
+
+BUDGETS = Path(__file__).with_name("route_budgets.json")
+BASE = Scale(users=500, posts=1_000, comments=2_500, rooms=750, messages=10_000, txs=5_000, orders=500)
+PASSWORD = "Passw0rd!"
+
+# route templates as app.sqlstats reports them; filled from the seeded data
+ROUTES = [
+    "/",
+    "/login",
+    "/posts",
+    "/posts/{post_id:int}",
+    "/chat",
+    "/chat/{room_id}",
+    "/wallet",
+    "/dex",
+]
+
+
+_CONVERTOR = re.compile(r":\w+}")  # "{post_id:int}" -> "{post_id}"
+
+
+def _pct(sorted_ms: list[float], p: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(p / 100 * len(sorted_ms)))]
+
+
+# ---------- worker (one data size, own process) ----------
+def _worker(size: int, db_path: str, requests: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app import sqlstats
+    from app.usercache import user_cache
+    from app.datagen import Generator
+    from app.db import engine, init_db
+
+    if not os.path.exists(db_path + ".done"):
+        init_db()
+        scale = Scale(**{k: v * size for k, v in asdict(BASE).items()})
+        Generator(engine, scale, seed=size, log=lambda line: print(line, file=sys.stderr)).run()
+        Path(db_path + ".done").touch()
+
+    with engine.connect() as conn:
+        q = conn.exec_driver_sql
+        rows = {t: q(f"SELECT COUNT(*) FROM {t}").scalar_one()
+                for t in ("users", "posts", "comments", "chat_rooms", "messages", "txs", "orders")}
+        room_id, = q("SELECT room_id FROM messages GROUP BY room_id ORDER BY COUNT(*) DESC LIMIT 1").one()
+        uid, = q("SELECT user1_id FROM chat_rooms WHERE id = ?", (room_id,)).one()
+        post_id, = q("SELECT post_id FROM comments GROUP BY post_id ORDER BY COUNT(*) DESC LIMIT 1").one()
+
+    from app.main import app
+
+    results = {}
+    with TestClient(app) as client:
+        r = client.post("/login", data={"email": f"user{uid}@example.com", "password": PASSWORD},
+                        follow_redirects=False)
+        assert r.status_code == 303, f"login failed: {r.status_code}"
+
+        for template in ROUTES:
+            path = _CONVERTOR.sub("}", template).format(post_id=post_id, room_id=room_id)
+            # cold: empty user cache, shows the route's true query fan-out
+            user_cache.clear()
+            sqlstats.reset()
+            client.get(path)
+            cold = sqlstats.snapshot()["routes"].get(f"GET {template}", {}).get("queries", 0)
+            for _ in range(2):
+                client.get(path)
+            sqlstats.reset()
+            samples = []
+            for _ in range(requests):
+                t0 = time.perf_counter()
+                r = client.get(path, follow_redirects=False)
+                samples.append((time.perf_counter() - t0) * 1000)
+                assert r.status_code == 200, f"GET {path} -> {r.status_code}"
+            samples.sort()
+            agg = sqlstats.snapshot()["routes"].get(f"GET {template}", {})
+            results[template] = {
+                "p50_ms": round(_pct(samples, 50), 3),
+                "p95_ms": round(_pct(samples, 95), 3),
+                "p99_ms": round(_pct(samples, 99), 3),
+                "mean_ms": round(statistics.fmean(samples), 3),
+                "queries": round(agg.get("avg_queries", 0)),
+                "cold_queries": cold,
+                "bytes": len(r.content),
+            }
+    return {"size": size, "rows": rows, "routes": results}
+
+
+# ---------- driver ----------
+def _run_size(size: int, data_dir: Path, requests: int) -> dict:
+    db_path = str(data_dir / f"routes-x{size}.db")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "TESTING": "0",
+        "RATE_LIMIT": "0",
+        "SESSION_BACKEND": "cookie",
+        "USER_CACHE_TTL": "3600",  # warm means warm: x16 runs outlast the default 30 s TTL
+    }
+    cmd = [sys.executable, "-m", "benchmarks.bench_routes", "--worker", str(size),
+           "--db", db_path, "--requests", str(requests)]
+    out = subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def scaling_exponent(small: dict, large: dict, route: str) -> float:
+    """log-log slope of p50 latency vs data size (1.0 = linear)."""
+    t0, t1 = small["routes"][route]["p50_ms"], large["routes"][route]["p50_ms"]
+    return math.log(max(t1, 1e-6) / max(t0, 1e-6)) / math.log(large["size"] / small["size"])
+
+
+def check(runs: list[dict], budgets: dict) -> list[str]:
+    failures = []
+    max_exp = budgets.get("max_scaling_exponent", 1.2)
+    for route in ROUTES:
+        b = budgets["routes"].get(route)
+        if b is None:
+            failures.append(f"{route}: no budget recorded (run with --update-budgets)")
+            continue
+        for run in runs:
+            m = run["routes"][route]
+            ceiling = b["p95_ms"].get(str(run["size"]), max(b["p95_ms"].values()))
+            if m["p95_ms"] > ceiling:
+                failures.append(f"{route} x{run['size']}: p95 {m['p95_ms']:.1f} ms > budget {ceiling} ms")
+            if m["queries"] > b["max_queries"]:
+                failures.append(f"{route} x{run['size']}: {m['queries']} queries > budget {b['max_queries']}")
+            if m["cold_queries"] > b["max_cold_queries"]:
+                failures.append(f"{route} x{run['size']}: {m['cold_queries']} cold queries"
+                                f" > budget {b['max_cold_queries']}")
+        if len(runs) > 1:
+            exp = scaling_exponent(runs[0], runs[-1], route)
+            limit = b.get("max_scaling_exponent", max_exp)
+            if exp > limit:
+                failures.append(f"{route}: p50 scales as size^{exp:.2f} (> {limit}), superlinear")
+    return failures
+
+
+def record_budgets(runs: list[dict], budgets: dict, headroom: float) -> dict:
+    routes = {}
+    for route in ROUTES:
+        routes[route] = {
+            **budgets.get("routes", {}).get(route, {}),
+            "p95_ms": {str(r["size"]): round(max(r["routes"][route]["p95_ms"] * headroom, 5.0), 1) for r in runs},
+            "max_queries": max(r["routes"][route]["queries"] for r in runs),
+            "max_cold_queries": max(r["routes"][route]["cold_queries"] for r in runs),
+        }
+    return {
+        "sizes": [r["size"] for r in runs],
+        "max_scaling_exponent": budgets.get("max_scaling_exponent", 1.2),
+        "routes": routes,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1,4,16", help="multiples of BASE")
+    ap.add_argument("--requests", type=int, default=30, help="timed requests per route and size")
+    ap.add_argument("--data-dir", help="keep/reuse seeded DBs here (default: temp dir)")
+    ap.add_argument("--budgets", type=Path, default=BUDGETS)
+    ap.add_argument("--update-budgets", action="store_true")
+    ap.add_argument("--headroom", type=float, default=2.0, help="ceiling = p95 at that size x headroom")
+    ap.add_argument("--json", type=Path, help="also write raw results here")
+    ap.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--db", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(_worker(args.worker, args.db, args.requests)))
+        return
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir or tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        runs = []
+        for size in sizes:
+            print(f"== x{size} ==", file=sys.stderr)
+            runs.append(_run_size(size, data_dir, args.requests))
+
+    print(f"{'route':<22}" + "".join(f"{'x' + str(r['size']) + ' p50/p95 ms':>24}{'q/cold':>10}" for r in runs)
+          + f"{'slope':>7}")
+    for route in ROUTES:
+        line = f"{route:<22}"
+        for r in runs:
+            m = r["routes"][route]
+            line += f"{m['p50_ms']:>13.2f} / {m['p95_ms']:>7.2f}{m['queries']:>4}/{m['cold_queries']:<5}"
+        if len(runs) > 1:
+            line += f"{scaling_exponent(runs[0], runs[-1], route):>7.2f}"
+        print(line)
+    print("rows:", ", ".join(f"x{r['size']}: {r['rows']['messages']:,} msgs" for r in runs))
+
+    if args.json:
+        args.json.write_text(json.dumps(runs, indent=2))
+
+    budgets = json.loads(args.budgets.read_text()) if args.budgets.exists() else {"routes": {}}
+    if args.update_budgets:
+        args.budgets.write_text(json.dumps(record_budgets(runs, budgets, args.headroom), indent=2) + "\n")
+        print(f"budgets written to {args.budgets}")
+        return
+
+    failures = check(runs, budgets)
+    for f in failures:
+        print("FAIL", f)
+    if failures:
+        sys.exit(1)
+    print("all routes within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_sessions.py — per-request session middleware overhead
+#
+#   python -m benchmarks.bench_sessions [--requests 20000]
+#
+# Drives each middleware directly over ASGI (no HTTP stack) with an existing
+# logged-in cookie, so the numbers are the middleware's own cost per request.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlmodel import SQLModel, create_engine
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.models import ServerSession
+from app.sessions import MemorySessionStore, SQLiteSessionStore, ServerSessionMiddleware
+
+COOKIE = "sweatmarket_session"
+
+
+async def _endpoint(scope, receive, send):
+    _ = scope["session"].get("uid")
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _scope(cookie: str | None) -> dict:
+    headers = [(b"cookie", f"{COOKIE}={cookie}".encode())] if cookie else []
+    return {"type": "http", "method": "GET", "path": "/", "headers": headers}
+
+
+async def _call(app, cookie: str | None) -> list[bytes]:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent.extend(v for k, v in message["headers"] if k == b"set-cookie")
+
+    await app(_scope(cookie), receive, send)
+    return sent
+
+
+async def _login_cookie(app, payload: dict) -> str:
+    async def login(scope, receive, send):
+        scope["session"].update(payload)
+        scope["session"]["uid"] = payload["uid"]
+        await _endpoint(scope, receive, send)
+
+    app.app = login
+    set_cookie = (await _call(app, None))[0].decode()
+    app.app = _endpoint
+    return set_cookie.split(";", 1)[0].split("=", 1)[1]
+
+
+async def _bench(app, payload: dict, n: int) -> tuple[float, int]:
+    cookie = await _login_cookie(app, payload)
+    for _ in range(200):
+        await _call(app, cookie)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await _call(app, cookie)
+    return (time.perf_counter() - t0) / n * 1e6, len(cookie)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=20000)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp()) / "sessions.db"
+    eng = create_engine(f"sqlite:///{tmp}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(eng, tables=[ServerSession.__table__])
+
+    small = {"uid": 42}
+    large = {"uid": 42, **{f"pref_{i}": "x" * 24 for i in range(20)}}
+
+    backends = {
+        "signed-cookie": lambda: SessionMiddleware(_endpoint, secret_key="bench", session_cookie=COOKIE),
+        "memory": lambda: ServerSessionMiddleware(_endpoint, MemorySessionStore(), session_cookie=COOKIE),
+        "sqlite": lambda: ServerSessionMiddleware(_endpoint, SQLiteSessionStore(eng), session_cookie=COOKIE),
+    }
+
+    print(f"{'backend':<14} {'payload':<8} {'us/req':>8} {'cookie bytes':>13}")
+    for name, make in backends.items():
+        for label, payload in (("small", small), ("large", large)):
+            us, size = asyncio.run(_bench(make(), payload, args.requests))
+            print(f"{name:<14} {label:<8} {us:>8.1f} {size:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_sqlite_profile.py — mixed read/write concurrency, legacy vs production
+#
+#   python -m benchmarks.bench_sqlite_profile [--seconds 5] [--writers 4] [--readers 8]
+#
+# Writers insert chat messages one commit at a time (like ws_chat); readers page
+# through a room's recent history (like chat_room). Reports throughput, p99
+# latency and "database is locked" failures for each engine profile.
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, select
+
+from app.db import LEGACY_PROFILE, SQLiteProfile, make_engine
+from app.models import ChatRoom, Message, User
+
+ROOMS = 50
+
+
+def _seed(eng) -> None:
+    SQLModel.metadata.create_all(eng)
+    with Session(eng) as s:
+        s.add_all(User(username=f"u{i}", password_hash="x") for i in range(ROOMS + 1))
+        s.commit()
+        s.add_all(ChatRoom(user1_id=1, user2_id=i + 2) for i in range(ROOMS - 1))
+        s.commit()
+        s.add_all(Message(room_id=random.randint(1, ROOMS - 1), sender_id=1, content="seed") for _ in range(20000))
+        s.commit()
+
+
+def _run(eng, seconds: float, writers: int, readers: int) -> dict:
+    stop = time.perf_counter() + seconds
+    lat = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def worker(kind: str):
+        mine, failed = [], 0
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            room = rng.randint(1, ROOMS - 1)
+            t0 = time.perf_counter()
+            try:
+                with Session(eng) as s:
+                    if kind == "write":
+                        s.add(Message(room_id=room, sender_id=1, content="hello"))
+                        s.commit()
+                    else:
+                        s.exec(
+                            select(Message).where(Message.room_id == room).order_by(Message.id.desc()).limit(50)
+                        ).all()
+            except OperationalError:
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            lat[kind].extend(mine)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=("write",)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=("read",)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    def p99(xs):
+        return sorted(xs)[int(len(xs) * 0.99)] * 1000 if xs else float("nan")
+
+    return {
+        "reads/s": len(lat["read"]) / seconds,
+        "writes/s": len(lat["write"]) / seconds,
+        "read p99 ms": p99(lat["read"]),
+        "write p99 ms": p99(lat["write"]),
+        "locked errors": errors["read"] + errors["write"],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=8)
+    args = ap.parse_args()
+
+    profiles = {"legacy": LEGACY_PROFILE, "production": SQLiteProfile()}
+    results = {}
+    for name, profile in profiles.items():
+        path = Path(tempfile.mkdtemp()) / f"{name}.db"
+        eng = make_engine(f"sqlite:///{path}", profile)
+        _seed(eng)
+        results[name] = _run(eng, args.seconds, args.writers, args.readers)
+        eng.dispose()
+
+    keys = list(results["legacy"])
+    print(f"{'metric':<14}" + "".join(f"{n:>12}" for n in results))
+    for k in keys:
+        print(f"{k:<14}" + "".join(f"{results[n][k]:>12.1f}" for n in results))
+
+
+if __name__ == "__main__":
+    main()
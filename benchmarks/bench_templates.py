@@ -0,0 +1,80 @@
+# benchmarks/bench_templates.py — cold first-request latency after a (re)start
+#
+#   python -m benchmarks.bench_templates [--runs 5]
+#
+# Every run is a fresh interpreter that imports app.main, starts the app and
+# times the first request to each page in PAGES. Modes:
+#   lazy          templates compiled on first hit, no bytecode cache (old behaviour)
+#   eager         precompile() at startup, empty bytecode cache (first deploy)
+#   eager+bccache precompile() at startup from a warm bytecode cache (restart)
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = ["/login", "/signup", "/", "/posts", "/dex?demo=1", "/wallet?demo=1"]
+
+
+def _child(lazy: bool) -> dict:
+    from fastapi.testclient import TestClient
+
+    import app.main
+
+    if lazy:
+        app.main.precompile = lambda: 0
+    t0 = time.perf_counter()
+    with TestClient(app.main.app) as client:
+        startup = time.perf_counter() - t0
+        first = {}
+        for path in PAGES:
+            t0 = time.perf_counter()
+            assert client.get(path).status_code == 200, path
+            first[path] = (time.perf_counter() - t0) * 1000
+    return {"startup_ms": startup * 1000, "first_ms": first}
+
+
+def _run(mode: str, cache_dir: str) -> dict:
+    env = {
+        **os.environ,
+        "TESTING": "1",
+        "TEMPLATE_CACHE_DIR": cache_dir,
+        "TEMPLATE_BYTECODE_CACHE": "0" if mode == "lazy" else "1",
+    }
+    cmd = [sys.executable, "-m", "benchmarks.bench_templates", "--child", "lazy" if mode == "lazy" else "eager"]
+    out = subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--child", choices=["lazy", "eager"], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child == "lazy")))
+        return
+
+    print(f"{'mode':<15}{'startup ms':>12}{'first-request ms (sum)':>24}{'worst page ms':>15}")
+    for mode in ("lazy", "eager", "eager+bccache"):
+        results = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                if mode == "eager+bccache":
+                    _run("eager", cache_dir)  # populate the bytecode cache
+                results.append(_run(mode, cache_dir))
+        startup = statistics.median(r["startup_ms"] for r in results)
+        first = statistics.median(sum(r["first_ms"].values()) for r in results)
+        worst = statistics.median(max(r["first_ms"].values()) for r in results)
+        print(f"{mode:<15}{startup:>12.1f}{first:>24.1f}{worst:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
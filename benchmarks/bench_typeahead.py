@@ -0,0 +1,104 @@
+# benchmarks/bench_typeahead.py — nickname/username prefix search at 1M users
+#
+#   python -m benchmarks.bench_typeahead [--users 1000000] [--queries 2000]
+#
+# Builds the prefix index from synthetic names (app.datagen's syllable
+# nicknames, so prefixes are heavily shared), then times upserts and
+# top-8 prefix queries of 1-4 characters. --sql also times the
+# `nickname LIKE 'x%' OR username LIKE 'x%'` query it replaces.
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  (registers the tables)
+from app.datagen import SYLLABLES
+from app.db import make_engine
+from app.migrations import run_migrations
+from app.typeahead import PrefixIndex
+
+
+def _rows(n: int, rng: random.Random):
+    for uid in range(1, n + 1):
+        nick = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) + str(uid % 1000)
+        yield uid, f"user{uid}", nick if rng.random() < 0.8 else None
+
+
+def _pct(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def _report(label: str, lat: list[float]) -> None:
+    print(f"{label:<7} p50 {statistics.median(lat) * 1e6:9.1f} µs  p99 {_pct(lat, 99) * 1e6:9.1f} µs")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--sql", action="store_true", help="also time the LIKE query in SQLite")
+    args = ap.parse_args()
+
+    rows = list(_rows(args.users, random.Random(1)))
+    idx = PrefixIndex()
+    t0 = time.perf_counter()
+    idx.load(rows)
+    build = time.perf_counter() - t0
+    tracemalloc.start()  # a second, traced build (tracing slows it down)
+    traced = PrefixIndex()
+    traced.load(rows)
+    mem = tracemalloc.get_traced_memory()[0]
+    del traced
+    tracemalloc.stop()
+    print(f"build   {args.users:,} users in {build:.1f}s, {mem / 1e6:.0f} MB")
+
+    rng = random.Random(2)
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        uid = rng.randint(1, args.users)
+        idx.upsert(uid, f"user{uid}", "".join(rng.choices(SYLLABLES, k=3)))
+    print(f"upsert  {(time.perf_counter() - t0) / 1000 * 1e6:9.1f} µs")
+
+    prefixes = []
+    for _ in range(args.queries):
+        name = rng.choice(rows)[2] or rng.choice(rows)[1]
+        prefixes.append(name[: rng.randint(1, 4)])
+    lat = []
+    for p in prefixes:
+        t0 = time.perf_counter()
+        idx.search(p)
+        lat.append(time.perf_counter() - t0)
+    _report("search", lat)
+
+    if args.sql:
+        path = Path(tempfile.mkdtemp(prefix="bench-typeahead-")) / "users.db"
+        eng = make_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(eng)
+        run_migrations(eng)
+        with eng.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO users (id, username, nickname, password_hash, coins, is_active, created_at) "
+                "VALUES (?, ?, ?, 'x', 0, 1, '2030-01-01')", rows,
+            )
+        lat = []
+        with eng.connect() as conn:
+            for p in prefixes[:100]:
+                t0 = time.perf_counter()
+                conn.execute(text("SELECT id FROM users WHERE nickname LIKE :p OR username LIKE :p "
+                                  "ORDER BY nickname LIMIT 8"), {"p": p + "%"}).all()
+                lat.append(time.perf_counter() - t0)
+        _report("sql", lat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_wsframes.py — WebSocket frame size vs CPU per wire format
+#
+#   python -m benchmarks.bench_wsframes [--messages 5000] [--fanout 1000]
+#
+# Replays a synthetic chat stream through app.hub.Frame in each format, then
+# through a per-socket permessage-deflate stream (raw deflate with context
+# takeover and a sync flush per message, as uvicorn's websockets backend
+# does). Encoding happens once per message; deflate happens once per
+# message per socket, so its CPU is reported at --fanout sockets.
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from app.datagen import SYLLABLES
+from app.hub import FORMATS, Frame
+
+
+def _stream(n: int, rng: random.Random) -> list[dict]:
+    t = datetime(2030, 1, 1, 7)
+    out = []
+    for i in range(n):
+        t += timedelta(seconds=rng.randint(1, 90))
+        words = [("".join(rng.choices(SYLLABLES, k=rng.randint(1, 3)))) for _ in range(rng.randint(2, 12))]
+        out.append({"type": "message", "kind": "text", "room": rng.randint(1, 50), "id": 1_000_000 + i,
+                    "sender_id": rng.randint(1, 100_000), "content": " ".join(words),
+                    "created_at": t.isoformat()})
+    return out
+
+
+def _deflater():
+    return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15, 5)  # websockets' defaults
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--fanout", type=int, default=1000, help="sockets each message goes to")
+    args = ap.parse_args()
+    msgs = _stream(args.messages, random.Random(1))
+
+    print(f"{'format':<8} {'bytes/msg':>9} {'deflated':>9} {'encode µs':>10} {'deflate µs':>11}   "
+          f"CPU per message at {args.fanout:,} sockets")
+    for fmt in FORMATS:
+        t0 = time.perf_counter()
+        frames = [Frame(m).encoded(fmt) for m in msgs]
+        enc = (time.perf_counter() - t0) / len(msgs)
+
+        raw = [f.encode() if isinstance(f, str) else f for f in frames]
+        z = _deflater()
+        t0 = time.perf_counter()
+        deflated = sum(len(z.compress(f) + z.flush(zlib.Z_SYNC_FLUSH)) - 4 for f in raw)
+        dfl = (time.perf_counter() - t0) / len(msgs)
+
+        size = sum(map(len, raw)) / len(msgs)
+        print(f"{fmt:<8} {size:9.1f} {deflated / len(msgs):9.1f} {enc * 1e6:10.2f} {dfl * 1e6:11.2f}   "
+              f"{enc * 1e3:.3f} ms plain, {(enc + dfl * args.fanout) * 1e3:.2f} ms deflated")
+
+
+if __name__ == "__main__":
+    main()
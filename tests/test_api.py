@@ -0,0 +1,73 @@
+# tests/test_api.py
+import re
+
+from sqlalchemy import text
+
+from app.api import dumps, projection
+from app.db import engine
+from tests.test_auth import login, signup
+
+
+def _uid(username):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT id FROM users WHERE username = :u"), {"u": username}).scalar()
+
+
+def test_feed_pages_and_projection(client):
+    signup(client, username="apiposter", email="apiposter@test.com")
+    uid = _uid("apiposter")
+    with engine.begin() as conn:
+        for i in range(25):
+            conn.execute(text("INSERT INTO posts (author_id, caption, created_at) VALUES (:u, :c, '2030-01-01')"),
+                         {"u": uid, "c": f"api post {i}"})
+
+    first = client.get("/api/v1/posts", params={"limit": 10, "fields": "caption"})
+    assert first.headers["content-type"] == "application/json"
+    body = first.json()
+    assert set(body["items"][0]) == {"id", "caption"} and len(body["items"]) == 10
+    ids = [p["id"] for p in body["items"]]
+    assert ids == sorted(ids, reverse=True)
+
+    second = client.get("/api/v1/posts", params={"limit": 10, "fields": "caption", "before": body["next"]}).json()
+    assert second["items"][0]["id"] < ids[-1]
+    assert client.get("/api/v1/posts", headers={"If-None-Match": first.headers["etag"]},
+                      params={"limit": 10, "fields": "caption"}).status_code == 304
+
+    r = client.get("/api/v1/posts", params={"fields": "caption,password_hash"})
+    assert r.status_code == 400 and "password_hash" in r.json()["error"]
+    post = client.get(f"/api/v1/posts/{ids[0]}").json()
+    assert post["author_id"] == uid and post["caption"] == "api post 24"
+    assert client.get("/api/v1/posts/999999").status_code == 404
+
+
+def test_private_resources(client):
+    assert client.get("/api/v1/wallet").status_code == 401
+    signup(client, username="apiuser1", email="apiuser1@test.com")
+    signup(client, username="apiuser2", email="apiuser2@test.com")
+    login(client, username="apiuser1", email="apiuser1@test.com")
+    other = _uid("apiuser2")
+    room = re.search(r"/chat/(\d+)", client.post("/chat/start", data={"user_id": other},
+                                                  follow_redirects=False).headers["location"]).group(1)
+    with engine.begin() as conn:
+        for i in range(3):
+            conn.execute(text("INSERT INTO messages (room_id, sender_id, content, created_at) "
+                              "VALUES (:r, :u, :c, '2030-01-01')"), {"r": room, "u": other, "c": f"hi {i}"})
+
+    chats = client.get("/api/v1/chats").json()["items"]
+    assert [c["id"] for c in chats] == [int(room)]
+    msgs = client.get(f"/api/v1/chats/{room}/messages", params={"limit": 2, "fields": "content"}).json()
+    assert msgs["items"] == [{"id": msgs["items"][0]["id"], "content": "hi 2"},
+                             {"id": msgs["items"][1]["id"], "content": "hi 1"}]
+    assert msgs["next"] == msgs["items"][1]["id"]
+
+    wallet = client.get("/api/v1/wallet").json()
+    assert wallet["coins"] == 0 and wallet["items"] == [] and wallet["next"] is None
+    book = client.get("/api/v1/orderbook", params={"fields": "price"}).json()
+    assert set(book) == {"buys", "sells"}
+
+
+def test_encoder_and_projection_helpers():
+    from datetime import datetime
+
+    assert dumps({"t": datetime(2030, 1, 2, 3, 4, 5)}) == b'{"t":"2030-01-02T03:04:05"}'
+    assert list(projection("tx", "note, amount")) == ["id", "amount", "note"]
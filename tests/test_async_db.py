@@ -0,0 +1,80 @@
+# tests/test_async_db.py
+import asyncio
+import time
+import uuid
+
+import httpx
+from sqlmodel import Session as SQLSession, select
+
+from app.db import engine, init_db
+from app.main import app
+from app.models import Post, User
+
+
+async def _loop_lag_during(load, interval=0.005):
+    """Run `load` while a ticker measures how late the event loop wakes it up."""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - t0 - interval)
+
+    tick = asyncio.create_task(ticker())
+    try:
+        await load()
+    finally:
+        done.set()
+        await tick
+    return max(lags)
+
+
+def test_async_session_shares_db_with_sync_engine():
+    from app.db import async_engine
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    init_db()
+    name = f"async_{uuid.uuid4().hex[:8]}"
+
+    async def write():
+        async with AsyncSession(async_engine) as s:
+            s.add(User(username=name, password_hash="x"))
+            await s.commit()
+
+    asyncio.run(write())
+    with SQLSession(engine) as s:
+        assert s.exec(select(User).where(User.username == name)).first() is not None
+
+
+def test_event_loop_stays_responsive_under_post_writes():
+    init_db()
+    token = uuid.uuid4().hex[:8]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            await c.post("/signup", data={"username": f"user_{token}", "email": f"{token}@t.com",
+                                          "password": "Passw0rd!"})
+
+            # bounded concurrency so the lag we see is the server's, not the
+            # client scheduling 200 requests in a single loop iteration
+            sem = asyncio.Semaphore(16)
+
+            async def post(i):
+                async with sem:
+                    return await c.post("/posts/new", data={"caption": f"{token}-{i}"})
+
+            async def load():
+                rs = await asyncio.gather(*(post(i) for i in range(200)))
+                assert all(r.status_code == 303 for r in rs)
+
+            return await _loop_lag_during(load)
+
+    max_lag = asyncio.run(scenario())
+    assert max_lag < 0.1, f"event loop stalled for {max_lag * 1000:.0f} ms"
+
+    with SQLSession(engine) as s:
+        n = len(s.exec(select(Post).where(Post.caption.startswith(token))).all())
+    assert n == 200
@@ -0,0 +1,87 @@
+# tests/test_chatarchive.py
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel
+
+from app.chatarchive import ChatArchive
+from app.db import make_engine
+from tests.test_auth import login, signup
+
+NOW = datetime(2030, 6, 1)
+
+
+def _setup(tmp_path, per_room=300):
+    hot = make_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    SQLModel.metadata.create_all(hot)
+    with hot.begin() as conn:
+        for i in range(per_room * 2):  # two rooms, interleaved, one message per hour
+            t = NOW - timedelta(hours=per_room * 2 - i)
+            conn.execute(text("INSERT INTO messages (room_id, sender_id, content, created_at) VALUES (:r, 1, :c, :t)"),
+                         {"r": 1 + i % 2, "c": f"m{i}", "t": t.strftime("%Y-%m-%d %H:%M:%S.%f")})
+    return hot, ChatArchive(f"sqlite:///{tmp_path / 'archive.db'}")
+
+
+def _walk(store, hot, room_id, limit):
+    seen, before = [], None
+    with Session(hot) as s:
+        while True:
+            page, before = store.history(s, room_id, before, limit)
+            seen = page + seen
+            if before is None:
+                return seen
+
+
+def test_history_pages_across_the_hot_cold_boundary(tmp_path):
+    hot, store = _setup(tmp_path)
+    everything = [m.content for m in _walk(store, hot, 1, 50)]
+    assert len(everything) == 300
+
+    moved, segments = store.run(hot, older_than=timedelta(hours=200), now=NOW, batch=97)
+    assert moved == 400 and segments >= 2
+    with hot.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM messages")).scalar() == 200
+    assert store.stats()["messages"] == 400
+
+    for limit in (7, 50, 1000):
+        assert [m.content for m in _walk(store, hot, 1, limit)] == everything
+    # archived messages come back as full rows
+    with Session(hot) as s:
+        oldest = store.history(s, 2, before=10, limit=5)[0]
+    assert [m.id for m in oldest] == [2, 4, 6, 8] and oldest[0].created_at == NOW - timedelta(hours=599)
+
+
+def test_interrupted_run_is_not_archived_twice(tmp_path):
+    hot, store = _setup(tmp_path, per_room=10)
+    with hot.connect() as conn:
+        rows = conn.execute(text("SELECT id, room_id, sender_id, content, image_url, created_at FROM messages "
+                                 "WHERE id <= 6 ORDER BY room_id, id")).all()
+    store._append(rows)  # crashed after writing the archive, before deleting hot rows
+
+    assert store.run(hot, older_than=timedelta(0), now=NOW)[0] == 20
+    assert store.stats()["messages"] == 20
+    assert [m.content for m in _walk(store, hot, 2, 3)] == [f"m{i}" for i in range(1, 20, 2)]
+
+
+def test_chat_room_paginates(client):
+    from app.db import engine
+
+    signup(client, username="chatpage1", email="chatpage1@test.com")
+    signup(client, username="chatpage2", email="chatpage2@test.com")
+    login(client, username="chatpage1", email="chatpage1@test.com")
+    with engine.connect() as conn:
+        other = conn.execute(text("SELECT id FROM users WHERE username = 'chatpage2'")).scalar()
+    r = client.post("/chat/start", data={"user_id": other}, follow_redirects=False)
+    room = int(r.headers["location"].rsplit("/", 1)[1])
+    with engine.begin() as conn:
+        for i in range(60):
+            conn.execute(text("INSERT INTO messages (room_id, sender_id, content, created_at) "
+                              "VALUES (:r, :u, :c, '2030-01-01 00:00:00.000000')"),
+                         {"r": room, "u": other, "c": f"hello #{i}"})
+
+    page = client.get(f"/chat/{room}").text
+    assert "hello #59" in page and "hello #9<" not in page
+    older = re.search(r"\?before=(\d+)", page).group(1)
+    page = client.get(f"/chat/{room}", params={"before": older}).text
+    assert "hello #9<" in page and "hello #59" not in page and "Older messages" not in page
@@ -0,0 +1,102 @@
+# tests/test_checkins.py
+import random
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+from app import qr
+from app.checkins import ActiveSession, CheckinIndex
+from app.db import make_engine
+from app.geo import GridIndex, haversine_m
+from tests.test_auth import login, signup
+
+
+def test_grid_matches_brute_force():
+    rng = random.Random(7)
+    grid = GridIndex()
+    points = {}
+    for key in range(3000):
+        # a dense city plus points near the antimeridian and far north
+        lat, lon = rng.choice([(49.25, -123.1), (0.0, 179.999), (78.2, 15.6)])
+        points[key] = (lat + rng.uniform(-0.05, 0.05), lon + rng.uniform(-0.05, 0.05))
+        grid.add(key, *points[key])
+    for _ in range(200):
+        key = rng.randrange(3000)
+        lat, lon = points[key]
+        radius = rng.choice([50, 300, 1500])
+        got = {k for k, _ in grid.within(lat, lon, radius)}
+        want = {k for k, (a, b) in points.items() if haversine_m(lat, lon, a, b) <= radius}
+        assert got == want
+    grid.remove(0)
+    assert 0 not in grid and len(grid) == 2999
+
+
+def test_index_check_window_and_radius():
+    idx = CheckinIndex()
+    start = datetime(2030, 1, 1, 18, 0, tzinfo=timezone.utc)
+    idx.add(ActiveSession.from_row(1, 49.2827, -123.1207, 100, start, start + timedelta(hours=1)), now=0)
+    t = start.timestamp()
+
+    assert idx.check(1, 49.2827, -123.1207, now=t - 3600)[1] == "not_open"
+    assert idx.check(1, 49.2830, -123.1207, now=t - 600)[1] is None  # ~33 m, early grace
+    assert idx.check(1, 49.2840, -123.1207, now=t)[1] == "too_far"  # ~145 m
+    assert idx.check(1, 49.2840, -123.1207, now=t, slack_m=50)[1] is None
+    assert [s.id for s, _ in idx.nearby(49.2830, -123.1207, now=t)] == [1]
+
+    assert idx.check(1, 49.2827, -123.1207, now=t + 3600)[1] == "closed"
+    assert idx.nearby(49.2827, -123.1207, now=t + 3600) == [] and len(idx) == 0
+
+
+def test_catch_up_finds_sessions_below_local_ids(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'ci.db'}")
+    SQLModel.metadata.create_all(eng)
+    with eng.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password_hash, coins, is_active, created_at) "
+                          "VALUES (1, 'h', 'x', 0, 1, '2030-01-01')"))
+    a, b = CheckinIndex(), CheckinIndex()  # two workers
+    a.load_from_db(eng)
+    b.load_from_db(eng)
+    start = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+    def create(idx):
+        with eng.begin() as conn:
+            sid = conn.execute(text(
+                "INSERT INTO workout_sessions (host_id, title, lat, lon, radius_m, starts_at, ends_at, created_at) "
+                "VALUES (1, 't', 49.3, -123.1, 100, :s, :e, :s) RETURNING id"
+            ), {"s": start.replace(tzinfo=None), "e": (start + timedelta(hours=1)).replace(tzinfo=None)}).scalar_one()
+        idx.add(ActiveSession.from_row(sid, 49.3, -123.1, 100, start, start + timedelta(hours=1)))
+        return sid
+
+    theirs = create(b)
+    mine = [create(a), create(a)]
+    later = create(b)
+    assert a.get(theirs) is None and theirs < min(mine)
+    assert a.last_id < theirs  # local adds don't hide it from catch_up
+    assert a.catch_up(eng) == 4
+    assert {theirs, later, *mine} <= set(a._sessions) and len(a) == 4
+    assert a.last_id == later and a.catch_up(eng) == 0
+
+
+def test_checkin_flow(client):
+    signup(client, username="host01", email="host01@test.com")
+    login(client, username="host01", email="host01@test.com")
+    soon = datetime.now(timezone.utc) + timedelta(minutes=5)
+    r = client.post("/sessions/new", data={
+        "title": "Seawall run", "lat": "49.3000", "lon": "-123.1400", "radius_m": "100",
+        "starts_at": soon.strftime("%Y-%m-%dT%H:%M"), "duration_min": "60",
+    }, follow_redirects=False)
+    assert r.status_code == 303
+    sid = int(re.search(r"/session/(\d+)", r.headers["location"]).group(1))
+    nonce, _ = qr.signer.issue(sid)
+
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "49.3100", "lon": "-123.1400", "nonce": nonce})
+    assert "too far" in r.text and "0 checked in" in r.text
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "49.3003", "lon": "-123.1401", "nonce": nonce})
+    assert "Checked in!" in r.text and "1 checked in" in r.text
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "49.3003", "lon": "-123.1401", "nonce": nonce})
+    assert "already checked in" in r.text
+
+    nearby = client.get("/sessions/nearby", params={"lat": 49.3002, "lon": -123.1402}).json()
+    assert [s["id"] for s in nearby["sessions"]] == [sid]
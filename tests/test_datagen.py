@@ -0,0 +1,73 @@
+# tests/test_datagen.py
+from collections import Counter
+
+from sqlmodel import Session, SQLModel, select
+
+from app.datagen import Generator, Scale
+from app.db import make_engine
+from app.migrations import run_migrations
+from app.models import ChatRoom, Message, Post, Tx, User
+
+SCALE = Scale(users=200, posts=300, comments=600, rooms=150, messages=3000, txs=1000, orders=100)
+
+
+def _engine(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'gen.db'}")
+    SQLModel.metadata.create_all(eng)
+    run_migrations(eng)
+    return eng
+
+
+def _count(eng, table):
+    with eng.connect() as conn:
+        return conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar_one()
+
+
+def test_generates_consistent_skewed_dataset(tmp_path):
+    eng = _engine(tmp_path)
+    timings = Generator(eng, SCALE, seed=1, batch=128, log=lambda _: None).run()
+
+    assert {t: n for t, (n, _) in timings.items()} == {
+        "users": 200, "posts": 300, "comments": 600, "chat_rooms": 150,
+        "messages": 3000, "txs": 1000, "orders": 100,
+    }
+    with eng.connect() as conn:
+        orphans = conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM messages m JOIN chat_rooms r ON r.id = m.room_id "
+            "WHERE m.sender_id NOT IN (r.user1_id, r.user2_id)"
+        ).scalar_one()
+        assert orphans == 0
+        assert conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM (SELECT user1_id, user2_id FROM chat_rooms GROUP BY 1, 2 HAVING COUNT(*) > 1)"
+        ).scalar_one() == 0
+
+    with Session(eng) as s:
+        # ORM can read the rows back (datetime format, FK ids)
+        u = s.exec(select(User).limit(1)).one()
+        assert u.created_at.year > 2000 and u.password_hash.startswith("$argon2")
+        by_user = Counter()
+        for uid, amount in s.exec(select(Tx.user_id, Tx.amount)):
+            by_user[uid] += amount
+        for uid, total in list(by_user.items())[:20]:
+            assert s.get(User, uid).coins == total
+
+        # skew: the busiest 10% of rooms carry well over 10% of the messages
+        per_room = Counter(s.exec(select(Message.room_id)).all())
+        top = sum(n for _, n in per_room.most_common(SCALE.rooms // 10))
+        assert top > 0.4 * SCALE.messages
+        assert s.exec(select(Post).order_by(Post.id.desc())).first().created_at >= \
+            s.exec(select(Post).order_by(Post.id)).first().created_at
+        assert s.exec(select(ChatRoom).where(ChatRoom.user1_id >= ChatRoom.user2_id)).first() is None
+
+
+def test_appends_after_existing_rows_and_is_deterministic(tmp_path):
+    eng = _engine(tmp_path)
+    small = Scale(users=20, posts=10, comments=10, rooms=10, messages=50, txs=20, orders=5)
+    Generator(eng, small, seed=7, log=lambda _: None).run()
+    Generator(eng, small, seed=7, log=lambda _: None).run()
+    assert _count(eng, "users") == 40
+    assert _count(eng, "messages") == 100
+    with eng.connect() as conn:
+        names = [r[0] for r in conn.exec_driver_sql("SELECT nickname FROM users ORDER BY id")]
+    # same seed → same choices, shifted ids
+    assert [n.rstrip("0123456789") for n in names[:20]] == [n.rstrip("0123456789") for n in names[20:]]
@@ -0,0 +1,35 @@
+# tests/test_db.py
+from sqlalchemy import text
+
+from app.db import LEGACY_PROFILE, SQLiteProfile, make_engine
+
+
+def _pragma(eng, name):
+    with eng.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_production_profile_applied_on_connect(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'p.db'}", SQLiteProfile())
+    assert _pragma(eng, "journal_mode") == "wal"
+    assert _pragma(eng, "synchronous") == 1  # NORMAL
+    assert _pragma(eng, "busy_timeout") == 5000
+    assert _pragma(eng, "mmap_size") == 256 * 1024 * 1024
+    assert _pragma(eng, "cache_size") == -64000
+    assert eng.pool.size() == 8
+
+
+def test_legacy_profile_keeps_sqlite_defaults(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'l.db'}", LEGACY_PROFILE)
+    assert _pragma(eng, "journal_mode") == "delete"
+    assert _pragma(eng, "synchronous") == 2  # FULL
+
+
+def test_profile_from_env(monkeypatch):
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    p = SQLiteProfile.from_env()
+    assert (p.synchronous, p.pool_size, p.journal_mode) == ("FULL", 3, "WAL")
+
+    monkeypatch.setenv("SQLITE_PROFILE", "legacy")
+    assert SQLiteProfile.from_env() is LEGACY_PROFILE
@@ -0,0 +1,135 @@
+# tests/test_httpcache.py
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import app.main
+from app.db import engine
+from app.httpcache import CachedStaticFiles, CompressionMiddleware, _etag_matches, precompress
+from tests.test_auth import login, signup
+
+
+def _revalidate(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag})
+
+
+def test_posts_pages_return_304_until_data_changes(client):
+    signup(client, username="etaguser", email="etag@test.com", password="Passw0rd!")
+    login(client, username="etaguser", email="etag@test.com", password="Passw0rd!")
+    client.post("/posts/new", data={"caption": "first"}, follow_redirects=False)
+
+    r = client.get("/posts")
+    etag = r.headers["etag"]
+    assert r.status_code == 200 and r.headers["cache-control"] == "private, no-cache"
+    r = _revalidate(client, "/posts", etag)
+    assert r.status_code == 304 and r.content == b""
+
+    client.post("/posts/new", data={"caption": "second"}, follow_redirects=False)
+    r = _revalidate(client, "/posts", etag)
+    assert r.status_code == 200 and "second" in r.text
+
+    post_id = int(client.post("/posts", data={"caption": "detail"}, follow_redirects=False)
+                  .headers["location"].rsplit("/", 1)[1])
+    etag = client.get(f"/posts/{post_id}").headers["etag"]
+    assert _revalidate(client, f"/posts/{post_id}", etag).status_code == 304
+    client.post(f"/posts/{post_id}/comment", data={"content": "nice"}, follow_redirects=False)
+    assert _revalidate(client, f"/posts/{post_id}", etag).status_code == 200
+
+    # a nickname change committed by another worker (no local cache invalidation)
+    etag = client.get(f"/posts/{post_id}").headers["etag"]
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE users SET nickname = 'renamed' WHERE username = 'etaguser'"))
+    assert _revalidate(client, f"/posts/{post_id}", etag).status_code == 200
+
+    # the nav bar differs per viewer, so logging out changes the ETag
+    etag = client.get("/posts").headers["etag"]
+    client.post("/logout", follow_redirects=False)
+    assert _revalidate(client, "/posts", etag).status_code == 200
+
+
+def test_demo_dex_etag_follows_order_book(client):
+    etag = client.get("/dex?demo=1").headers["etag"]
+    assert _revalidate(client, "/dex?demo=1", etag).status_code == 304
+    client.post("/dex/new?demo=1", data={"side": "buy", "price": 99, "amount": 1}, follow_redirects=False)
+    assert _revalidate(client, "/dex?demo=1", etag).status_code == 200
+
+
+def test_etag_matching():
+    assert _etag_matches('"abc"', 'W/"abc"')
+    assert _etag_matches('W/"x", W/"abc"', 'W/"abc"')
+    assert _etag_matches("*", 'W/"abc"')
+    assert not _etag_matches('W/"abcd"', 'W/"abc"')
+
+
+def _static_app(directory):
+    a = FastAPI()
+    a.add_middleware(CompressionMiddleware, minimum_size=10)
+    a.mount("/static", CachedStaticFiles(directory=directory), name="static")
+
+    @a.get("/page")
+    def page():
+        return {"text": "hello " * 100}
+
+    return TestClient(a)
+
+
+def test_static_cache_policy_and_precompressed_variants(tmp_path):
+    (tmp_path / "avatars").mkdir()
+    (tmp_path / "avatars" / "1-abc.png").write_bytes(b"\x89PNG" + b"\0" * 2000)
+    svg = b"<svg xmlns='http://www.w3.org/2000/svg'>" + b"<g/>" * 500 + b"</svg>"
+    (tmp_path / "logo.svg").write_bytes(svg)
+    assert [p.name for p in precompress(tmp_path)] == ["logo.svg.gz"]
+    c = _static_app(tmp_path)
+
+    r = c.get("/static/avatars/1-abc.png")
+    assert r.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert "content-encoding" not in r.headers  # images are not recompressed
+
+    r = c.get("/static/logo.svg", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["content-type"] == "image/svg+xml"
+    assert r.headers["cache-control"] == "public, max-age=3600"
+    assert r.content == svg  # httpx decodes the .gz variant
+    assert int(r.headers["content-length"]) == len(gzip.compress(svg, mtime=0, compresslevel=9))
+
+    r = c.get("/static/logo.svg", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers and r.content == svg
+
+    r = c.get("/static/logo.svg", headers={"Accept-Encoding": "identity", "If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304 and r.headers["cache-control"] == "public, max-age=3600"
+
+
+def test_text_responses_are_compressed(tmp_path):
+    r = _static_app(tmp_path).get("/page", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < len(r.content)
+
+
+def test_streamed_and_small_responses(tmp_path):
+    a = FastAPI()
+    a.add_middleware(CompressionMiddleware, minimum_size=100)
+    a.get("/small")(lambda: PlainTextResponse("tiny"))
+    a.get("/stream")(lambda: StreamingResponse((f"line {i}\n" for i in range(500)), media_type="text/plain"))
+    c = TestClient(a)
+
+    r = c.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers and r.text == "tiny"
+    r = c.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and "content-length" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.text == "".join(f"line {i}\n" for i in range(500))
+
+
+def test_posts_list_is_paginated(client, monkeypatch):
+    monkeypatch.setattr(app.main, "POSTS_PAGE_SIZE", 2)
+    signup(client, username="pager", email="pager@test.com", password="Passw0rd!")
+    for caption in ("page-a", "page-b", "page-c"):
+        client.post("/posts/new", data={"caption": caption}, follow_redirects=False)
+    first = client.get("/posts").text
+    assert "page-c" in first and "page-b" in first and "page-a" not in first
+    older = first.split('href="/posts?before=', 1)[1].split('"', 1)[0]
+    second = client.get(f"/posts?before={older}").text
+    assert "page-a" in second and "page-b" not in second
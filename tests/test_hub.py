@@ -0,0 +1,223 @@
+# tests/test_hub.py
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import hub as hub_module
+from app.chat import manager
+from app.hub import Frame, Hub
+from app.main import app
+from app.metrics import ws_connections
+from tests.test_auth import signup
+from tests.test_websocket import get_user_id_by_email
+
+msgpack = hub_module.msgpack
+needs_msgpack = pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+
+
+def new_user(client):
+    name = uuid.uuid4().hex[:8]
+    signup(client, username=name, email=f"{name}@test.com")  # also logs in
+    return get_user_id_by_email(f"{name}@test.com")
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent, self.closed = [], None
+
+    async def send_text(self, frame):
+        self.sent.append(json.loads(frame))
+
+    async def send_bytes(self, frame):
+        self.sent.append(msgpack.unpackb(frame))
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+def test_hub_routes_by_user_and_drops_slow_sockets(monkeypatch):
+    async def run():
+        hub = Hub()
+        a1, a2, b, c = FakeSocket(), FakeSocket(), FakeSocket(), FakeSocket()
+        ca1 = hub.attach(a1, 1)
+        hub.attach(a2, 1)
+        hub.attach(b, 2)
+        hub.attach(c, 3)
+        ca1.rooms.add(7)
+        assert hub.users() == 3 and hub.connections(1) == 2
+
+        msg = {"type": "text", "id": 5, "sender_id": 2, "content": "hi"}
+        assert hub.room_message(7, (1, 2), msg) == 3
+        assert hub.publish([1, 1], {"type": "ping"}) == 2
+        await asyncio.sleep(0)
+        assert a1.sent == [{**msg, "type": "message", "kind": "text", "room": 7}, {"type": "ping"}]
+        assert a2.sent[0] == {"type": "notify", "kind": "dm", "room": 7, "id": 5, "from": 2, "preview": "hi"}
+        assert b.sent[0]["type"] == "notify" and c.sent == []
+
+        hub.detach(ca1)
+        hub.detach(ca1)  # idempotent
+        assert hub.connections(1) == 1
+
+        monkeypatch.setattr("app.hub.HUB_OUTBOX_SIZE", 2)
+        slow = hub.attach(FakeSocket(), 4)
+        slow.writer.cancel()  # never drains
+        for i in range(3):
+            hub.publish([4], {"n": i})
+        await asyncio.sleep(0)
+        assert slow.closed and slow.ws.closed == 1013
+
+    asyncio.run(run())
+
+
+def test_ws_multiplexes_rooms_and_notifications(client):
+    a = new_user(client)
+    other = TestClient(app)
+    b = new_user(other)
+    r = other.post("/chat/start", data={"user_id": a}, follow_redirects=False)
+    room = int(r.headers["location"].rsplit("/", 1)[1])
+
+    with client.websocket_connect("/ws") as viewing, client.websocket_connect("/ws") as inbox, \
+            other.websocket_connect("/ws") as sender:
+        viewing.send_text(json.dumps({"op": "sub", "room": room}))
+        assert viewing.receive_json() == {"type": "subscribed", "room": room}
+        sender.send_text(json.dumps({"op": "send", "room": room, "content": "hi"}))
+        assert sender.receive_json()["error"] == "subscribe first"
+        sender.send_text(json.dumps({"op": "sub", "room": room}))
+        assert sender.receive_json()["type"] == "subscribed"
+        sender.send_text(json.dumps({"op": "send", "room": room, "content": "hello there"}))
+
+        got = viewing.receive_json()
+        assert (got["type"], got["kind"], got["room"], got["sender_id"], got["content"]) == \
+            ("message", "text", room, b, "hello there")
+        assert sender.receive_json()["id"] == got["id"]
+        note = inbox.receive_json()
+        assert note == {"type": "notify", "kind": "dm", "room": room, "id": got["id"], "from": b,
+                        "preview": "hello there"}
+
+        # the message was stored: it shows up in the room page's history
+        assert "hello there" in client.get(f"/chat/{room}").text
+
+        # a comment on A's post reaches A's devices
+        client.post("/posts/new", data={"caption": "morning run"}, follow_redirects=False)
+        post_id = client.get("/api/v1/posts?limit=1").json()["items"][0]["id"]
+        other.post(f"/posts/{post_id}/comment", data={"content": "nice pace"}, follow_redirects=False)
+        for ws in (viewing, inbox):
+            n = ws.receive_json()
+            assert (n["kind"], n["post_id"], n["from"], n["preview"]) == ("comment", post_id, b, "nice pace")
+
+        inbox.send_text("not json")
+        assert inbox.receive_json() == {"type": "error", "error": "bad frame"}
+        inbox.send_text(json.dumps({"op": "ping"}))
+        assert inbox.receive_json() == {"type": "pong"}
+
+
+def test_ws_requires_login_and_membership(client):
+    with pytest.raises(WebSocketDisconnect) as e:
+        with client.websocket_connect("/ws") as ws:
+            ws.receive_text()
+    assert e.value.code == 1008
+
+    a = new_user(client)
+    other = TestClient(app)
+    new_user(other)
+    r = other.post("/chat/start", data={"user_id": a}, follow_redirects=False)
+    room = int(r.headers["location"].rsplit("/", 1)[1])
+    outsider = TestClient(app)
+    new_user(outsider)
+    with outsider.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"op": "sub", "room": room}))
+        assert ws.receive_json() == {"type": "error", "error": "no such chat", "room": room}
+
+
+@needs_msgpack
+def test_frames_are_encoded_once_per_format(monkeypatch):
+    calls = []
+    real = hub_module.encode
+    monkeypatch.setattr(hub_module, "encode", lambda payload, fmt="json": calls.append(fmt) or real(payload, fmt))
+
+    async def run():
+        hub = Hub()
+        socks = [FakeSocket() for _ in range(6)]
+        for i, ws in enumerate(socks):
+            hub.attach(ws, 1 + i % 2, "msgpack" if i < 3 else "json")
+        hub.publish([1, 2], {"type": "notify", "created_at": "2030-01-02T03:04:05.678000"})
+        await asyncio.sleep(0)
+        return socks
+
+    socks = asyncio.run(run())
+    assert sorted(calls) == ["json", "msgpack"]
+    assert socks[0].sent == [{"type": "notify", "created_at": 1893553445678}]  # epoch ms
+    assert socks[5].sent == [{"type": "notify", "created_at": "2030-01-02T03:04:05.678000"}]
+    assert len(Frame({"a": 1}).encoded("msgpack")) < len(Frame({"a": 1}).encoded("json"))
+
+
+@needs_msgpack
+def test_ws_msgpack_subprotocol(client):
+    a = new_user(client)
+    other = TestClient(app)
+    new_user(other)
+    r = other.post("/chat/start", data={"user_id": a}, follow_redirects=False)
+    room = int(r.headers["location"].rsplit("/", 1)[1])
+
+    with client.websocket_connect("/ws", subprotocols=["sweatmarket.msgpack", "sweatmarket.json"]) as ws, \
+            other.websocket_connect("/ws", subprotocols=["x-unknown"]) as plain:
+        assert ws.accepted_subprotocol == "sweatmarket.msgpack"
+        assert plain.accepted_subprotocol is None
+        ws.send_bytes(msgpack.packb({"op": "sub", "room": room}))
+        assert msgpack.unpackb(ws.receive_bytes()) == {"type": "subscribed", "room": room}
+        plain.send_text(json.dumps({"op": "sub", "room": room}))
+        plain.receive_json()
+        plain.send_text(json.dumps({"op": "send", "room": room, "content": "hi"}))
+
+        got, text = msgpack.unpackb(ws.receive_bytes()), plain.receive_json()
+        assert {**got, "created_at": None} == {**text, "created_at": None}
+        assert isinstance(got["created_at"], int)
+        ws.send_bytes(b"\xc1")  # never valid msgpack
+        assert msgpack.unpackb(ws.receive_bytes()) == {"type": "error", "error": "bad frame"}
+
+
+def test_room_socket_cleans_up_after_a_bad_frame(client):
+    a = new_user(client)
+    other = TestClient(app)
+    new_user(other)
+    r = other.post("/chat/start", data={"user_id": a}, follow_redirects=False)
+    room = int(r.headers["location"].rsplit("/", 1)[1])
+    before = ws_connections.samples().get((), 0)
+
+    with pytest.raises(json.JSONDecodeError):
+        with client.websocket_connect(f"/ws/chat/{room}") as ws:
+            assert ws_connections.samples()[()] == before + 1
+            ws.send_text("not json")
+            ws.receive_text()
+    assert room not in manager.rooms
+    assert ws_connections.samples().get((), 0) == before
+
+
+def test_room_socket_and_image_upload_are_members_only(client):
+    a = new_user(client)
+    other = TestClient(app)
+    b = new_user(other)
+    r = other.post("/chat/start", data={"user_id": a}, follow_redirects=False)
+    room = int(r.headers["location"].rsplit("/", 1)[1])
+    outsider = TestClient(app)
+    new_user(outsider)
+
+    for c in (TestClient(app), outsider):  # anonymous, logged in but not a member
+        with pytest.raises(WebSocketDisconnect) as e:
+            with c.websocket_connect(f"/ws/chat/{room}") as ws:
+                ws.receive_text()
+        assert e.value.code == 1008
+    r = outsider.post(f"/chat/{room}/image", files={"image": ("x.png", b"\x89PNG", "image/png")},
+                      follow_redirects=False)
+    assert r.headers["location"] == "/chat"
+
+    with client.websocket_connect("/ws") as inbox, other.websocket_connect(f"/ws/chat/{room}") as ws:
+        ws.send_text(json.dumps({"sender_id": a, "content": "forged?"}))
+        got = ws.receive_json()
+        assert (got["sender_id"], got["content"]) == (b, "forged?")
+        assert inbox.receive_json()["from"] == b
+    assert "/static/chat_images/" not in client.get(f"/chat/{room}").text
@@ -0,0 +1,45 @@
+# tests/test_import_time.py — cold-start budget for `import app.main`
+#
+# Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+# fails when the import (or the part spent in our own modules) goes over
+# budget, when a module we load lazily shows up at import, or when the import
+# touches the filesystem. Budgets are ~2-3x a typical run; override with
+# IMPORT_BUDGET_MS / IMPORT_APP_BUDGET_MS on slow CI machines.
+import ast
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+IMPORT_APP_BUDGET_MS = float(os.getenv("IMPORT_APP_BUDGET_MS", "500"))  # self time of app.* modules
+LAZY = ("numpy", "passlib", "argon2", "qrcode")  # loaded on first use, never by the import
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+
+def _import_app(cwd: Path) -> tuple[dict[str, tuple[int, int]], list[str]]:
+    probe = f"import sys, app.main; print([m for m in {LAZY!r} if m in sys.modules])"
+    env = {**os.environ, "TESTING": "1", "DATABASE_URL": "sqlite://", "PYTHONPATH": str(ROOT),
+           "PYTHONDONTWRITEBYTECODE": "1"}
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=cwd, env=env,
+                         capture_output=True, text=True, check=True)
+    times = {m.group(3): (int(m.group(1)), int(m.group(2))) for m in LINE.finditer(out.stderr)}
+    return times, ast.literal_eval(out.stdout.strip().splitlines()[-1])
+
+
+def test_import_app_main_within_budget(tmp_path):
+    (tmp_path / "static").mkdir()  # StaticFiles checks its directory at import
+    times, lazy_loaded = _import_app(tmp_path)
+
+    assert lazy_loaded == [], f"imported at startup instead of on first use: {lazy_loaded}"
+    assert list(tmp_path.rglob("*")) == [tmp_path / "static"], "import created files or directories"
+
+    total_ms = times["app.main"][1] / 1000
+    app_ms = sum(own for name, (own, _) in times.items() if name == "app" or name.startswith("app.")) / 1000
+    slowest = sorted(((own, name) for name, (own, _) in times.items()), reverse=True)[:5]
+    detail = ", ".join(f"{name} {own / 1000:.0f} ms" for own, name in slowest)
+    assert total_ms < IMPORT_BUDGET_MS, f"import app.main took {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f}); {detail}"
+    assert app_ms < IMPORT_APP_BUDGET_MS, f"app.* modules took {app_ms:.0f} ms (budget {IMPORT_APP_BUDGET_MS:.0f})"
@@ -0,0 +1,104 @@
+# tests/test_leaderboard.py
+import random
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+import app.leaderboard
+from app.db import make_engine
+from app.leaderboard import Board, Leaderboards
+from app.rewards import CHECKIN_REWARD, RewardsEngine
+from tests.test_auth import login, signup
+from tests.test_websocket import get_user_id_by_email
+
+TODAY = date(2030, 1, 10).toordinal()
+
+
+def test_board_matches_a_full_sort():
+    rng = random.Random(7)
+    board, scores = Board(), {}
+    for _ in range(5000):
+        uid, score = rng.randrange(1, 300), rng.randrange(0, 50)
+        board.set(uid, score)
+        scores[uid] = score
+
+    ranked = sorted(((-s, uid) for uid, s in scores.items() if s > 0))
+    assert board.top(20) == [(uid, -s) for s, uid in ranked[:20]]
+    for uid, s in scores.items():
+        # competition ranking: 1 + number of users with a strictly higher score
+        assert board.rank(uid) == 1 + sum(1 for other in scores.values() if other > s)
+
+
+def test_scoped_boards_follow_profile_and_streak_expiry():
+    lb = Leaderboards()
+    lb.load(
+        [(1, 50, "running", "Burnaby"), (2, 80, "gym", "Burnaby"), (3, 20, "running", "Delta"), (4, 0, None, None)],
+        [(1, 5, TODAY, 5), (3, 9, TODAY - 3, 9)],  # user 3's streak has already lapsed
+        today=TODAY,
+    )
+    assert lb.top("coins") == [(2, 80), (1, 50), (3, 20)]
+    assert lb.top("coins", "sport:running") == [(1, 50), (3, 20)]
+    assert lb.top("coins", "region:burnaby") == [(2, 80), (1, 50)]
+    assert lb.top("streak") == [(1, 5)]
+    assert lb.rank("coins", "all", 4) == (4, 0)
+
+    lb.set_profile(3, "running", " BURNABY ")
+    lb.set_coins(3, 90)
+    assert lb.top("coins", "region:burnaby") == [(3, 90), (2, 80), (1, 50)]
+    assert lb.top("coins", "region:delta") == []
+    assert lb.rank("coins", "sport:running", 1) == (2, 50)
+
+    lb.sweep(TODAY + 2)
+    assert lb.top("streak") == []
+
+
+def test_rewards_runs_update_the_boards(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'lb.db'}")
+    SQLModel.metadata.create_all(eng)
+    with eng.begin() as conn:
+        for uid in (1, 2):
+            conn.execute(text("INSERT INTO users (id, username, password_hash, coins, is_active, created_at, sport) "
+                              "VALUES (:id, :name, 'x', 0, 1, '2030-01-01', 'running')"), {"id": uid, "name": f"u{uid}"})
+    lb = Leaderboards()
+    lb.load_from_db(eng)
+    rw = RewardsEngine(eng)
+    rw.listeners.append(lb.on_rewards)
+
+    with eng.begin() as conn:
+        conn.execute(text("INSERT INTO checkins (session_id, user_id, lat, lon, distance_m, created_at) VALUES "
+                          "(1, 2, 0, 0, 0, '2030-01-09 18:00:00.000000'), (2, 2, 0, 0, 0, '2030-01-10 18:00:00.000000'), "
+                          "(3, 1, 0, 0, 0, '2030-01-10 18:00:00.000000')"))
+    rw.run(backfill=True)
+    assert lb.top("coins", "sport:running") == [(2, 2 * CHECKIN_REWARD), (1, CHECKIN_REWARD)]
+    assert lb.top("streak") == [(2, 2), (1, 1)]
+
+    fresh = Leaderboards()  # a bulk reload agrees with the live updates
+    fresh.load(*_rows(eng), today=TODAY)
+    assert fresh.top("coins") == lb.top("coins") and fresh.top("streak") == lb.top("streak")
+
+
+def _rows(eng):
+    with eng.connect() as conn:
+        return (conn.execute(text("SELECT id, coins, sport, region FROM users")).all(),
+                conn.execute(text("SELECT user_id, current, last_checkin_day, best FROM streak_states")).all())
+
+
+def test_leaderboard_page(client):
+    signup(client, username="ranker", email="ranker@test.com")
+    login(client, username="ranker", email="ranker@test.com")
+    r = client.get("/leaderboard", params={"metric": "streak", "scope": "sport:nope"})
+    assert r.status_code == 200
+    assert "Your rank" in r.text and "Longest current check-in streaks" in r.text
+
+
+def test_leaderboard_ranks_skip_missing_users(client, monkeypatch):
+    signup(client, username="tiedrank", email="tiedrank@test.com")
+    me = get_user_id_by_email("tiedrank@test.com")
+    gone = 10**9  # on the board but no longer resolvable
+    top = [(gone, 10), (me, 10), (gone + 1, 5), (gone + 2, 5)]
+    monkeypatch.setattr(app.leaderboard.leaderboards, "top", lambda metric, scope, n: top)
+    r = client.get("/leaderboard")
+    assert r.status_code == 200
+    assert re.findall(r'font-semibold">(\d+)</span>', r.text) == ["1"]
@@ -0,0 +1,71 @@
+# tests/test_matching.py
+import random
+
+import pytest
+
+from app.matching import Matcher, Profile, HAS_NUMPY, time_mask
+from tests.test_auth import login, signup
+
+ENGINES = [False] + ([True] if HAS_NUMPY else [])
+
+
+def test_time_mask_parses_free_text():
+    assert time_mask("Weekday mornings, weekends") == 0b100001
+    assert time_mask("after work") == 0b001000
+    assert time_mask("") == time_mask(None) == time_mask("whenever") == 0
+
+
+@pytest.mark.parametrize("use_numpy", ENGINES)
+def test_top_k_filters_and_ranks(use_numpy):
+    m = Matcher(use_numpy=use_numpy)
+    me = Profile("running", "Burnaby", "morning", "10k run", "1995-01-01")
+    m.upsert(1, me)
+    m.upsert(2, Profile("running", " burnaby ", "morning", "10k run", "1996-01-01"))  # best
+    m.upsert(3, Profile("running", "Burnaby", "morning and evening", None, "1990-01-01"))
+    m.upsert(4, Profile("running", "Burnaby", None, None, None))  # no window: matches any time
+    m.upsert(5, Profile("running", "Burnaby", "evening", "10k run", "1995-01-01"))  # no overlap
+    m.upsert(6, Profile("gym", "Burnaby", "morning", "10k run", "1995-01-01"))  # other sport
+    m.upsert(7, Profile("running", "Surrey", "morning", "10k run", "1995-01-01"))  # other region
+
+    ids = [uid for uid, _ in m.top_k(1)]
+    assert ids == [2, 3, 4]
+
+    # incremental update: 5 moves into the morning slot, 2 switches sport
+    m.upsert(5, Profile("running", "Burnaby", "early morning", "10k run", "1995-01-01"))
+    m.upsert(2, Profile("gym", "Burnaby", "morning", "10k run", "1996-01-01"))
+    assert [uid for uid, _ in m.top_k(1)] == [5, 3, 4]
+    m.remove(5)
+    assert [uid for uid, _ in m.top_k(1, k=1)] == [3]
+    assert m.count == 6
+
+
+def test_numpy_and_python_agree():
+    if not HAS_NUMPY:
+        pytest.skip("numpy not installed")
+    rng = random.Random(3)
+    rows = [
+        (uid, rng.choice(["gym", "running"]), rng.choice(["A", "B"]),
+         rng.choice(["morning", "evening", "weekend mornings", None]),
+         rng.choice(["lose weight", "marathon", None]), f"{rng.randint(1960, 2005)}-01-01")
+        for uid in range(1, 3000)
+    ]
+    py, vec = Matcher(use_numpy=False), Matcher(use_numpy=True)
+    py.load(rows)
+    vec.load(rows)
+    for uid in (1, 17, 500, 2999):
+        assert py.top_k(uid, k=25) == vec.top_k(uid, k=25)
+
+
+def test_partners_page_updates_on_profile_edit(client):
+    pw = "Passw0rd!"
+    for name in ("matchone", "matchtwo"):
+        signup(client, username=name, email=f"{name}@test.com", password=pw)
+        client.post("/profile/edit", data={
+            "nickname": name, "birth_year": "1994", "birth_month": "5", "birth_day": "1",
+            "gender": "female", "sport": "soccer", "time_window": "weekend", "region": "Delta",
+        }, follow_redirects=False)
+        client.post("/logout", follow_redirects=False)
+
+    login(client, username="matchone", email="matchone@test.com", password=pw)
+    r = client.get("/partners")
+    assert r.status_code == 200 and "matchtwo" in r.text
@@ -0,0 +1,88 @@
+# tests/test_metrics.py
+import threading
+
+import pytest
+
+from app import metrics
+
+
+def test_counter_shards_across_threads():
+    c = metrics.Counter("t_shard_total", "t", ("k",))
+    metrics.REGISTRY.remove(c)
+
+    def work():
+        for _ in range(1000):
+            c.inc("a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    c.inc("b", amount=2)
+    assert c.samples() == {("a",): 4000, ("b",): 2}
+
+
+def test_histogram_render():
+    h = metrics.Histogram("t_latency_seconds", "t", ("route",), buckets=(0.1, 1.0))
+    metrics.REGISTRY.remove(h)
+    for v in (0.05, 0.5, 5):
+        h.observe(v, "/x")
+    snap = {h.name: {"kind": "histogram", "help": "t", "labelnames": ["route"], "buckets": [0.1, 1.0],
+                     "samples": [[list(k), v] for k, v in h.samples().items()]}}
+    text = metrics.render(snap)
+    assert 't_latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{route="/x",le="1"} 2' in text
+    assert 't_latency_seconds_bucket{route="/x",le="+Inf"} 3' in text
+    assert 't_latency_seconds_count{route="/x"} 3' in text
+
+
+def test_merge_drops_gauges_of_dead_workers():
+    def snap(n):
+        return {
+            "c": {"kind": "counter", "help": "", "labelnames": [], "buckets": [], "samples": [[[], n]]},
+            "g": {"kind": "gauge", "help": "", "labelnames": [], "buckets": [], "samples": [[[], n]]},
+        }
+
+    merged = metrics.merge([(True, snap(2)), (False, snap(3))])
+    assert merged["c"]["samples"] == [[[], 5]]
+    assert merged["g"]["samples"] == [[[], 2]]
+
+
+def test_metrics_endpoint(client):
+    client.get("/health")
+    client.get("/posts/does-not-exist")
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert 'sweatmarket_http_requests_total{method="GET",route="/health",status="200"}' in r.text
+    assert 'route="<unmatched>"' in r.text or 'route="/posts/{post_id}"' in r.text
+    assert "sweatmarket_http_requests_in_flight 1" in r.text  # the scrape itself
+    assert "sweatmarket_ws_rooms 0" in r.text
+
+
+def test_multiworker_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    (tmp_path / "worker-999999999.json").write_text(
+        '{"pid": 999999999, "metrics": {"sweatmarket_dex_orders_total": {"kind": "counter", "help": "x",'
+        ' "labelnames": ["side", "mode"], "buckets": [], "samples": [[["buy", "db"], 1000]]}}}'
+    )
+    text = metrics.collect()
+    line = [ln for ln in text.splitlines() if ln.startswith('sweatmarket_dex_orders_total{side="buy",mode="db"}')]
+    assert line and int(line[0].split()[-1]) >= 1000
+
+
+def test_middleware_flushes_off_the_event_loop(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_last_flush", 0.0)
+    threads = []
+    real = metrics._write_snapshot
+    monkeypatch.setattr(metrics, "_write_snapshot", lambda: threads.append(threading.current_thread().name) or real())
+    client.get("/health")
+    assert threads == ["AnyIO worker thread"]
+    assert any(p.name.startswith("worker-") for p in tmp_path.iterdir())
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        metrics._Metric("t_abstract", "t")
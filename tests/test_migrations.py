@@ -0,0 +1,60 @@
+# tests/test_migrations.py
+import sqlite3
+
+from sqlmodel import SQLModel
+
+from app.db import LEGACY_PROFILE, make_engine
+from app.migrations import MIGRATIONS, run_migrations, status
+
+
+def _legacy_db(path):
+    # users table as it looked before the profile fields existed
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, email TEXT, password_hash TEXT)")
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('old', 'x')")
+    conn.commit()
+    conn.close()
+
+
+def _indexes(path, table):
+    conn = sqlite3.connect(path)
+    names = {r[1] for r in conn.execute(f"PRAGMA index_list({table})")}
+    conn.close()
+    return names
+
+
+def test_upgrades_legacy_db_and_records_versions(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path)
+    eng = make_engine(f"sqlite:///{path}", LEGACY_PROFILE)
+    SQLModel.metadata.create_all(eng)  # init_db() order: new tables first
+
+    ran = run_migrations(eng)
+    assert [v for v, _, _ in ran] == [m.version for m in MIGRATIONS]
+    assert all(ms >= 0 for _, _, ms in ran)
+
+    conn = sqlite3.connect(path)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(users)")}
+    assert {"nickname", "sport", "coins", "is_active"} <= cols
+    assert conn.execute("SELECT username, coins FROM users").fetchall() == [("old", 0)]
+    conn.execute("UPDATE users SET nickname = 'oldie'")
+    conn.commit()
+    assert conn.execute("SELECT value FROM revisions WHERE name = 'users'").fetchone() == (1,)
+    conn.close()
+
+    assert "ix_txs_user_id_id" in _indexes(path, "txs")
+    assert "ix_messages_room_id_id" in _indexes(path, "messages")
+    assert "ix_orders_side_price" in _indexes(path, "orders")
+    assert {"ix_chat_rooms_user1_user2", "ix_chat_rooms_user2_id"} <= _indexes(path, "chat_rooms")
+
+
+def test_rerun_is_noop_and_status(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'fresh.db'}", LEGACY_PROFILE)
+    SQLModel.metadata.create_all(eng)
+    assert all(applied is None for _, _, applied, _ in status(eng))
+
+    run_migrations(eng, target=1)
+    assert [applied is not None for _, _, applied, _ in status(eng)][:2] == [True, False]
+
+    assert [v for v, _, _ in run_migrations(eng)] == [2, 3]
+    assert run_migrations(eng) == []
@@ -0,0 +1,112 @@
+# tests/test_offers.py
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel, func, select
+
+from app.db import make_engine
+from app.models import Offer, OfferJoin
+from app.offers import decode_cursor, join_offer, leave_offer, list_open
+from tests.test_auth import login, signup
+
+NOW = datetime(2030, 1, 1, 12, 0)
+
+
+def _engine(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'offers.db'}")
+    SQLModel.metadata.create_all(eng)
+    return eng
+
+
+def _offer(eng, capacity, host_id=1, **kw):
+    with Session(eng) as s:
+        o = Offer(host_id=host_id, title="Run", capacity=capacity,
+                  starts_at=kw.pop("starts_at", NOW + timedelta(hours=1)), **kw)
+        s.add(o)
+        s.commit()
+        return o.id
+
+
+def test_concurrent_joins_never_overbook(tmp_path):
+    eng = _engine(tmp_path)
+    oid = _offer(eng, capacity=25)
+    n = 200
+    start = threading.Barrier(32)
+
+    def attempt(uid):
+        if uid < 2 + 32:
+            start.wait()  # first wave hits the offer at the same moment
+        with Session(eng) as s:
+            return join_offer(s, oid, uid, now=NOW)
+
+    with ThreadPoolExecutor(32) as pool:
+        results = list(pool.map(attempt, range(2, n + 2)))
+
+    assert results.count("joined") == 25
+    assert results.count("full") == n - 25
+    with Session(eng) as s:
+        assert s.get(Offer, oid).joined_count == 25
+        assert s.exec(select(func.count()).select_from(OfferJoin)).one() == 25
+
+
+def test_join_rules_and_leave(tmp_path):
+    eng = _engine(tmp_path)
+    oid = _offer(eng, capacity=1)
+    with Session(eng) as s:
+        assert join_offer(s, oid, 1, now=NOW) == "host"
+        assert join_offer(s, oid, 2, now=NOW) == "joined"
+        assert join_offer(s, oid, 2, now=NOW) == "already"
+        assert join_offer(s, oid, 3, now=NOW) == "full"
+        assert join_offer(s, oid, 3, now=NOW + timedelta(hours=2)) == "closed"
+        assert join_offer(s, 999, 3, now=NOW) == "missing"
+        assert leave_offer(s, oid, 2) == "left"
+        assert leave_offer(s, oid, 2) == "not_joined"
+        assert join_offer(s, oid, 3, now=NOW) == "joined"
+        assert s.get(Offer, oid).joined_count == 1
+
+
+def test_keyset_pages_use_the_listing_index(tmp_path):
+    eng = _engine(tmp_path)
+    for i in range(45):
+        _offer(eng, capacity=5, sport="running", region="Burnaby", starts_at=NOW + timedelta(minutes=i % 15 + 1))
+    _offer(eng, capacity=5, sport="gym", region="Burnaby")
+    _offer(eng, capacity=5, sport="running", region="Burnaby", starts_at=NOW - timedelta(hours=1))  # past
+
+    seen, cursor = [], None
+    with Session(eng) as s:
+        while True:
+            page, cursor = list_open(s, "running", "Burnaby", decode_cursor(cursor), limit=20, now=NOW)
+            seen += page
+            if not cursor:
+                break
+    assert len(seen) == 45 and len({o.id for o in seen}) == 45
+    assert [(o.starts_at, o.id) for o in seen] == sorted((o.starts_at, o.id) for o in seen)
+
+    with eng.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM offers WHERE sport = 'running' AND region = 'Burnaby' "
+            "AND starts_at > '2030-01-01' ORDER BY starts_at, id LIMIT 21"
+        )).all()
+    assert any("ix_offers_sport_region_starts_at" in row[-1] for row in plan)
+
+
+def test_offer_pages(client):
+    signup(client, username="offerhost", email="offerhost@test.com")
+    login(client, username="offerhost", email="offerhost@test.com")
+    when = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M")
+    r = client.post("/offers/new", data={
+        "title": "Sunday long run", "starts_at": when, "capacity": "1", "sport": "running", "region": "Delta",
+    }, follow_redirects=False)
+    assert r.status_code == 303
+    client.post("/logout", follow_redirects=False)
+
+    signup(client, username="offerguest", email="offerguest@test.com")
+    login(client, username="offerguest", email="offerguest@test.com")
+    page = client.get("/offers", params={"sport": "running", "region": "Delta"}).text
+    assert "Sunday long run" in page and "0/1" in page
+    oid = re.search(r"/offers/(\d+)/join", page).group(1)
+    r = client.post(f"/offers/{oid}/join")
+    assert "You&#39;re in!" in r.text and "1/1" in r.text and "Leave" in r.text
@@ -0,0 +1,81 @@
+# tests/test_profiler.py
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import app.admin
+from app import profiler, sqlstats
+from app.db import engine
+from app.models import User
+
+
+def slow_helper():
+    time.sleep(0.06)
+
+
+def _app(**kw):
+    a = FastAPI()
+    a.add_middleware(profiler.ProfilerMiddleware, interval_ms=2, **kw)
+    a.add_middleware(sqlstats.QueryStatsMiddleware)
+
+    @a.get("/slow")
+    def slow():
+        with Session(engine) as s:
+            s.exec(select(User).limit(1)).all()
+        slow_helper()
+        return {}
+
+    return a
+
+
+def test_profiles_only_admin_requests(client, monkeypatch):
+    sqlstats.instrument(engine)
+    profiler.reset()
+    c = TestClient(_app())
+    assert "x-profile-id" not in c.get("/slow").headers
+    assert "x-profile-id" not in c.get("/slow", headers={"X-Profile": "1"}).headers  # not an admin
+    assert profiler.profiles() == []
+
+    monkeypatch.setattr(app.admin, "ADMIN_TOKEN", "t0ken")
+    r = c.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "t0ken"})
+    p = profiler.get_profile(int(r.headers["x-profile-id"]))
+    s = p.summary()
+    assert (s["route"], s["status"], s["sql_count"]) == ("GET /slow", 200, 1)
+    assert s["ms"] >= 60 and s["samples"] >= 10
+
+    hot = [line for line in p.collapsed().splitlines() if "slow_helper (" in line]
+    assert hot and all(line.startswith("worker;") for line in hot)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in hot) >= 10  # most of the request is the sleep
+
+    doc = p.speedscope()
+    prof, frames = doc["profiles"][0], doc["shared"]["frames"]
+    assert prof["type"] == "sampled" and len(prof["samples"]) == len(prof["weights"])
+    assert all(0 <= i < len(frames) for stack in prof["samples"] for i in stack)
+    assert prof["endValue"] == sum(prof["weights"]) == s["samples"] * 2
+
+
+def test_sample_rate_and_ring_buffer(monkeypatch):
+    profiler.reset()
+    monkeypatch.setattr(profiler, "_profiles", profiler.deque(maxlen=3))
+    c = TestClient(_app(sample_rate=1.0))
+    ids = []
+    for _ in range(5):
+        assert "x-profile-id" not in c.get("/slow").headers  # sampled, but not shown to non-admins
+        ids.append(profiler.profiles()[-1].id)
+    assert [p.id for p in profiler.profiles()] == ids[-3:]
+
+
+def test_debug_endpoints(client, monkeypatch):
+    assert client.get("/debug/profiles").status_code == 404
+    monkeypatch.setattr(app.admin, "ADMIN_TOKEN", "t0ken")
+    admin = {"X-Admin-Token": "t0ken"}
+    pid = client.get("/posts", headers={**admin, "X-Profile": "1"}).headers["x-profile-id"]
+
+    listed = client.get("/debug/profiles", headers=admin).json()["profiles"]
+    assert listed[0]["id"] == int(pid) and listed[0]["route"] == "GET /posts"
+    r = client.get(f"/debug/profiles/{pid}/collapsed", headers=admin)
+    assert r.status_code == 200 and "attachment" in r.headers["content-disposition"]
+    assert client.get(f"/debug/profiles/{pid}/speedscope", headers=admin).json()["exporter"] == "sweatmarket"
+    assert client.get("/debug/profiles/999999/speedscope", headers=admin).status_code == 404
@@ -0,0 +1,84 @@
+# tests/test_qr.py
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import qr
+from app.qr import QR_NONCE_TTL, ExpiringSet, NonceSigner
+from tests.test_auth import login, signup
+
+
+def test_nonce_window_and_signature():
+    signer = NonceSigner("k1")
+    now = 1_000_000.0
+    nonce, refresh_in = signer.issue(7, now)
+    assert 0 < refresh_in <= QR_NONCE_TTL
+    assert signer.issue(7, now + refresh_in - 1)[0] == nonce  # stable within a window (cacheable PNG)
+
+    assert signer.verify(7, nonce, now)
+    assert signer.verify(7, nonce, now + QR_NONCE_TTL)  # grace: the following window
+    assert signer.verify(7, nonce, now + 2 * QR_NONCE_TTL) is None
+    assert signer.verify(8, nonce, now) is None  # bound to the session
+    assert NonceSigner("k2").verify(7, nonce, now) is None
+    assert signer.verify(7, nonce[:-1] + ("A" if nonce[-1] != "A" else "B"), now) is None
+    assert signer.verify(7, "garbage", now) is None
+
+
+def test_expiring_set_rejects_replay_and_sweeps():
+    used = ExpiringSet(sweep_every=0)
+    assert used.add_if_absent("a", expires=10, now=0)
+    assert not used.add_if_absent("a", expires=10, now=5)
+    assert used.add_if_absent("b", expires=20, now=5)
+    assert used.add_if_absent("a", expires=30, now=11)  # expired entry can be reused
+    used.add_if_absent("c", expires=40, now=25)
+    assert len(used) == 2  # "b" swept
+
+
+def test_expiring_set_is_capped():
+    used = ExpiringSet(sweep_every=1000, max_size=2)
+    for key in "abc":
+        assert used.add_if_absent(key, expires=100, now=0)
+    assert len(used) == 2
+    assert used.add_if_absent("a", expires=100, now=1)  # oldest was evicted
+    assert not used.add_if_absent("c", expires=100, now=1)
+
+
+def test_png_is_cached_per_payload():
+    pytest.importorskip("qrcode")
+    qr.qr_png_bytes.cache_clear()
+    png = qr.qr_png_bytes("https://example.test/session/1?n=abc")
+    assert png.startswith(b"\x89PNG")
+    assert qr.qr_png_bytes("https://example.test/session/1?n=abc") is png
+    assert qr.qr_png_bytes.cache_info().hits == 1
+
+
+def test_qr_is_host_only_and_nonce_required(client, monkeypatch):
+    signup(client, username="qrhost", email="qrhost@test.com")
+    login(client, username="qrhost", email="qrhost@test.com")
+    start = datetime.now(timezone.utc) + timedelta(minutes=5)
+    r = client.post("/sessions/new", data={
+        "title": "Track", "lat": "37.5", "lon": "127.0", "starts_at": start.strftime("%Y-%m-%dT%H:%M"),
+    }, follow_redirects=False)
+    sid = int(re.search(r"/session/(\d+)", r.headers["location"]).group(1))
+
+    page = client.get(f"/session/{sid}").text
+    assert f"/session/{sid}?n=" in page
+    r = client.get(f"/session/{sid}/qr.png")
+    assert r.status_code == (200 if qr.available() else 503)
+    client.post("/logout", follow_redirects=False)
+
+    signup(client, username="qrguest", email="qrguest@test.com")
+    login(client, username="qrguest", email="qrguest@test.com")
+    assert client.get(f"/session/{sid}/qr.png").status_code == 403
+    assert "Scan the host" in client.get(f"/session/{sid}").text
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "37.5", "lon": "127.0", "nonce": "1.forged"})
+    assert "expired" in r.text and "0 checked in" in r.text
+    nonce, _ = qr.signer.issue(sid)
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "37.5", "lon": "127.0", "nonce": nonce})
+    assert "Checked in!" in r.text
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "37.5", "lon": "127.0", "nonce": nonce})
+    assert "already checked in" in r.text and "1 checked in" in r.text  # replay stopped by the seen-set
+    monkeypatch.setattr(qr, "used_nonces", ExpiringSet())  # another worker: the unique constraint still holds
+    r = client.post(f"/session/{sid}/checkin", data={"lat": "37.5", "lon": "127.0", "nonce": nonce})
+    assert "already checked in" in r.text and "1 checked in" in r.text
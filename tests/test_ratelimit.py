@@ -0,0 +1,85 @@
+# tests/test_ratelimit.py
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.ratelimit import RateLimitMiddleware, RateLimitRule, TokenBucketLimiter, rules_from_env
+
+
+def test_bucket_refills_and_reports_wait():
+    now = [0.0]
+    lim = TokenBucketLimiter(rate=1.0, burst=2, clock=lambda: now[0])
+    assert lim.hit("a") == 0
+    assert lim.hit("a") == 0
+    assert lim.hit("a") == 1.0
+    now[0] = 0.5
+    assert lim.hit("a") == 0.5
+    now[0] = 1.0
+    assert lim.hit("a") == 0
+
+
+def test_idle_keys_are_evicted():
+    now = [0.0]
+    lim = TokenBucketLimiter(rate=1.0, burst=5, max_keys=3, clock=lambda: now[0])
+    for k in "abc":
+        lim.hit(k)
+    lim.hit("d")  # over max_keys: least recently used goes
+    assert len(lim) == 3 and "a" not in lim._buckets
+
+    now[0] = 10.0  # every bucket has refilled
+    lim.hit("e")
+    assert len(lim) == 1
+
+
+def test_rules_from_env_overrides():
+    rules = [RateLimitRule("login", "POST", "/login", 10, 60), RateLimitRule("dex", "POST", "/dex/new", 5, 60)]
+    out = rules_from_env(rules, "login=2/1,dex=off")
+    assert [(r.name, r.limit, r.per) for r in out] == [("login", 2, 1.0)]
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, rules=[
+        RateLimitRule("login", "POST", r"/login", limit=2, per=60),
+        RateLimitRule("upload", "POST", r"/upload/\d+", limit=1, per=60, by="uid"),
+    ])
+    app.add_middleware(SessionMiddleware, secret_key="t")
+
+    @app.post("/login")
+    def login():
+        return {}
+
+    @app.get("/login")
+    def login_page():
+        return {}
+
+    @app.get("/as/{uid}")
+    def as_user(uid: int, request: Request):
+        request.session["uid"] = uid
+        return {}
+
+    @app.post("/upload/{n}")
+    def upload(n: int):
+        return {}
+
+    return app
+
+
+def test_middleware_returns_429_with_retry_after():
+    c = TestClient(_app())
+    assert c.post("/login").status_code == 200
+    assert c.post("/login").status_code == 200
+    r = c.post("/login")
+    assert r.status_code == 429
+    assert r.headers["retry-after"] == "30"
+    assert c.get("/login").status_code == 200  # only POST is limited
+
+
+def test_uid_rules_key_per_user():
+    app = _app()
+    a, b = TestClient(app), TestClient(app)
+    a.get("/as/1")
+    b.get("/as/2")
+    assert a.post("/upload/1").status_code == 200
+    assert a.post("/upload/2").status_code == 429
+    assert b.post("/upload/1").status_code == 200
@@ -0,0 +1,86 @@
+# tests/test_rewards.py
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+from app.db import make_engine
+from app.rewards import CHECKIN_REWARD, POST_REWARD, STREAK_BONUSES, RewardsEngine, Streak, effective_streak
+
+
+def _engine(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'rewards.db'}")
+    SQLModel.metadata.create_all(eng)
+    with eng.begin() as conn:
+        for uid in (1, 2):
+            conn.execute(text("INSERT INTO users (id, username, password_hash, coins, is_active, created_at) "
+                              "VALUES (:id, :name, 'x', 0, 1, '2030-01-01')"), {"id": uid, "name": f"u{uid}"})
+    return eng
+
+
+def _checkins(eng, *rows):
+    with eng.begin() as conn:
+        for uid, day in rows:  # one session per check-in (unique per session and user)
+            conn.execute(text("INSERT INTO checkins (session_id, user_id, lat, lon, distance_m, created_at) "
+                              "SELECT coalesce(max(id), 0) + 1, :uid, 0, 0, 0, :t FROM checkins"),
+                         {"uid": uid, "t": f"{day} 18:00:00.000000"})
+
+
+def _state(eng, sql):
+    with eng.connect() as conn:
+        return conn.execute(text(sql)).all()
+
+
+def test_streaks_rewards_and_idempotent_reruns(tmp_path):
+    eng = _engine(tmp_path)
+    _checkins(eng, (1, "2030-01-01"), (1, "2030-01-01"), (1, "2030-01-02"), (2, "2030-01-02"), (1, "2030-01-03"))
+    with eng.begin() as conn:
+        conn.execute(text("INSERT INTO posts (author_id, caption, created_at) VALUES "
+                          "(2, 'a', '2030-01-02 09:00'), (2, 'b', '2030-01-02 10:00')"))
+
+    rw = RewardsEngine(eng, batch=2)  # several batches per source
+    assert rw.run(backfill=True) == {
+        "checkins": (5, 5 * CHECKIN_REWARD + STREAK_BONUSES[3]),
+        "posts": (2, POST_REWARD),
+    }
+    assert _state(eng, "SELECT id, coins FROM users ORDER BY id") == [
+        (1, 4 * CHECKIN_REWARD + STREAK_BONUSES[3]), (2, CHECKIN_REWARD + POST_REWARD),
+    ]
+    assert ("bonus", "Streak: 3 days") in _state(eng, "SELECT kind, note FROM txs WHERE user_id = 1")
+
+    # re-running finds nothing new
+    assert rw.run() == {"checkins": (0, 0), "posts": (0, 0)}
+    assert _state(eng, "SELECT count(*) FROM txs") == [(7,)]
+
+    # incremental: the streak state carries over; a missed day resets it
+    _checkins(eng, (1, "2030-01-05"), (2, "2030-01-03"))
+    rw.run()
+    assert _state(eng, "SELECT user_id, current, best FROM streak_states ORDER BY user_id") == [(1, 1, 3), (2, 2, 2)]
+
+
+def test_start_skips_history(tmp_path):
+    eng = _engine(tmp_path)
+    _checkins(eng, (1, "2030-01-01"))
+    rw = RewardsEngine(eng)
+    rw.start()
+    _checkins(eng, (1, "2030-01-02"))
+    assert rw.run()["checkins"] == (1, CHECKIN_REWARD)
+
+
+def test_effective_streak_expires_after_a_missed_day():
+    day = date(2030, 1, 10).toordinal()
+    s = Streak(last_checkin_day=day, current=4, best=4)
+    assert effective_streak(s, day) == effective_streak(s, day + 1) == 4
+    assert effective_streak(s, day + 2) == 0
+    assert effective_streak(None, day) == 0
+
+
+def test_backfill_refused_once_cursors_exist(tmp_path):
+    eng = _engine(tmp_path)
+    _checkins(eng, (1, "2030-01-01"))
+    rw = RewardsEngine(eng)
+    rw.start()
+    with pytest.raises(RuntimeError, match="can't backfill"):
+        rw.run(backfill=True)
+    assert _state(eng, "SELECT count(*) FROM txs") == [(0,)]
@@ -0,0 +1,112 @@
+# tests/test_sessions.py
+import threading
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine
+
+from app.models import ServerSession
+from app.sessions import MemorySessionStore, SQLiteSessionStore, ServerSessionMiddleware
+
+
+def _sqlite_store(**kw):
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng, tables=[ServerSession.__table__])
+    return SQLiteSessionStore(eng, **kw)
+
+
+def _app(store, **kw):
+    app = FastAPI()
+    app.add_middleware(ServerSessionMiddleware, store=store, session_cookie="sid", **kw)
+
+    @app.get("/login/{uid}")
+    def login(uid: int, request: Request):
+        request.session["uid"] = uid
+        return {}
+
+    @app.get("/me")
+    def me(request: Request):
+        return {"uid": request.session.get("uid")}
+
+    @app.get("/logout")
+    def logout(request: Request):
+        request.session.clear()
+        return {}
+
+    return app
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request):
+    return MemorySessionStore() if request.param == "memory" else _sqlite_store()
+
+
+def test_cookie_holds_opaque_id(store):
+    c = TestClient(_app(store))
+    c.get("/login/7")
+    sid = c.cookies["sid"]
+    assert "." not in sid and len(sid) == 43  # token_urlsafe(32), no signed payload
+    assert c.get("/me").json() == {"uid": 7}
+    assert [info[:2] for info in store.active()] == [(sid, 7)]
+
+
+def test_unchanged_session_does_not_rewrite_cookie(store):
+    c = TestClient(_app(store))
+    c.get("/login/7")
+    r = c.get("/me")
+    assert "set-cookie" not in r.headers
+
+
+def test_login_rotates_id_and_logout_deletes(store):
+    c = TestClient(_app(store))
+    c.get("/login/1")
+    first = c.cookies["sid"]
+    c.get("/login/2")
+    assert c.cookies["sid"] != first
+    assert store.load(first) is None
+
+    c.get("/logout")
+    assert store.active() == []
+
+
+def test_revoke_user(store):
+    a, b = TestClient(_app(store)), TestClient(_app(store))
+    a.get("/login/5")
+    b.get("/login/5")
+    assert len(store.active(uid=5)) == 2
+    assert store.revoke_user(5) == 2
+    assert a.get("/me").json() == {"uid": None}
+
+
+def test_sliding_expiry_is_batched():
+    now = [1000.0]
+    store = _sqlite_store(batch_size=3, flush_interval=1e9, clock=lambda: now[0])
+    app = _app(store, max_age=100, refresh_after=10, clock=lambda: now[0])
+    clients = [TestClient(app) for _ in range(3)]
+    for c in clients:
+        c.get("/login/1")
+
+    now[0] += 20
+    clients[0].get("/me")
+    clients[1].get("/me")
+    assert len(store._pending) == 2
+    rows = {sid: exp for sid, _, exp in store.active()}
+    assert set(rows.values()) == {1100.0}  # not written yet
+
+    clients[2].get("/me")  # third touch fills the batch
+    assert store._pending == {}
+    assert {exp for _, _, exp in store.active()} == {1120.0}
+
+
+def test_blocking_store_runs_off_the_event_loop():
+    store = _sqlite_store()
+    threads = []
+    for name in ("load", "save"):
+        real = getattr(store, name)
+        setattr(store, name, lambda *a, _real=real: threads.append(threading.current_thread().name) or _real(*a))
+    c = TestClient(_app(store))
+    c.get("/login/3")
+    assert c.get("/me").json() == {"uid": 3}
+    assert threads and all(t == "AnyIO worker thread" for t in threads)
@@ -0,0 +1,63 @@
+# tests/test_sqlstats.py
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import app.admin
+from app import sqlstats
+from app.db import engine
+from app.models import User
+
+
+def _app():
+    a = FastAPI()
+    a.add_middleware(sqlstats.QueryStatsMiddleware, headers=True)
+
+    @a.get("/one")
+    def one():
+        with Session(engine) as s:
+            s.exec(select(User).limit(1)).all()
+        return {}
+
+    @a.get("/nplus1")
+    def nplus1():
+        with Session(engine) as s:
+            for uid in range(1, 9):
+                s.exec(select(User).where(User.id == uid)).first()
+        return {}
+
+    return a
+
+
+def test_headers_and_route_aggregates(client):
+    sqlstats.instrument(engine)
+    sqlstats.reset()
+    c = TestClient(_app())
+
+    r = c.get("/one")
+    assert r.headers["x-db-query-count"] == "1"
+    assert float(r.headers["x-db-query-time-ms"]) >= 0
+    assert r.headers["x-db-repeated-statements"] == "0"
+
+    r = c.get("/nplus1")
+    assert r.headers["x-db-query-count"] == "8"
+    assert r.headers["x-db-repeated-statements"] == "1"
+
+    snap = sqlstats.snapshot()
+    assert snap["routes"]["GET /one"]["queries"] == 1
+    assert snap["routes"]["GET /nplus1"]["n_plus_one_requests"] == 1
+    assert snap["n_plus_one"][0]["statements"][0]["times"] == 8
+
+
+def test_params_shape_hides_values():
+    assert sqlstats._params_shape((1, "secret"), False) == "(int, str)"
+    assert sqlstats._params_shape([{"a": 1}, {"a": 2}], True) == "2 x {a: int}"
+
+
+def test_debug_endpoint_requires_admin(client, monkeypatch):
+    assert client.get("/debug/sql").status_code == 404
+
+    monkeypatch.setattr(app.admin, "ADMIN_TOKEN", "t0ken")
+    r = client.get("/debug/sql", headers={"X-Admin-Token": "t0ken"})
+    assert r.status_code == 200
+    assert "routes" in r.json()
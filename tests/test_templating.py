@@ -0,0 +1,29 @@
+# tests/test_templating.py
+from app import auth, chat, main, posts
+from app.templating import TEMPLATE_DIR, make_environment, precompile, templates
+
+
+def test_routers_share_one_environment():
+    assert auth.templates is chat.templates is posts.templates is main.templates is templates
+    assert templates.env.autoescape is True
+    assert templates.env.auto_reload is False  # production default (DEBUG unset)
+
+
+def test_precompile_compiles_every_page():
+    n = precompile()
+    assert n == len(list(TEMPLATE_DIR.glob("*.html")))
+    # compiled templates stay in the environment's cache
+    assert templates.env.get_template("base.html") is templates.env.get_template("base.html")
+
+
+def test_bytecode_cache_is_reused(tmp_path):
+    precompile(make_environment(cache_dir=str(tmp_path)))
+    cached = sorted(p.name for p in tmp_path.iterdir())
+    assert len(cached) == len(list(TEMPLATE_DIR.glob("*.html")))
+
+    # a fresh environment (new worker) loads bytecode instead of writing anew
+    mtimes = {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()}
+    env = make_environment(cache_dir=str(tmp_path))
+    precompile(env)
+    assert {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()} == mtimes
+    assert env.get_template("login.html").render(error=None)
@@ -0,0 +1,50 @@
+# tests/test_typeahead.py
+import random
+import string
+
+from app.typeahead import PrefixIndex
+from tests.test_auth import login, signup
+
+
+def test_prefix_search_matches_a_linear_scan():
+    rng = random.Random(3)
+    users = {uid: ("".join(rng.choices("abc", k=rng.randrange(1, 6))), rng.choice([None, "Ab Cd", "bA"]))
+             for uid in range(1, 400)}
+    idx = PrefixIndex()
+    idx.load((uid, u, n) for uid, (u, n) in users.items())
+    for uid in range(1, 400, 7):  # renames after the bulk load
+        users[uid] = ("".join(rng.choices(string.ascii_lowercase, k=4)), None)
+        idx.upsert(uid, *users[uid])
+
+    for prefix in ("a", "AB", "ab c", "ba", "cab", "zz", "x"):
+        p = prefix.casefold()
+        expected = sorted(
+            {(name.casefold(), uid) for uid, names in users.items() for name in names if name and name.casefold().startswith(p)}
+        )
+        got = idx.search(prefix, limit=1000)
+        assert set(got) == {uid for _, uid in expected}
+        if expected:  # smallest matching name first
+            assert expected[0][0] in {(n or "").casefold() for n in users[got[0]]}
+
+
+def test_exact_match_first_and_limit():
+    idx = PrefixIndex()
+    idx.load([(1, "kimbap", None), (2, "kim", "Runner Kim"), (3, "jisoo", "Kimchi"), (4, "runner", None)])
+    assert idx.search("kim") == [2, 1, 3]
+    assert idx.search("kim", limit=2) == [2, 1]
+    assert idx.search("RUNNER") == [4, 2]
+    assert idx.search("  ") == [] and idx.search("\0") == []
+    idx.upsert(2, "kim", None)
+    assert idx.search("runner") == [4]
+
+
+def test_users_search_endpoint(client):
+    signup(client, username="typeahead_seeker", email="seeker@test.com")
+    signup(client, username="typeahead_target", email="target@test.com")
+    client.post("/logout", follow_redirects=False)
+    assert client.get("/users/search", params={"q": "typeahead"}).status_code == 401
+
+    login(client, username="typeahead_seeker", email="seeker@test.com")
+    r = client.get("/users/search", params={"q": "TypeAhead_"})
+    assert [u["username"] for u in r.json()["users"]] == ["typeahead_target"]
+    assert "Find people" in client.get("/chat").text
@@ -0,0 +1,77 @@
+# tests/test_usercache.py
+import uuid
+
+from sqlalchemy import event
+
+from app.db import engine
+from app.usercache import UserCache, UserSnapshot, user_cache, _MISSING
+from tests.test_auth import signup
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+    def users_selects(self):
+        return [s for s in self.statements if s.lstrip().upper().startswith("SELECT") and "FROM users" in s]
+
+
+def _profile_form(nickname):
+    return {
+        "nickname": nickname,
+        "birth_year": "1999",
+        "birth_month": "1",
+        "birth_day": "2",
+        "gender": "female",
+        "sport": "running",
+    }
+
+
+def test_cache_ttl_and_lru():
+    now = [0.0]
+    cache = UserCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    a, b, c = (UserSnapshot(id=i, username=f"u{i}") for i in (1, 2, 3))
+
+    cache.put(1, a)
+    cache.put(2, b)
+    assert cache.get(1) is a
+    cache.put(3, c)  # evicts 2 (least recently used)
+    assert cache.get(2) is _MISSING
+    assert cache.get(1) is a
+
+    now[0] = 11
+    assert cache.get(1) is _MISSING
+
+
+def test_nav_user_served_from_cache(client):
+    token = uuid.uuid4().hex[:8]
+    signup(client, username=f"user_{token}", email=f"{token}@test.com", password="Passw0rd!")
+
+    client.get("/")  # warm
+    with _QueryCounter() as qc:
+        r = client.get("/")
+    assert r.status_code == 200
+    assert qc.users_selects() == []
+
+
+def test_profile_update_invalidates(client):
+    token = uuid.uuid4().hex[:8]
+    signup(client, username=f"user_{token}", email=f"{token}@test.com", password="Passw0rd!")
+    client.get("/")
+
+    r = client.post("/profile/edit", data=_profile_form("newnick"), follow_redirects=False)
+    assert r.status_code == 303
+
+    r = client.get("/")
+    assert "newnick" in r.text
+    user_cache.clear()
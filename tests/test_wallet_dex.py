@@ -1,7 +1,13 @@
 # tests/test_wallet_dex.py
 import uuid
+from datetime import datetime, timezone
 
+from sqlmodel import Session
+
+from app.db import engine
+from app.models import StreakState, Tx
 from tests.test_auth import signup
+from tests.test_websocket import get_user_id_by_email
 
 
 def _unique_user():
@@ -37,6 +43,23 @@ def test_wallet_demo_mode(client):
     assert "Meetup demo" in r.text
 
 
+def test_wallet_shows_txs_and_streak(client):
+    username, email = _unique_user()
+    signup(client, username=username, email=email, password="Passw0rd!")
+    assert "workout streak" not in client.get("/wallet").text  # no StreakState row, no txs
+
+    uid = get_user_id_by_email(email)
+    today = datetime.now(timezone.utc).date().toordinal()
+    with Session(engine) as s:
+        s.add(StreakState(user_id=uid, last_checkin_day=today, current=4, best=4))
+        s.add(Tx(user_id=uid, amount=10, kind="earn", note="first run"))
+        s.add(Tx(user_id=uid, amount=5, kind="bonus", note="second run"))
+        s.commit()
+    r = client.get("/wallet")
+    assert "4-day workout streak" in r.text
+    assert r.text.index("second run") < r.text.index("first run")  # newest first
+
+
 def test_dex_demo_mode(client):
     r = client.get("/dex?demo=1")
     assert r.status_code == 200